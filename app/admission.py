@@ -0,0 +1,275 @@
+"""
+Admission Control Module
+Per-endpoint concurrency limits, bounded wait queues and load shedding
+
+Every limited request takes a slot from a worker-wide budget sized to the
+database connection pool. Requests that cannot get a slot wait in a bounded
+queue (served in priority order); when the queue is full or the wait times out
+they are rejected immediately with 503 and a Retry-After header.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import time
+
+from app.database import DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "True").lower() == "true"
+
+# Total concurrent limited requests per worker - one per pooled connection
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+
+class EndpointClass:
+    """Limits for a group of endpoints (lower priority value is served first)"""
+
+    def __init__(self, name, priority, concurrency, queue_size, queue_timeout):
+        prefix = f"ADMISSION_{name.upper()}"
+        self.name = name
+        self.priority = priority
+        self.concurrency = int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency)))
+        self.queue_size = int(os.getenv(f"{prefix}_QUEUE", str(queue_size)))
+        self.queue_timeout = float(os.getenv(f"{prefix}_TIMEOUT", str(queue_timeout)))
+
+        # Metrics
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.avg_service_seconds = 0.0
+
+    def record_service_time(self, seconds):
+        # Exponential moving average, used to estimate Retry-After
+        if self.avg_service_seconds == 0.0:
+            self.avg_service_seconds = seconds
+        else:
+            self.avg_service_seconds = 0.8 * self.avg_service_seconds + 0.2 * seconds
+
+    def retry_after(self):
+        """Seconds a shed client should wait before retrying"""
+        backlog = (self.queued + self.in_flight) / max(self.concurrency, 1)
+        return max(1, math.ceil(backlog * self.avg_service_seconds))
+
+    def metrics(self):
+        return {
+            "priority": self.priority,
+            "concurrency_limit": self.concurrency,
+            "queue_limit": self.queue_size,
+            "queue_timeout_seconds": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queued,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "avg_service_ms": round(self.avg_service_seconds * 1000, 3),
+        }
+
+
+# Endpoint classes - cheap lookups first, full-dataset reports last
+ENDPOINT_CLASSES = {
+    "lookup": EndpointClass("lookup", priority=0, concurrency=ADMISSION_CAPACITY,
+                            queue_size=100, queue_timeout=2.0),
+    "write": EndpointClass("write", priority=0, concurrency=max(1, ADMISSION_CAPACITY // 2),
+                           queue_size=100, queue_timeout=5.0),
+    "list": EndpointClass("list", priority=1, concurrency=max(1, ADMISSION_CAPACITY * 2 // 3),
+                          queue_size=50, queue_timeout=2.0),
+    "report": EndpointClass("report", priority=2, concurrency=max(1, ADMISSION_CAPACITY // 5),
+                            queue_size=10, queue_timeout=5.0),
+}
+
+# (method, path pattern, class) - first match wins; unmatched paths are not limited.
+# /api/jobs/{job_id}/events is left out on purpose: a stream would hold its slot for its whole life.
+ROUTE_CLASSES = [
+    (None, re.compile(r"^/api/orders/complete/all$"), "report"),
+    (None, re.compile(r"^/api/reconciliation(/.*)?$"), "report"),
+    ("GET", re.compile(r"^/api/orders/\d+$"), "lookup"),
+    ("GET", re.compile(r"^/api/search/.*$"), "lookup"),
+    ("GET", re.compile(r"^/api/jobs(/[^/]+(/result)?)?$"), "lookup"),
+    ("GET", re.compile(r"^/api/writes(/[^/]+)?$"), "lookup"),
+    ("GET", re.compile(r"^/api/orders$"), "list"),
+    (None, re.compile(r"^/api/statistics/.*$"), "list"),
+    ("POST", re.compile(r"^/api/(orders(/\d+/items)?|payments|jobs)$"), "write"),
+    ("PATCH", re.compile(r"^/api/(orders|payments)/\d+$"), "write"),
+]
+
+
+def classify(method, path):
+    """
+    Find the endpoint class for a request
+
+    Returns:
+        EndpointClass: Matching class, or None if the path is not limited
+    """
+    for route_method, pattern, name in ROUTE_CLASSES:
+        if (route_method is None or route_method == method) and pattern.match(path):
+            return ENDPOINT_CLASSES[name]
+    return None
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed"""
+
+    def __init__(self, endpoint_class, reason):
+        super().__init__(reason)
+        self.endpoint_class = endpoint_class
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Worker-wide slot budget with per-class limits and a priority wait queue.
+
+    All state is touched only from the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, capacity=ADMISSION_CAPACITY):
+        self.capacity = capacity
+        self.in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def _has_room(self, endpoint_class):
+        return self.in_flight < self.capacity and endpoint_class.in_flight < endpoint_class.concurrency
+
+    def _admit(self, endpoint_class):
+        self.in_flight += 1
+        endpoint_class.in_flight += 1
+        endpoint_class.admitted += 1
+
+    async def acquire(self, endpoint_class):
+        """
+        Take a slot, waiting in the bounded queue if necessary
+
+        Raises:
+            Overloaded: Queue full or wait timed out
+        """
+        # Anyone still queued is blocked by a full class, so free room can be used directly
+        if self._has_room(endpoint_class):
+            self._admit(endpoint_class)
+            return
+
+        if endpoint_class.queued >= endpoint_class.queue_size:
+            endpoint_class.shed_queue_full += 1
+            raise Overloaded(endpoint_class, "queue full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (endpoint_class.priority, next(self._sequence), endpoint_class, future))
+        endpoint_class.queued += 1
+        endpoint_class.max_queued = max(endpoint_class.max_queued, endpoint_class.queued)
+        self._wake()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=endpoint_class.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # Admitted just as the timer fired
+            future.cancel()
+            endpoint_class.shed_timeout += 1
+            raise Overloaded(endpoint_class, "queue timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued - give the slot back if we already got one
+            if future.done() and not future.cancelled():
+                self.release(endpoint_class)
+            else:
+                future.cancel()
+            raise
+        finally:
+            endpoint_class.queued -= 1
+
+    def release(self, endpoint_class):
+        """Return a slot and hand it to the highest-priority eligible waiter"""
+        self.in_flight -= 1
+        endpoint_class.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        skipped = []
+        while self._waiters and self.in_flight < self.capacity:
+            entry = heapq.heappop(self._waiters)
+            _, _, waiting_class, future = entry
+            if future.done():
+                continue  # Timed out or cancelled
+            if waiting_class.in_flight >= waiting_class.concurrency:
+                skipped.append(entry)  # Its class is full - let lower priorities through
+                continue
+            self._admit(waiting_class)
+            future.set_result(True)
+        for entry in skipped:
+            heapq.heappush(self._waiters, entry)
+
+    def metrics(self):
+        """
+        Admission metrics for all endpoint classes
+
+        Returns:
+            dict: Global and per-class in-flight, queue depth and shed counts
+        """
+        return {
+            "enabled": ADMISSION_CONTROL_ENABLED,
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queue_depth": sum(c.queued for c in ENDPOINT_CLASSES.values()),
+            "shed_total": sum(c.shed_queue_full + c.shed_timeout for c in ENDPOINT_CLASSES.values()),
+            "classes": {name: c.metrics() for name, c in ENDPOINT_CLASSES.items()},
+        }
+
+
+# Process-wide controller
+controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the admission controller to classified routes"""
+
+    def __init__(self, app, admission=controller):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        endpoint_class = classify(scope["method"], scope["path"])
+        if endpoint_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.admission.acquire(endpoint_class)
+        except Overloaded as overloaded:
+            await self._reject(send, overloaded)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            endpoint_class.record_service_time(time.monotonic() - started)
+            self.admission.release(endpoint_class)
+
+    @staticmethod
+    async def _reject(send, overloaded):
+        retry_after = overloaded.endpoint_class.retry_after()
+        body = json.dumps({
+            "success": False,
+            "error": f"Server overloaded ({overloaded.reason}), retry later",
+            "status_code": 503
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(retry_after).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
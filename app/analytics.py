@@ -0,0 +1,523 @@
+"""
+Analytics Mirror Module
+Embedded columnar copy of the order data for statistics and reporting queries
+"""
+
+import copy
+import os
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import select, or_
+
+from app.database import get_session_factory, RecentKeys
+from app.models import Order, OrderItem, Payment, Item, Category, Menu, ArchivedOrder
+
+# Optional dependency, imported when a mirror is created - mirror stays disabled without it
+duckdb = None
+
+
+# Mirror configuration from environment
+ANALYTICS_MIRROR_ENABLED = os.getenv("ANALYTICS_MIRROR_ENABLED", "False").lower() == "true"
+ANALYTICS_MIRROR_PATH = os.getenv("ANALYTICS_MIRROR_PATH", ":memory:")
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "30"))
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "5000"))
+ANALYTICS_SWEEP_SYNCS = int(os.getenv("ANALYTICS_SWEEP_SYNCS", "10"))  # Syncs between deleted-row sweeps (0 = never)
+
+# Mirrored tables swept for rows deleted from the OLTP database (children first)
+SWEPT_TABLES = [
+    ("order_items", OrderItem.id),
+    ("payments", Payment.payment_id),
+    ("orders", Order.order_id),
+]
+
+
+def _import_duckdb():
+    """Import duckdb on first use (None if it is not installed)"""
+    global duckdb
+    if duckdb is None:
+        try:
+            import duckdb as module
+        except ImportError:
+            return None
+        duckdb = module
+    return duckdb
+
+
+# Columnar table layout of the mirror
+MIRROR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS menus (
+    menu_id INTEGER PRIMARY KEY,
+    menu_name VARCHAR
+);
+CREATE TABLE IF NOT EXISTS categories (
+    cat_id INTEGER PRIMARY KEY,
+    category_name VARCHAR,
+    menu_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS items (
+    item_id INTEGER PRIMARY KEY,
+    item_name VARCHAR,
+    cat_id INTEGER,
+    menu_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id INTEGER PRIMARY KEY,
+    order_date DATE,
+    order_status VARCHAR
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY,
+    order_id INTEGER,
+    item_id INTEGER,
+    size VARCHAR,
+    price DECIMAL(18, 2),
+    quantity INTEGER,
+    total DECIMAL(18, 2)
+);
+CREATE TABLE IF NOT EXISTS payments (
+    payment_id INTEGER PRIMARY KEY,
+    order_id INTEGER,
+    payment_date DATE,
+    amount_due DECIMAL(18, 2),
+    tips DECIMAL(18, 2),
+    discount DECIMAL(18, 2),
+    total_paid DECIMAL(18, 2),
+    payment_type VARCHAR,
+    payment_status VARCHAR
+);
+"""
+
+ORDER_ITEM_COLUMNS = [
+    OrderItem.id, OrderItem.order_id, OrderItem.item_id, OrderItem.size,
+    OrderItem.price, OrderItem.quantity, OrderItem.total,
+]
+
+# Mirrored columns of the order tables, in mirror table order
+MIRRORED_COLUMNS = {
+    "orders": [Order.order_id, Order.order_date, Order.order_status],
+    "order_items": ORDER_ITEM_COLUMNS,
+    "payments": [
+        Payment.payment_id, Payment.order_id, Payment.payment_date,
+        Payment.amount_due, Payment.tips, Payment.discount, Payment.total_paid,
+        Payment.payment_type, Payment.payment_status,
+    ],
+}
+
+# Keys per IN list when reading rows by key (SQL Server allows 2100 parameters)
+KEY_BATCH_SIZE = 1000
+
+# Revenue breakdown dimensions -> (select expression, joins)
+REVENUE_DIMENSIONS = {
+    "date": ("o.order_date", "JOIN orders o ON o.order_id = oi.order_id"),
+    "item": ("i.item_name", "JOIN items i ON i.item_id = oi.item_id"),
+    "category": (
+        "c.category_name",
+        "JOIN items i ON i.item_id = oi.item_id JOIN categories c ON c.cat_id = i.cat_id"
+    ),
+    "menu": (
+        "m.menu_name",
+        "JOIN items i ON i.item_id = oi.item_id JOIN menus m ON m.menu_id = i.menu_id"
+    ),
+}
+
+
+class AnalyticsMirror:
+    """
+    Incrementally refreshed DuckDB copy of the OLTP order tables.
+
+    Orders and payments are pulled by primary key high-water mark plus
+    ``updated_at``. Order items have no ``updated_at``: new lines are pulled by
+    ``id`` (re-reading the trailing LATE_COMMIT_WINDOW of ids for lines
+    committed late under a lower id), and the lines of every order whose
+    ``updated_at`` moved are replaced, so writers that change or delete lines
+    must touch their order. Every ``ANALYTICS_SWEEP_SYNCS`` syncs, rows deleted
+    from the OLTP tables are removed from the mirror and rows missing from it
+    are copied. The small catalog tables (menus, categories, items) are
+    replaced on every sync.
+
+    A sync writes through its own DuckDB connection in one transaction while
+    it reads the OLTP database, so queries keep answering from the previous
+    sync until it commits.
+    """
+
+    def __init__(self, path=ANALYTICS_MIRROR_PATH, session_factory=None, sweep_syncs=ANALYTICS_SWEEP_SYNCS):
+        if _import_duckdb() is None:
+            raise RuntimeError("duckdb is not installed - run: pip install duckdb")
+        self.path = path
+        self.session_factory = session_factory or get_session_factory()
+        self.connection = duckdb.connect(path)
+        self.connection.execute(MIRROR_SCHEMA)
+        self._lock = threading.Lock()  # Guards self.connection (used by queries)
+        self._sync_lock = threading.Lock()  # One sync at a time
+        self._watermarks = {"orders": (0, None), "payments": (0, None)}
+        self._lines = RecentKeys()
+        self._archived_since = None
+        self.sweep_syncs = sweep_syncs
+        self.syncs = 0
+        self.last_synced_at = None
+        self.snapshot_at = None  # time.time() when the last sync started reading
+        self.last_sync_duration = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------
+
+    def sync(self):
+        """
+        Pull new and changed rows from the OLTP database into the mirror
+
+        Watermarks advance only when the sync commits; a failed sync is
+        rolled back and read again by the next one.
+
+        Returns:
+            dict: Number of rows copied per table
+        """
+        started = time.monotonic()
+        copied = {}
+        db = self.session_factory()
+        try:
+            with self._sync_lock:
+                snapshot_at = time.time()
+                state = {
+                    "watermarks": dict(self._watermarks),
+                    "lines": copy.deepcopy(self._lines),
+                    "archived_since": self._archived_since,
+                }
+                writer = self.connection.cursor()
+                try:
+                    writer.execute("BEGIN TRANSACTION")
+                    copied = self._sync(db, writer, state)
+                    writer.execute("COMMIT")
+                except Exception:
+                    writer.execute("ROLLBACK")
+                    raise
+                finally:
+                    writer.close()
+                self._watermarks = state["watermarks"]
+                self._lines = state["lines"]
+                self._archived_since = state["archived_since"]
+                self.syncs += 1
+            self.last_synced_at = datetime.now()
+            self.snapshot_at = snapshot_at
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            db.close()
+            self.last_sync_duration = time.monotonic() - started
+        return copied
+
+    def _sync(self, db, writer, state):
+        copied = {}
+        self._replace_catalog(db, writer)
+        copied["orders"], changed_orders = self._copy_incremental(
+            db, writer, state, "orders", Order.order_id, Order.updated_at
+        )
+        copied["order_items"] = self._copy_lines(db, writer, state["lines"])
+        copied["order_items_replaced"] = self._replace_order_items(db, writer, changed_orders)
+        copied["payments"], _ = self._copy_incremental(
+            db, writer, state, "payments", Payment.payment_id, Payment.updated_at
+        )
+        copied["archived"] = self._remove_archived(db, writer, state)
+        if self.sweep_syncs and (self.syncs + 1) % self.sweep_syncs == 0:
+            copied["deleted"], copied["backfilled"] = self._sweep(db, writer)
+        return copied
+
+    def _replace_catalog(self, db, writer):
+        """Replace the small menu tables wholesale"""
+        catalog = [
+            ("menus", [Menu.menu_id, Menu.menu_name]),
+            ("categories", [Category.cat_id, Category.category_name, Category.menu_id]),
+            ("items", [Item.item_id, Item.item_name, Item.cat_id, Item.menu_id]),
+        ]
+        for table, columns in catalog:
+            rows = [tuple(row) for row in db.execute(select(*columns)).all()]
+            writer.execute(f"DELETE FROM {table}")
+            if rows:
+                placeholders = ", ".join("?" * len(columns))
+                writer.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+    def _upsert(self, writer, table, rows):
+        """Replace mirrored rows by primary key"""
+        pk_name = MIRRORED_COLUMNS[table][0].key
+        placeholders = ", ".join("?" * len(MIRRORED_COLUMNS[table]))
+        writer.executemany(f"DELETE FROM {table} WHERE {pk_name} = ?", [(values[0],) for values in rows])
+        writer.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+    def _copy_incremental(self, db, writer, state, table, pk_column, updated_column):
+        """
+        Copy rows above the key watermark or changed since the last sync, in batches
+
+        Returns:
+            tuple: (rows copied, keys of copied rows that were already at or below the watermark)
+        """
+        columns = MIRRORED_COLUMNS[table]
+        last_pk, last_updated = state["watermarks"][table]
+        previous_pk = last_pk
+        copied = 0
+        changed = []
+        max_updated = last_updated
+
+        condition = pk_column > last_pk
+        if last_updated is not None:
+            condition = or_(condition, updated_column >= last_updated)
+        elif last_pk:
+            # Nothing had been updated yet (e.g. rows loaded without updated_at)
+            condition = or_(condition, updated_column.isnot(None))
+
+        result = db.execute(
+            select(*columns, updated_column).where(condition).order_by(pk_column)
+        ).yield_per(ANALYTICS_BATCH_SIZE)
+        for batch in result.partitions(ANALYTICS_BATCH_SIZE):
+            rows = []
+            for row in batch:
+                values = tuple(row[:len(columns)])
+                rows.append(values)
+                if values[0] <= previous_pk:
+                    changed.append(values[0])
+                last_pk = max(last_pk, values[0])
+                if row[-1] is not None and (max_updated is None or row[-1] > max_updated):
+                    max_updated = row[-1]
+            self._upsert(writer, table, rows)
+            copied += len(rows)
+
+        state["watermarks"][table] = (last_pk, max_updated)
+        return copied, changed
+
+    def _copy_lines(self, db, writer, lines):
+        """Copy new order lines, re-reading the late-commit window below the highest id read"""
+        copied = 0
+        result = db.execute(
+            select(*ORDER_ITEM_COLUMNS).where(OrderItem.id > lines.floor).order_by(OrderItem.id)
+        ).yield_per(ANALYTICS_BATCH_SIZE)
+        for batch in result.partitions(ANALYTICS_BATCH_SIZE):
+            rows = [tuple(row) for row in batch if lines.add(row[0])]
+            if rows:
+                self._upsert(writer, "order_items", rows)
+            copied += len(rows)
+        return copied
+
+    def _replace_order_items(self, db, writer, order_ids):
+        """Replace the mirrored lines of changed orders, picking up edited and deleted lines"""
+        placeholders = ", ".join("?" * len(ORDER_ITEM_COLUMNS))
+        copied = 0
+        for start in range(0, len(order_ids), KEY_BATCH_SIZE):
+            keys = order_ids[start:start + KEY_BATCH_SIZE]
+            rows = [
+                tuple(row) for row in
+                db.execute(select(*ORDER_ITEM_COLUMNS).where(OrderItem.order_id.in_(keys))).all()
+            ]
+            writer.executemany("DELETE FROM order_items WHERE order_id = ?", [(key,) for key in keys])
+            if rows:
+                writer.executemany(f"INSERT INTO order_items VALUES ({placeholders})", rows)
+            copied += len(rows)
+        return copied
+
+    def _sweep(self, db, writer):
+        """
+        Remove mirrored rows whose key is no longer in the OLTP table, and copy
+        OLTP rows the mirror is missing (committed too late for the watermarks)
+
+        Returns:
+            tuple: (rows removed, rows copied)
+        """
+        removed = backfilled = 0
+        for table, pk_column in SWEPT_TABLES:
+            pk_name = pk_column.key
+            writer.execute("CREATE OR REPLACE TEMP TABLE live_keys (pk INTEGER)")
+            result = db.execute(select(pk_column)).yield_per(ANALYTICS_BATCH_SIZE)
+            for batch in result.partitions(ANALYTICS_BATCH_SIZE):
+                writer.executemany("INSERT INTO live_keys VALUES (?)", [tuple(row) for row in batch])
+            removed += writer.execute(
+                f"DELETE FROM {table} WHERE {pk_name} NOT IN (SELECT pk FROM live_keys)"
+            ).fetchone()[0]
+
+            missing = [pk for pk, in writer.execute(
+                f"SELECT pk FROM live_keys WHERE pk NOT IN (SELECT {pk_name} FROM {table})"
+            ).fetchall()]
+            for start in range(0, len(missing), KEY_BATCH_SIZE):
+                rows = [tuple(row) for row in db.execute(
+                    select(*MIRRORED_COLUMNS[table]).where(pk_column.in_(missing[start:start + KEY_BATCH_SIZE]))
+                ).all()]
+                if rows:
+                    self._upsert(writer, table, rows)
+                backfilled += len(rows)
+        writer.execute("DROP TABLE live_keys")
+        return removed, backfilled
+
+    def _remove_archived(self, db, writer, state):
+        """Delete orders moved to the archive since the last sync (the mirror holds hot data)"""
+        query = select(ArchivedOrder.order_id, ArchivedOrder.archived_at)
+        if state["archived_since"] is not None:
+            query = query.where(ArchivedOrder.archived_at >= state["archived_since"])
+        removed = 0
+        result = db.execute(query).yield_per(ANALYTICS_BATCH_SIZE)
+        for batch in result.partitions(ANALYTICS_BATCH_SIZE):
+            keys = [(order_id,) for order_id, _ in batch]
+            for table in ("order_items", "payments", "orders"):
+                writer.executemany(f"DELETE FROM {table} WHERE order_id = ?", keys)
+            for _, archived_at in batch:
+                if state["archived_since"] is None or archived_at > state["archived_since"]:
+                    state["archived_since"] = archived_at
+            removed += len(keys)
+        return removed
+
+    # ------------------------------------------------------------
+    # Background refresh
+    # ------------------------------------------------------------
+
+    def start(self, interval=ANALYTICS_REFRESH_SECONDS):
+        """Start the periodic background refresh thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="analytics-mirror", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"✗ Analytics mirror sync failed: {str(e)}")
+            self._stop.wait(interval)
+
+    # ------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------
+
+    @property
+    def ready(self):
+        return self.last_synced_at is not None
+
+    def freshness(self):
+        """
+        Describe how far behind the OLTP database the mirror is
+
+        Returns:
+            dict: Last sync time, lag in seconds and mirrored row counts
+        """
+        # Data is as old as the moment the last sync started reading, not when it finished
+        lag = time.time() - self.snapshot_at if self.snapshot_at is not None else None
+        with self._lock:
+            counts = {
+                table: self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("orders", "order_items", "payments")
+            }
+        return {
+            "enabled": True,
+            "ready": self.ready,
+            "path": self.path,
+            "last_synced_at": self.last_synced_at.isoformat() if self.last_synced_at else None,
+            "lag_seconds": lag,
+            "last_sync_duration_seconds": self.last_sync_duration,
+            "last_error": self.last_error,
+            "rows": counts,
+        }
+
+    def statistics(self):
+        """
+        Compute the business overview from the mirror
+
+        Returns:
+            dict: Same fields as the OLTP statistics query
+        """
+        with self._lock:
+            total_orders, total_revenue, total_payments = self.connection.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM orders),
+                    (SELECT COALESCE(SUM(total), 0) FROM order_items),
+                    (SELECT COALESCE(SUM(total_paid), 0) FROM payments
+                     WHERE payment_status = 'Completed')
+            """).fetchone()
+        return {
+            "total_orders": total_orders,
+            "total_revenue": Decimal(total_revenue),
+            "total_payments_received": Decimal(total_payments),
+        }
+
+    def revenue_breakdown(self, group_by):
+        """
+        Revenue grouped by a single dimension
+
+        Args:
+            group_by: One of REVENUE_DIMENSIONS
+
+        Returns:
+            list: Rows of {key, revenue, quantity, line_items}
+        """
+        expression, joins = REVENUE_DIMENSIONS[group_by]
+        with self._lock:
+            rows = self.connection.execute(f"""
+                SELECT {expression} AS key,
+                       SUM(oi.total) AS revenue,
+                       SUM(oi.quantity) AS quantity,
+                       COUNT(*) AS line_items
+                FROM order_items oi {joins}
+                GROUP BY 1
+                ORDER BY 1
+            """).fetchall()
+        return [
+            {"key": key, "revenue": Decimal(revenue), "quantity": quantity, "line_items": line_items}
+            for key, revenue, quantity, line_items in rows
+        ]
+
+
+# Process-wide mirror instance (None when disabled)
+mirror = None
+
+
+def start_mirror():
+    """
+    Create the mirror, run the initial sync and start background refresh
+
+    Returns:
+        AnalyticsMirror: The running mirror, or None if disabled/unavailable
+    """
+    global mirror
+    if not ANALYTICS_MIRROR_ENABLED:
+        return None
+    if _import_duckdb() is None:
+        print("✗ WARNING: ANALYTICS_MIRROR_ENABLED is set but duckdb is not installed")
+        return None
+    mirror = AnalyticsMirror()
+    try:
+        mirror.sync()
+    except Exception as e:
+        print(f"✗ WARNING: Initial analytics mirror sync failed: {str(e)}")
+    mirror.start()
+    return mirror
+
+
+def stop_mirror():
+    """Stop background refresh of the mirror"""
+    if mirror is not None:
+        mirror.stop()
+
+
+def get_mirror():
+    """
+    Get the mirror if it is enabled and has completed a sync
+
+    Returns:
+        AnalyticsMirror: Ready mirror, or None to fall back to the OLTP database
+    """
+    if mirror is not None and mirror.ready:
+        return mirror
+    return None
@@ -0,0 +1,575 @@
+"""
+Order Archival Module
+Moves closed orders older than the archive horizon out of the hot tables
+
+Usage:
+    python -m app.archive                      # archive everything past the horizon
+    python -m app.archive --dry-run            # count eligible orders only
+    python -m app.archive --horizon-days 730 --max-batches 10
+    python -m app.archive --location airport   # archive one location's shard
+
+Closed orders (and their items and payments) are copied into the *_archive
+tables and deleted from the hot tables in small batches, one transaction per
+batch. Running totals (archive_totals, and archive_revenue_totals per revenue
+breakdown value) are updated in the same transaction so statistics and revenue
+stay exact without scanning the archive. Between batches the archiver sleeps to
+stay within its duty cycle and waits while the database is busy. The in-process
+archiver works through every configured location.
+
+Each batch claims its orders with a locking read that skips rows another
+archiver holds, so several API workers can archive at once. A batch that fails
+is retried one order at a time; orders that still fail are skipped for the rest
+of the run and reported in its statistics.
+"""
+
+import argparse
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, insert, inspect, literal, select, update
+from sqlalchemy.exc import DBAPIError
+
+from app import admission, queries, response_cache, sharding
+from app.database import DEFAULT_LOCATION
+from app.models import (
+    Order, OrderItem, Payment,
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, ArchiveTotals, ArchiveRevenueTotals
+)
+from app.schemas import OrderSummary
+
+
+# Archive configuration from environment
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "False").lower() == "true"
+ARCHIVE_HORIZON_DAYS = int(os.getenv("ARCHIVE_HORIZON_DAYS", "365"))
+ARCHIVE_CLOSED_STATUSES = [
+    s.strip() for s in os.getenv("ARCHIVE_CLOSED_STATUSES", "Completed,Cancelled,Refunded").split(",") if s.strip()
+]
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))  # Keep under SQL Server's 2100 parameters
+ARCHIVE_DUTY_CYCLE = float(os.getenv("ARCHIVE_DUTY_CYCLE", "0.2"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Pause between batches while this many statements of other sessions run on the database
+# (this worker's in-flight requests where the database does not report it, e.g. SQLite)
+ARCHIVE_BUSY_IN_FLIGHT = int(os.getenv("ARCHIVE_BUSY_IN_FLIGHT", str(max(1, admission.ADMISSION_CAPACITY // 2))))
+ARCHIVE_MAX_BUSY_WAIT_SECONDS = 30.0
+
+# Columns copied from each hot table, in archive table order
+_COPIES = [
+    (ArchivedOrder, Order, [
+        "order_id", "order_date", "order_status", "location", "created_at", "updated_at"
+    ]),
+    (ArchivedOrderItem, OrderItem, [
+        "id", "order_id", "item_id", "size", "price", "quantity", "total", "created_at"
+    ]),
+    (ArchivedPayment, Payment, [
+        "payment_id", "order_id", "payment_date", "amount_due", "tips", "discount",
+        "total_paid", "payment_type", "payment_status", "location", "created_at", "updated_at"
+    ]),
+]
+
+
+def archive_cutoff(horizon_days=ARCHIVE_HORIZON_DAYS, today=None):
+    """Orders dated before this day are eligible for archival"""
+    return (today or date.today()) - timedelta(days=horizon_days)
+
+
+def _eligible(cutoff):
+    return Order.order_date < cutoff, Order.order_status.in_(ARCHIVE_CLOSED_STATUSES)
+
+
+def _add_revenue_totals(connection, order_ids):
+    """Add the archived lines of a batch to the running revenue of every breakdown dimension"""
+    for group_by, statement in queries.ARCHIVED_REVENUE_BREAKDOWN.items():
+        rows = connection.execute(statement.where(ArchivedOrderItem.order_id.in_(order_ids))).all()
+        for key, revenue, quantity, line_items in rows:
+            values = {"revenue": revenue or Decimal("0.00"), "quantity": quantity or 0, "line_items": line_items}
+            updated = connection.execute(
+                update(ArchiveRevenueTotals).where(
+                    ArchiveRevenueTotals.dimension == group_by,
+                    ArchiveRevenueTotals.dimension_value == str(key)
+                ).values(
+                    revenue=ArchiveRevenueTotals.revenue + values["revenue"],
+                    quantity=ArchiveRevenueTotals.quantity + values["quantity"],
+                    line_items=ArchiveRevenueTotals.line_items + values["line_items"],
+                )
+            )
+            if updated.rowcount == 0:
+                connection.execute(insert(ArchiveRevenueTotals).values(
+                    dimension=group_by, dimension_value=str(key), **values
+                ))
+
+
+def rebuild_revenue_totals(connection):
+    """
+    Recompute archive_revenue_totals from the whole archive (for archives written
+    before the table existed; archive_batch keeps it current afterwards)
+
+    Returns:
+        int: Dimension values written
+    """
+    connection.execute(ArchiveRevenueTotals.__table__.delete())
+    rows = [
+        {"dimension": group_by, "dimension_value": str(key), "revenue": revenue or Decimal("0.00"),
+         "quantity": quantity or 0, "line_items": line_items}
+        for group_by, statement in queries.ARCHIVED_REVENUE_BREAKDOWN.items()
+        for key, revenue, quantity, line_items in connection.execute(statement)
+    ]
+    if rows:
+        connection.execute(insert(ArchiveRevenueTotals), rows)
+    return len(rows)
+
+
+def archive_batch(connection, order_ids):
+    """
+    Copy a batch of orders with their items and payments to the archive tables,
+    update the archive totals and delete the hot rows (caller owns the transaction)
+
+    Returns:
+        dict: Rows archived per table
+    """
+    archived_at = datetime.now()
+    counts = {}
+    for archive_model, hot_model, columns in _COPIES:
+        source_columns = [getattr(hot_model, column) for column in columns]
+        target_columns = list(columns)
+        if archive_model is ArchivedOrder:
+            source_columns.append(literal(archived_at))
+            target_columns.append("archived_at")
+        result = connection.execute(insert(archive_model).from_select(
+            target_columns, select(*source_columns).where(hot_model.order_id.in_(order_ids))
+        ))
+        counts[hot_model.__tablename__] = result.rowcount
+
+    revenue = connection.scalar(
+        select(func.sum(ArchivedOrderItem.total)).where(ArchivedOrderItem.order_id.in_(order_ids))
+    ) or Decimal("0.00")
+    paid = connection.scalar(
+        select(func.sum(ArchivedPayment.total_paid)).where(
+            ArchivedPayment.order_id.in_(order_ids),
+            ArchivedPayment.payment_status == "Completed"
+        )
+    ) or Decimal("0.00")
+    archived_orders = counts[Order.__tablename__]
+    updated = connection.execute(
+        update(ArchiveTotals).where(ArchiveTotals.id == 1).values(
+            total_orders=ArchiveTotals.total_orders + archived_orders,
+            total_revenue=ArchiveTotals.total_revenue + revenue,
+            total_payments_received=ArchiveTotals.total_payments_received + paid,
+        )
+    )
+    if updated.rowcount == 0:
+        connection.execute(insert(ArchiveTotals).values(
+            id=1, total_orders=archived_orders, total_revenue=revenue, total_payments_received=paid
+        ))
+    _add_revenue_totals(connection, order_ids)
+
+    # Delete only rows that were copied - a payment added meanwhile keeps its order hot (FK error, the
+    # archiver retries the batch order by order and skips that order until its next run)
+    connection.execute(OrderItem.__table__.delete().where(
+        OrderItem.order_id.in_(order_ids),
+        OrderItem.id.in_(select(ArchivedOrderItem.id).where(ArchivedOrderItem.order_id.in_(order_ids)))
+    ))
+    connection.execute(Payment.__table__.delete().where(
+        Payment.order_id.in_(order_ids),
+        Payment.payment_id.in_(select(ArchivedPayment.payment_id).where(ArchivedPayment.order_id.in_(order_ids)))
+    ))
+    connection.execute(Order.__table__.delete().where(Order.order_id.in_(order_ids)))
+    return counts
+
+
+# ================================================================
+# ARCHIVE READS
+# ================================================================
+
+def get_archived_order(db, order_id):
+    """
+    Load an archived order with its items and payments
+
+    Returns:
+        ArchivedOrder: Order with the same attributes as Order, or None
+    """
+    return db.execute(queries.ARCHIVED_ORDER_DETAIL, {"order_id": order_id}).unique().scalar_one_or_none()
+
+
+def get_archived_orders(db, start=None, end=None):
+    """
+    Load archived orders in a date range with their items and payments, newest first
+
+    Args:
+        db: SQLAlchemy session
+        start, end: Inclusive date range (open ends allowed)
+
+    Returns:
+        list: ArchivedOrder objects
+    """
+    params = {"start_date": start or date.min, "end_date": end or date.max}
+    return db.execute(queries.ARCHIVED_ORDERS_COMPLETE, params).unique().scalars().all()
+
+
+def archived_summaries(db, status=None, start=None, end=None):
+    """
+    Summaries of archived orders in a date range, newest first
+
+    Args:
+        db: SQLAlchemy session
+        status: Order status to match
+        start, end: Inclusive date range (open ends allowed)
+
+    Returns:
+        list: OrderSummary objects
+    """
+    params = {"start_date": start or date.min, "end_date": end or date.max}
+    if status:
+        params["status"] = status
+    summaries = []
+    for order_id, order_date, order_status, location, total_items, order_total, total_payments in db.execute(
+        queries.ARCHIVED_ORDER_SUMMARIES[bool(status)], params
+    ):
+        order_total = order_total or Decimal("0.00")
+        total_payments = total_payments or Decimal("0.00")
+        summaries.append(OrderSummary(
+            order_id=order_id,
+            order_date=order_date,
+            order_status=order_status,
+            location=location,
+            total_items=total_items,
+            order_total=order_total,
+            total_payments=total_payments,
+            payment_balance=order_total - total_payments
+        ))
+    return summaries
+
+
+def archive_totals(db):
+    """
+    Running totals of everything archived so far
+
+    Returns:
+        dict: total_orders, total_revenue and total_payments_received
+    """
+    totals = db.execute(queries.ARCHIVE_TOTALS).scalar_one_or_none()
+    if totals is None:
+        return {"total_orders": 0, "total_revenue": Decimal("0.00"), "total_payments_received": Decimal("0.00")}
+    return {
+        "total_orders": totals.total_orders,
+        "total_revenue": totals.total_revenue,
+        "total_payments_received": totals.total_payments_received,
+    }
+
+
+def archived_revenue(db, group_by):
+    """
+    Running revenue of archived orders for one breakdown dimension
+
+    Args:
+        db: SQLAlchemy session
+        group_by: "date", "item", "category" or "menu"
+
+    Returns:
+        list: Rows with key, revenue, quantity and line_items, sorted by key
+    """
+    to_key = date.fromisoformat if group_by == "date" else str
+    return [
+        {"key": to_key(value), "revenue": revenue, "quantity": quantity, "line_items": line_items}
+        for value, revenue, quantity, line_items in db.execute(
+            queries.ARCHIVE_REVENUE_TOTALS, {"dimension": group_by}
+        )
+    ]
+
+
+# ================================================================
+# ARCHIVAL RUNS
+# ================================================================
+
+# Statements running in other sessions, per dialect - seen by every API worker and host alike
+_ACTIVE_STATEMENTS = {
+    "mssql": "SELECT COUNT(*) FROM sys.dm_exec_requests WHERE session_id > 50 AND session_id <> @@SPID",
+    "postgresql": "SELECT COUNT(*) FROM pg_stat_activity WHERE state = 'active' AND pid <> pg_backend_pid()",
+}
+
+# Engines whose load could not be read (dialect or missing VIEW SERVER STATE permission)
+_no_load_signal = set()
+
+
+def database_load(engine):
+    """
+    Number of statements other sessions are running on a database
+
+    Returns:
+        int: Active statements, or None if the database does not report them
+    """
+    probe = _ACTIVE_STATEMENTS.get(engine.dialect.name)
+    if probe is None or engine.url in _no_load_signal:
+        return None
+    try:
+        with engine.connect() as connection:
+            return connection.exec_driver_sql(probe).scalar()
+    except DBAPIError as e:
+        _no_load_signal.add(engine.url)
+        print(f"✗ WARNING: Database load not readable, archiver falls back to this worker's requests: {str(e)}")
+        return None
+
+
+def _api_busy(engine):
+    load = database_load(engine)
+    if load is None:
+        return admission.ADMISSION_CONTROL_ENABLED and admission.controller.in_flight >= ARCHIVE_BUSY_IN_FLIGHT
+    return load >= ARCHIVE_BUSY_IN_FLIGHT
+
+
+class Archiver:
+    """
+    Batch archiver with duty-cycle throttling.
+
+    After each batch that took ``t`` seconds it sleeps ``t * (1 - duty) / duty``
+    so archival uses at most ``duty`` of wall time, then waits (up to
+    ARCHIVE_MAX_BUSY_WAIT_SECONDS) while the database is busy. Locations are
+    archived one after the other, each on its own shard.
+
+    Batches lock the orders they claim and skip orders locked by another
+    archiver, so one archiver per API worker is safe. A failed batch is retried
+    one order at a time; an order that fails on its own is skipped until the
+    next run and listed under ``failed_orders``.
+    """
+
+    def __init__(self, horizon_days=ARCHIVE_HORIZON_DAYS, batch_size=ARCHIVE_BATCH_SIZE,
+                 duty_cycle=ARCHIVE_DUTY_CYCLE, locations=None):
+        self._locations = list(locations) if locations else None  # None: every configured location
+        self.horizon_days = horizon_days
+        self.batch_size = batch_size
+        self.duty_cycle = min(max(duty_cycle, 0.01), 1.0)
+        self.last_run = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def locations(self):
+        return self._locations or sharding.router.locations
+
+    def eligible_count(self):
+        """Number of hot orders past the horizon, over every location"""
+        count = 0
+        for location in self.locations:
+            with sharding.router.engine_for(location).connect() as connection:
+                count += connection.scalar(
+                    select(func.count(Order.order_id)).where(*_eligible(archive_cutoff(self.horizon_days)))
+                )
+        return count
+
+    def run(self, max_batches=None):
+        """
+        Archive eligible orders batch by batch until none are left
+
+        Args:
+            max_batches: Stop after this many batches (None for no limit)
+
+        Returns:
+            dict: Batches, rows archived per table (in total and per location), orders that
+                  could not be archived, work and throttle seconds
+        """
+        cutoff = archive_cutoff(self.horizon_days)
+        stats = {
+            "cutoff": cutoff.isoformat(),
+            "batches": 0,
+            "rows": {"orders": 0, "order_items": 0, "payments": 0},
+            "locations": {},
+            "failed_orders": [],
+            "work_seconds": 0.0,
+            "throttle_seconds": 0.0,
+        }
+        started = time.monotonic()
+        for location in self.locations:
+            engine = sharding.router.engine_for(location)
+            location_rows = stats["locations"][location] = {"orders": 0, "order_items": 0, "payments": 0}
+            skipped = set()
+            while not self._stop.is_set() and (max_batches is None or stats["batches"] < max_batches):
+                batch_started = time.monotonic()
+                order_ids = []
+                try:
+                    with engine.begin() as connection:
+                        order_ids = self._claim(connection, cutoff, skipped)
+                        if not order_ids:
+                            break
+                        counts = archive_batch(connection, order_ids)
+                except DBAPIError:
+                    if not order_ids:
+                        raise
+                    # One order can fail the whole batch - archive the others one by one
+                    counts = self._archive_each(engine, location, order_ids, cutoff, skipped, stats["failed_orders"])
+                elapsed = time.monotonic() - batch_started
+                stats["batches"] += 1
+                stats["work_seconds"] += elapsed
+                for table, count in counts.items():
+                    stats["rows"][table] += count
+                    location_rows[table] += count
+                stats["throttle_seconds"] += self._throttle(engine, elapsed)
+
+        stats["work_seconds"] = round(stats["work_seconds"], 3)
+        stats["throttle_seconds"] = round(stats["throttle_seconds"], 3)
+        stats["total_seconds"] = round(time.monotonic() - started, 3)
+        stats["finished_at"] = datetime.now().isoformat()
+        self.last_run = stats
+        return stats
+
+    def _claim(self, connection, cutoff, skipped, order_ids=None):
+        """Lock up to batch_size eligible orders, skipping orders another archiver has locked"""
+        statement = select(Order.order_id).where(*_eligible(cutoff))
+        if order_ids is not None:
+            statement = statement.where(Order.order_id.in_(order_ids))
+        if skipped:
+            statement = statement.where(Order.order_id.notin_(skipped))
+        # SQL Server takes the lock as a table hint; other servers render FOR UPDATE SKIP LOCKED
+        statement = statement.with_hint(Order, "WITH (UPDLOCK, ROWLOCK, READPAST)", "mssql")
+        return connection.scalars(
+            statement.order_by(Order.order_id).limit(self.batch_size).with_for_update(skip_locked=True)
+        ).all()
+
+    def _archive_each(self, engine, location, order_ids, cutoff, skipped, failed):
+        """Archive a failed batch one order per transaction; orders that fail again are skipped"""
+        counts = {"orders": 0, "order_items": 0, "payments": 0}
+        for order_id in order_ids:
+            try:
+                with engine.begin() as connection:
+                    # Claimed again - another archiver may have taken the order meanwhile
+                    claimed = self._claim(connection, cutoff, skipped, order_ids=[order_id])
+                    archived = archive_batch(connection, claimed) if claimed else {}
+            except DBAPIError as e:
+                skipped.add(order_id)
+                failed.append({"location": location, "order_id": order_id, "error": str(e.orig)})
+                print(f"✗ WARNING: Order {order_id} ({location}) not archived: {str(e.orig)}")
+                continue
+            for table, count in archived.items():
+                counts[table] += count
+        return counts
+
+    def _throttle(self, engine, elapsed):
+        throttled = time.monotonic()
+        self._stop.wait(elapsed * (1 - self.duty_cycle) / self.duty_cycle)
+        deadline = time.monotonic() + ARCHIVE_MAX_BUSY_WAIT_SECONDS
+        while _api_busy(engine) and time.monotonic() < deadline and not self._stop.is_set():
+            self._stop.wait(0.5)
+        return time.monotonic() - throttled
+
+    def start(self, interval=ARCHIVE_INTERVAL_SECONDS):
+        """Start periodic archival in a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="archiver", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background archival thread (finishes the current batch)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.run()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"✗ Archival run failed: {str(e)}")
+            self._stop.wait(interval)
+
+    def status(self):
+        """
+        Archiver configuration and last run
+
+        Returns:
+            dict: Horizon, batch settings, last run statistics and error
+        """
+        return {
+            "enabled": ARCHIVE_ENABLED,
+            "locations": self.locations,
+            "horizon_days": self.horizon_days,
+            "cutoff": archive_cutoff(self.horizon_days).isoformat(),
+            "closed_statuses": ARCHIVE_CLOSED_STATUSES,
+            "batch_size": self.batch_size,
+            "duty_cycle": self.duty_cycle,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+
+# Process-wide archiver (None unless ARCHIVE_ENABLED)
+archiver = None
+
+
+def start_archiver():
+    """
+    Start background archival if enabled (every API worker runs one; batches do not overlap)
+
+    Returns:
+        Archiver: The running archiver, or None if disabled
+    """
+    global archiver
+    if not ARCHIVE_ENABLED:
+        return None
+    archiver = Archiver()
+    archiver.start()
+    return archiver
+
+
+def stop_archiver():
+    """Stop background archival"""
+    if archiver is not None:
+        archiver.stop()
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Archive closed orders past the horizon")
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS,
+                        help="Archive closed orders older than this many days")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Orders per transaction")
+    parser.add_argument("--duty-cycle", type=float, default=ARCHIVE_DUTY_CYCLE,
+                        help="Fraction of wall time spent archiving (0-1)")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after N batches")
+    parser.add_argument("--dry-run", action="store_true", help="Count eligible orders only")
+    parser.add_argument("--location", default=None, help="Archive this location's shard (default: main database)")
+    args = parser.parse_args(argv)
+
+    location = args.location or DEFAULT_LOCATION
+    try:
+        bind = sharding.router.engine_for(location)
+    except sharding.UnknownLocation as e:
+        parser.error(str(e))
+    revenue_totals_missing = not inspect(bind).has_table(ArchiveRevenueTotals.__tablename__)
+    for model in (ArchivedOrder, ArchivedOrderItem, ArchivedPayment, ArchiveTotals, ArchiveRevenueTotals):
+        model.__table__.create(bind, checkfirst=True)
+    if revenue_totals_missing:
+        with bind.begin() as connection:
+            print(f"✓ archive_revenue_totals: {rebuild_revenue_totals(connection)} values from the existing archive")
+
+    response_cache.register_listeners()  # Archived orders invalidate the API's cached responses
+    runner = Archiver(horizon_days=args.horizon_days, batch_size=args.batch_size, duty_cycle=args.duty_cycle,
+                      locations=[location])
+    print("=" * 60)
+    print(f"Order archival {location} (cutoff {archive_cutoff(args.horizon_days).isoformat()})")
+    print("=" * 60)
+    if args.dry_run:
+        print(f"  {runner.eligible_count()} closed orders eligible for archival")
+        return 0
+
+    stats = runner.run(max_batches=args.max_batches)
+    for table, count in stats["rows"].items():
+        print(f"✓ {table}: {count} rows archived")
+    if stats["failed_orders"]:
+        print(f"✗ {len(stats['failed_orders'])} orders could not be archived")
+    print(f"  {stats['batches']} batches, {stats['work_seconds']}s work, "
+          f"{stats['throttle_seconds']}s throttled")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
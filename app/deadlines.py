@@ -0,0 +1,251 @@
+"""
+Query Deadline Module
+Per-endpoint query deadlines with server-side statement cancellation
+
+Each limited request gets a deadline. Connections checked out by its session
+are armed with a driver/server timeout, and the running statement is cancelled
+when the deadline expires or the client disconnects:
+
+- SQL Server (pyodbc): connection query timeout + Cursor.cancel()
+- PostgreSQL: SET statement_timeout + connection.cancel()
+- SQLite: connection.interrupt()
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.sharding import UnknownLocation, router
+
+
+QUERY_DEADLINES_ENABLED = os.getenv("QUERY_DEADLINES_ENABLED", "True").lower() == "true"
+
+# (methods, path pattern, environment variable, default seconds) - first match wins.
+# Writes and the job routes get no deadline: jobs run under JOB_TIMEOUT_SECONDS and
+# /api/jobs/{job_id}/events is a long-lived event stream.
+ENDPOINT_DEADLINES = [
+    (("GET",), re.compile(r"^/api/orders/complete/all$"), "QUERY_DEADLINE_ORDERS_COMPLETE", 120.0),
+    (("GET", "POST"), re.compile(r"^/api/reconciliation(/.*)?$"), "QUERY_DEADLINE_RECONCILIATION", 300.0),
+    (("GET",), re.compile(r"^/api/orders/\d+$"), "QUERY_DEADLINE_ORDER_DETAIL", 5.0),
+    (("GET",), re.compile(r"^/api/orders$"), "QUERY_DEADLINE_ORDERS", 30.0),
+    (("GET",), re.compile(r"^/api/statistics/.*$"), "QUERY_DEADLINE_STATISTICS", 30.0),
+    (("GET",), re.compile(r"^/api/(?!jobs(/|$)).*$"), "QUERY_DEADLINE_DEFAULT", 30.0),
+]
+ENDPOINT_DEADLINES = [
+    (methods, pattern, float(os.getenv(variable, str(default))))
+    for methods, pattern, variable, default in ENDPOINT_DEADLINES
+]
+
+# Key under which a connection's active deadline is stored in its info dict
+_DEADLINE_KEY = "query_deadline"
+_CURSOR_KEY = "query_deadline_cursor"
+
+
+class QueryDeadlineExceeded(Exception):
+    """Raised when a statement would start after its request's deadline"""
+
+
+def deadline_for(method, path):
+    """
+    Deadline in seconds for a request
+
+    Returns:
+        float: Seconds, or None if the request has no deadline
+    """
+    for methods, pattern, seconds in ENDPOINT_DEADLINES:
+        if method in methods and pattern.match(path):
+            return seconds
+    return None
+
+
+class QueryDeadline:
+    """Deadline for one request and the pooled connections its session is using"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.cancelled_reason = None
+        self._connections = []
+        self._children = []
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def cancelled(self):
+        return self.cancelled_reason is not None
+
+    def child(self):
+        """
+        Deadline with the same expiry for one session of a cross-shard fan-out
+
+        Each child arms and disarms only its own connections; cancelling the
+        parent cancels every child.
+        """
+        child = QueryDeadline(self.seconds)
+        child.expires_at = self.expires_at
+        with self._lock:
+            self._children.append(child)
+        if self.cancelled:
+            child.cancel(self.cancelled_reason)
+        return child
+
+    def arm(self, connection):
+        """Apply the remaining time as a driver/server timeout on a connection"""
+        dbapi_connection = connection.connection.dbapi_connection
+        dialect = connection.dialect.name
+        remaining = self.remaining()
+        if remaining <= 0 or self.cancelled:
+            raise QueryDeadlineExceeded(self.cancelled_reason or "deadline exceeded")
+
+        if dialect == "mssql" and hasattr(dbapi_connection, "timeout"):
+            dbapi_connection.timeout = max(1, math.ceil(remaining))
+        elif dialect == "postgresql":
+            # SET LOCAL ends with the transaction; after_begin re-arms the next one
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+        connection.info[_DEADLINE_KEY] = self
+        with self._lock:
+            self._connections.append((connection, dbapi_connection, dialect))
+
+    def disarm(self):
+        """Remove timeouts so connections go back to the pool clean"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection, dbapi_connection, dialect in connections:
+            connection.info.pop(_DEADLINE_KEY, None)
+            connection.info.pop(_CURSOR_KEY, None)
+            try:
+                if dialect == "mssql" and hasattr(dbapi_connection, "timeout"):
+                    dbapi_connection.timeout = 0
+            except Exception:
+                # A cancelled connection may be unusable - let the pool discard it
+                connection.invalidate()
+
+    def cancel(self, reason):
+        """Cancel any statement currently running for this request (thread-safe)"""
+        if self.cancelled:
+            return
+        self.cancelled_reason = reason
+        with self._lock:
+            connections = list(self._connections)
+            children = list(self._children)
+        for child in children:
+            child.cancel(reason)
+        for connection, dbapi_connection, dialect in connections:
+            try:
+                if dialect == "mssql":
+                    cursor = connection.info.get(_CURSOR_KEY)
+                    if cursor is not None:
+                        cursor.cancel()
+                elif dialect == "postgresql":
+                    dbapi_connection.cancel()
+                elif dialect == "sqlite":
+                    dbapi_connection.interrupt()
+            except Exception as e:
+                print(f"✗ Failed to cancel statement: {str(e)}")
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _check_deadline(conn, cursor, statement, parameters, context, executemany):
+    deadline = conn.info.get(_DEADLINE_KEY)
+    if deadline is None:
+        return
+    if deadline.cancelled or deadline.remaining() <= 0:
+        raise QueryDeadlineExceeded(deadline.cancelled_reason or "deadline exceeded")
+    conn.info[_CURSOR_KEY] = cursor
+
+
+def get_db_with_deadline(request: Request):
+    """
+    Dependency function - database session bound to the request's query deadline,
+    on the shard of the ``location`` query parameter (main database if omitted)
+
+    Yields:
+        Session: SQLAlchemy database session
+    """
+    location = request.query_params.get("location")
+    try:
+        router.check(location)
+    except UnknownLocation as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    with router.session_scope(location, getattr(request.state, "query_deadline", None)) as db:
+        yield db
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware that starts each request's deadline timer, cancels its
+    statements on expiry or client disconnect, and turns the resulting error
+    into 504 Gateway Timeout.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        seconds = deadline_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if seconds is None:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = QueryDeadline(seconds)
+        scope.setdefault("state", {})["query_deadline"] = deadline
+        loop = asyncio.get_running_loop()
+        timer = loop.call_later(seconds, deadline.cancel, "deadline exceeded")
+
+        # Pump the receive channel so a client disconnect is seen while the endpoint runs
+        messages = asyncio.Queue()
+
+        async def pump():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    deadline.cancel("client disconnected")
+                    return
+
+        pump_task = asyncio.ensure_future(pump())
+        replaced = {}
+
+        async def send_with_timeout(message):
+            if message["type"] == "http.response.start":
+                if deadline.cancelled and message["status"] >= 500:
+                    replaced["sent"] = True
+                    await self._send_timeout(send, deadline)
+                    return
+            elif replaced:
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, messages.get, send_with_timeout)
+        finally:
+            timer.cancel()
+            pump_task.cancel()
+
+    @staticmethod
+    async def _send_timeout(send, deadline):
+        body = json.dumps({
+            "success": False,
+            "error": f"Query cancelled: {deadline.cancelled_reason} ({deadline.seconds:g}s limit)",
+            "status_code": 504
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
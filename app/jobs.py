@@ -0,0 +1,491 @@
+"""
+Background Report Jobs Module
+Runs heavy reports in a bounded process pool instead of the request handler
+
+A report submitted to /api/jobs runs in a worker process (spawn start method)
+that opens its own database connections, so full-dataset aggregation does not
+hold the API worker's GIL, threadpool or connection pool. The result is
+written as JSON to JOB_RESULT_DIR and reused for identical submissions until
+JOB_RESULT_TTL_SECONDS has passed. Job metadata is stored next to the result,
+so any API worker sharing the directory can answer status polls. The API
+worker that submitted a job touches its metadata file while the job is queued
+or running; a job whose file has not been touched for JOB_STALE_SECONDS lost
+its worker and is reported as failed.
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from app import sharding
+from app.deadlines import QueryDeadline
+
+
+# Job runner configuration from environment
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))  # Queued + running jobs per API worker
+JOB_RESULT_DIR = os.getenv("JOB_RESULT_DIR", "job_results")
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "300"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "600"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "30"))  # Unfinished job without a heartbeat
+JOB_HEARTBEAT_SECONDS = JOB_STALE_SECONDS / 3
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Status stream polling and keep-alive interval (seconds)
+EVENT_POLL_INTERVAL = 0.5
+EVENT_KEEPALIVE_INTERVAL = 15.0
+
+FINISHED_STATES = ("done", "failed")
+
+
+class InvalidJob(ValueError):
+    """Raised for an unknown report or invalid report parameters"""
+
+
+class JobQueueFull(Exception):
+    """Raised when JOB_MAX_PENDING jobs are already queued or running"""
+
+
+# ================================================================
+# REPORTS (run in the worker processes)
+# ================================================================
+
+def _report_orders_complete(deadline, location=None, start_date=None, end_date=None):
+    # Endpoint helpers are imported here so only worker processes load them for jobs
+    from app import main
+    start = date.fromisoformat(start_date) if start_date else None
+    end = date.fromisoformat(end_date) if end_date else None
+    with sharding.router.session_scope(location, deadline) as db:
+        return main.orders_complete_report(db, location, deadline, start=start, end=end)
+
+
+def _report_statistics(deadline, location=None):
+    from app import main
+    with sharding.router.session_scope(location, deadline) as db:
+        return {"success": True, "data": main.statistics_report(db, location, deadline)}
+
+
+def _report_revenue(deadline, group_by="date", location=None):
+    from app import main
+    with sharding.router.session_scope(location, deadline) as db:
+        rows, source = main.revenue_report(db, group_by, location, deadline)
+    return {
+        "success": True,
+        "source": source,
+        "group_by": group_by,
+        "data": [{**row, "revenue": float(row["revenue"] or 0)} for row in rows]
+    }
+
+
+def _report_reconciliation(deadline, anomaly_type=None, limit=100, location=None):
+    from app import reconciliation
+    with sharding.router.session_scope(location, deadline) as db:
+        run_id, issues, timings = reconciliation.run_reconciliation(db, persist=False)
+    if anomaly_type:
+        issues = {anomaly_type: issues[anomaly_type]}
+    return {
+        "success": True,
+        "data": {
+            "summary": reconciliation.summarize(issues),
+            "timings": timings,
+            "issues": reconciliation.to_records(issues, limit=limit)
+        }
+    }
+
+
+def _revenue_dimensions():
+    from app.analytics import REVENUE_DIMENSIONS
+    return REVENUE_DIMENSIONS
+
+
+def _anomaly_types():
+    from app.reconciliation import ANOMALY_TYPES
+    return ANOMALY_TYPES
+
+
+# Report name -> (function, {parameter: validator returning the cleaned value})
+REPORTS = {
+    "orders_complete": (_report_orders_complete, {
+        "start_date": lambda value: _iso_date(value, "start_date"),
+        "end_date": lambda value: _iso_date(value, "end_date"),
+    }),
+    "statistics": (_report_statistics, {}),
+    "revenue": (_report_revenue, {
+        "group_by": lambda value: _choice(value, _revenue_dimensions(), "group_by"),
+    }),
+    "reconciliation": (_report_reconciliation, {
+        "anomaly_type": lambda value: _choice(value, _anomaly_types(), "anomaly_type"),
+        "limit": lambda value: _bounded_int(value, 0, 10000, "limit"),
+    }),
+}
+
+
+def _choice(value, choices, name):
+    if value not in choices:
+        raise InvalidJob(f"Invalid {name} '{value}'. Use one of: {', '.join(choices)}")
+    return value
+
+
+def _iso_date(value, name):
+    try:
+        return date.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise InvalidJob(f"Invalid {name} '{value}' (expected YYYY-MM-DD)")
+
+
+def _bounded_int(value, low, high, name):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise InvalidJob(f"Invalid {name} '{value}' (expected an integer)")
+    if not low <= value <= high:
+        raise InvalidJob(f"Invalid {name} {value} (expected {low}-{high})")
+    return value
+
+
+def validate(report, params):
+    """
+    Check a report name and its parameters
+
+    Returns:
+        dict: Cleaned parameters (None values dropped)
+
+    Raises:
+        InvalidJob: Unknown report, unknown parameter or invalid value
+    """
+    if report not in REPORTS:
+        raise InvalidJob(f"Unknown report '{report}'. Use one of: {', '.join(REPORTS)}")
+    validators = REPORTS[report][1]
+    cleaned = {}
+    for name, value in (params or {}).items():
+        if value is None:
+            continue
+        if name == "location":
+            try:
+                sharding.router.check(value)
+            except sharding.UnknownLocation as e:
+                raise InvalidJob(str(e))
+            cleaned[name] = value
+        elif name in validators:
+            cleaned[name] = validators[name](value)
+        else:
+            raise InvalidJob(f"Unknown parameter '{name}' for report '{report}'")
+    return cleaned
+
+
+def _execute(job):
+    """Worker process entry point - run one report and write its result file"""
+    job.update(status="running", started_at=datetime.now().isoformat(), pid=os.getpid())
+    _save(job)
+
+    deadline = QueryDeadline(JOB_TIMEOUT_SECONDS)
+    timer = threading.Timer(JOB_TIMEOUT_SECONDS, deadline.cancel, args=("job timeout",))
+    timer.daemon = True
+    timer.start()
+    started = time.perf_counter()
+    try:
+        result = jsonable_encoder(REPORTS[job["report"]][0](deadline, **job["params"]))
+    finally:
+        timer.cancel()
+
+    path = job_path(job["job_id"], ".result.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(path + ".tmp", path)
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "result_bytes": os.path.getsize(path),
+    }
+
+
+# ================================================================
+# JOB STORE
+# ================================================================
+
+def job_path(job_id, suffix):
+    """
+    Path of a stored job artefact
+
+    Args:
+        job_id: 32-character hex job ID
+        suffix: ".json" for metadata, ".result.json" for the report result
+
+    Returns:
+        str: File path, or None if the ID is malformed
+    """
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    return os.path.join(JOB_RESULT_DIR, f"{job_id}{suffix}")
+
+
+def _save(job):
+    path = job_path(job["job_id"], ".json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    os.replace(path + ".tmp", path)
+
+
+def _fail_if_stale(job, modified_at):
+    """Mark an unfinished job failed when its owner stopped touching it (the worker died)"""
+    if job["status"] in FINISHED_STATES or time.time() - modified_at < JOB_STALE_SECONDS:
+        return job
+    job.update(
+        status="failed", finished_at=datetime.now().isoformat(),
+        error=f"API worker {job.get('owner_pid')} stopped before the job finished"
+    )
+    _save(job)
+    return job
+
+
+def load_job(job_id):
+    """
+    Load job metadata
+
+    Returns:
+        dict: Stored metadata, or None if not found
+    """
+    path = job_path(job_id, ".json")
+    if path is None:
+        return None
+    try:
+        modified_at = os.path.getmtime(path)
+        with open(path, encoding="utf-8") as f:
+            job = json.load(f)
+    except FileNotFoundError:
+        return None
+    return _fail_if_stale(job, modified_at)
+
+
+def list_jobs():
+    """
+    List stored jobs, newest first
+
+    Returns:
+        list: Metadata dicts
+    """
+    if not os.path.isdir(JOB_RESULT_DIR):
+        return []
+    jobs = []
+    for name in os.listdir(JOB_RESULT_DIR):
+        if name.endswith(".json") and not name.endswith(".result.json"):
+            job = load_job(name[:-5])
+            if job is not None:
+                jobs.append(job)
+    return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+
+async def job_events(job_id):
+    """
+    Server-sent events for a job - one ``status`` event per state change,
+    ending after the job is done or failed
+
+    Yields:
+        str: SSE frames
+    """
+    last_status = None
+    idle = 0.0
+    while True:
+        job = load_job(job_id)
+        if job is None:
+            yield f"event: error\ndata: {json.dumps({'error': f'Job {job_id} not found'})}\n\n"
+            return
+        if job["status"] != last_status:
+            last_status = job["status"]
+            idle = 0.0
+            yield f"event: status\ndata: {json.dumps(job)}\n\n"
+        if job["status"] in FINISHED_STATES:
+            return
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+        idle += EVENT_POLL_INTERVAL
+        if idle >= EVENT_KEEPALIVE_INTERVAL:
+            idle = 0.0
+            yield ": keep-alive\n\n"
+
+
+def cache_key(report, params):
+    """Stable key for a report and its cleaned parameters"""
+    return hashlib.sha1(json.dumps([report, params], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class JobRunner:
+    """
+    Bounded process pool for report jobs, with reuse of recent results.
+
+    Submissions beyond ``max_pending`` queued or running jobs are refused
+    with JobQueueFull instead of growing an unbounded backlog. A heartbeat
+    thread touches the metadata of this worker's pending jobs.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, result_ttl=JOB_RESULT_TTL_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.pending = 0
+        self._by_key = {}  # cache key -> job_id of the latest job
+        self._pending_ids = set()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, report, params=None, refresh=False):
+        """
+        Queue a report, or return the job already holding its result
+
+        Args:
+            report: Report name (see REPORTS)
+            params: Report parameters
+            refresh: Run again even if a cached result exists
+
+        Returns:
+            dict: Job metadata, with "reused" set when an existing job was returned
+
+        Raises:
+            InvalidJob: Unknown report or invalid parameters
+            JobQueueFull: Too many jobs queued or running
+        """
+        params = validate(report, params)
+        key = cache_key(report, params)
+        os.makedirs(JOB_RESULT_DIR, exist_ok=True)
+
+        with self._lock:
+            self._expire()
+            existing = self._by_key.get(key)
+            job = load_job(existing) if existing else None
+            if job is not None and not refresh and job["status"] != "failed":
+                return {**job, "reused": True}
+            if self.pending >= self.max_pending:
+                raise JobQueueFull(f"{self.pending} report jobs already queued or running")
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "report": report,
+                "params": params,
+                "cache_key": key,
+                "status": "queued",
+                "created_at": datetime.now().isoformat(),
+                "owner_pid": os.getpid(),
+            }
+            _save(job)
+            self._start_heartbeat()
+            try:
+                future = self._get_executor().submit(_execute, job)
+            except BrokenProcessPool:
+                self._executor = None
+                future = self._get_executor().submit(_execute, job)
+            self._by_key[key] = job["job_id"]
+            self._pending_ids.add(job["job_id"])
+            self.pending += 1
+
+        future.add_done_callback(lambda done: self._finished(job, done))
+        return {**job, "reused": False}
+
+    def _finished(self, job, future):
+        # Runs in the executor's management thread
+        job = load_job(job["job_id"]) or job
+        error = None
+        if future.cancelled():
+            job.update(status="failed", error="cancelled")
+        else:
+            error = future.exception()
+            if error is None:
+                job.update(future.result(), status="done")
+            else:
+                job.update(status="failed", error=str(error) or type(error).__name__)
+                print(f"✗ Report job {job['job_id']} ({job['report']}) failed: {job['error']}")
+        job["finished_at"] = datetime.now().isoformat()
+        _save(job)
+        with self._lock:
+            self.pending -= 1
+            self._pending_ids.discard(job["job_id"])
+            if isinstance(error, BrokenProcessPool):
+                self._executor = None
+
+    def _start_heartbeat(self):
+        # Caller holds the lock
+        if self._heartbeat is None:
+            self._stop.clear()
+            self._heartbeat = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+    def _beat(self):
+        while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+            with self._lock:
+                job_ids = list(self._pending_ids)
+            for job_id in job_ids:
+                try:
+                    os.utime(job_path(job_id, ".json"))
+                except FileNotFoundError:
+                    pass
+
+    def _expire(self):
+        """
+        Delete finished jobs older than the result TTL (caller holds the lock)
+
+        Only metadata files last written before the cutoff are read - a pending
+        job's file is touched by its heartbeat, a finished job's when it finished.
+        """
+        if not os.path.isdir(JOB_RESULT_DIR):
+            return
+        cutoff = time.time() - self.result_ttl
+        for entry in os.scandir(JOB_RESULT_DIR):
+            if not entry.name.endswith(".json") or entry.name.endswith(".result.json"):
+                continue
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            job = load_job(entry.name[:-5])  # A stale unfinished job is failed here and expires a TTL later
+            if job is None or job["status"] not in FINISHED_STATES or job["job_id"] in self._pending_ids:
+                continue
+            if datetime.fromisoformat(job["finished_at"]).timestamp() >= cutoff:
+                continue
+            for suffix in (".json", ".result.json"):
+                path = job_path(job["job_id"], suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+            if self._by_key.get(job["cache_key"]) == job["job_id"]:
+                del self._by_key[job["cache_key"]]
+
+    def status(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "result_ttl_seconds": self.result_ttl,
+        }
+
+    def shutdown(self):
+        """Cancel queued jobs and stop the worker processes"""
+        self._stop.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+            heartbeat, self._heartbeat = self._heartbeat, None
+        if heartbeat is not None:
+            heartbeat.join(timeout=5)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide job runner (worker processes start on the first submission)
+runner = JobRunner()
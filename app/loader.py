@@ -0,0 +1,580 @@
+"""
+Bulk Data Loader Module
+Streams CSV / NDJSON order history into orders, order_items and payments
+
+Usage:
+    python -m app.loader --orders orders.csv --order-items order_items.ndjson --payments payments.csv
+    python -m app.loader --orders orders.csv.gz --chunk-size 20000 --indexes disable
+    python -m app.loader --location airport --orders airport_orders.csv --payments airport_payments.csv
+
+Rows are validated in memory (item IDs against the menu tables, order and
+payment IDs against bitmaps of existing keys) and inserted in chunks. Each
+chunk commits together with its checkpoint, so a failed load resumes from the
+last committed record when the same command is run again. Rejected records
+are appended to an NDJSON rejects file with the reason.
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import inspect, insert, select, update
+
+from app import response_cache, sharding
+from app.database import DEFAULT_LOCATION
+from app.models import Order, OrderItem, Payment, Item, LoadCheckpoint
+
+
+# Loader configuration from environment
+LOADER_CHUNK_SIZE = int(os.getenv("LOADER_CHUNK_SIZE", "5000"))
+LOADER_INDEX_THRESHOLD_MB = float(os.getenv("LOADER_INDEX_THRESHOLD_MB", "100"))
+
+# Tables in load order (payments and order items reference orders)
+LOAD_ORDER = ("orders", "order_items", "payments")
+
+# Checkpoint row holding the secondary indexes disabled by a running load
+INDEX_CHECKPOINT_KEY = "indexes"
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5.0
+
+
+class LoadError(Exception):
+    """Raised when a load cannot start or must stop"""
+
+
+class RejectedRecord(Exception):
+    """Raised by a converter when a record fails validation"""
+
+
+class IdSet:
+    """
+    Membership set for integer keys - one bit per ID up to MAX_BITMAP_ID,
+    a plain set above it. Holds millions of order IDs in a few MiB.
+    """
+
+    __slots__ = ("bits", "overflow")
+
+    MAX_BITMAP_ID = 1 << 30
+
+    def __init__(self):
+        self.bits = bytearray()
+        self.overflow = set()
+
+    def add(self, value):
+        if 0 <= value < self.MAX_BITMAP_ID:
+            index = value >> 3
+            if index >= len(self.bits):
+                self.bits.extend(bytes(max(index + 1 - len(self.bits), len(self.bits))))
+            self.bits[index] |= 1 << (value & 7)
+        else:
+            self.overflow.add(value)
+
+    def __contains__(self, value):
+        if 0 <= value < self.MAX_BITMAP_ID:
+            index = value >> 3
+            return index < len(self.bits) and bool(self.bits[index] & (1 << (value & 7)))
+        return value in self.overflow
+
+
+# ================================================================
+# SOURCE READERS
+# ================================================================
+
+def _open_source(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_records(path):
+    """
+    Stream records from a CSV or NDJSON file (optionally gzip-compressed)
+
+    Yields:
+        dict: One record per CSV row / JSON line
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    with _open_source(path) as f:
+        if name.endswith(".csv"):
+            yield from csv.DictReader(f)
+        elif name.endswith((".ndjson", ".jsonl")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise LoadError(f"Unsupported file type: {path} (use .csv, .ndjson or .jsonl)")
+
+
+def fingerprint(path):
+    """Size and modification time - a changed file must not resume an old checkpoint"""
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+# ================================================================
+# VALIDATION
+# ================================================================
+
+def _value(record, field, required=True):
+    value = record.get(field)
+    if isinstance(value, str):
+        value = value.strip()
+    if value is None or value == "":
+        if required:
+            raise RejectedRecord(f"missing {field}")
+        return None
+    return value
+
+
+def _int(record, field, required=True, default=None):
+    value = _value(record, field, required)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RejectedRecord(f"invalid {field}: {value!r}")
+
+
+def _decimal(record, field, required=True, default=None):
+    value = _value(record, field, required)
+    if value is None:
+        return default
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise RejectedRecord(f"invalid {field}: {value!r}")
+    if not amount.is_finite():
+        raise RejectedRecord(f"invalid {field}: {value!r}")
+    return amount
+
+
+def _date(record, field):
+    value = _value(record, field)
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise RejectedRecord(f"invalid {field}: {value!r}")
+
+
+def _str(record, field, required=True, default=None):
+    value = _value(record, field, required)
+    return default if value is None else str(value)
+
+
+class KeyIndex:
+    """In-memory keys used for foreign key and duplicate checks"""
+
+    def __init__(self, item_ids, order_ids, payment_ids):
+        self.item_ids = item_ids
+        self.order_ids = order_ids
+        self.payment_ids = payment_ids
+
+    @classmethod
+    def load(cls, connection, batch_size=100000):
+        """Read item, order and payment IDs once instead of querying per row"""
+        item_ids = set(connection.execute(select(Item.item_id)).scalars())
+        keys = []
+        for column in (Order.order_id, Payment.payment_id):
+            ids = IdSet()
+            result = connection.execution_options(yield_per=batch_size).execute(select(column))
+            for partition in result.scalars().partitions(batch_size):
+                for value in partition:
+                    ids.add(value)
+            keys.append(ids)
+        return cls(item_ids, *keys)
+
+
+def convert_order(record, keys):
+    order_id = _int(record, "order_id")
+    if order_id in keys.order_ids:
+        raise RejectedRecord(f"duplicate order_id {order_id}")
+    row = {
+        "order_id": order_id,
+        "order_date": _date(record, "order_date"),
+        "order_status": _str(record, "order_status", required=False, default="Pending"),
+    }
+    keys.order_ids.add(order_id)
+    return row
+
+
+def convert_order_item(record, keys):
+    order_id = _int(record, "order_id")
+    item_id = _int(record, "item_id")
+    if order_id not in keys.order_ids:
+        raise RejectedRecord(f"unknown order_id {order_id}")
+    if item_id not in keys.item_ids:
+        raise RejectedRecord(f"unknown item_id {item_id}")
+    price = _decimal(record, "price")
+    quantity = _int(record, "quantity", required=False, default=1)
+    return {
+        "order_id": order_id,
+        "item_id": item_id,
+        "size": _str(record, "size", required=False),
+        "price": price,
+        "quantity": quantity,
+        "total": _decimal(record, "total", required=False, default=price * quantity),
+    }
+
+
+def convert_payment(record, keys):
+    payment_id = _int(record, "payment_id")
+    order_id = _int(record, "order_id")
+    if payment_id in keys.payment_ids:
+        raise RejectedRecord(f"duplicate payment_id {payment_id}")
+    if order_id not in keys.order_ids:
+        raise RejectedRecord(f"unknown order_id {order_id}")
+    row = {
+        "payment_id": payment_id,
+        "order_id": order_id,
+        "payment_date": _date(record, "payment_date"),
+        "amount_due": _decimal(record, "amount_due"),
+        "tips": _decimal(record, "tips", required=False, default=Decimal("0")),
+        "discount": _decimal(record, "discount", required=False, default=Decimal("0")),
+        "total_paid": _decimal(record, "total_paid"),
+        "payment_type": _str(record, "payment_type"),
+        "payment_status": _str(record, "payment_status", required=False, default="Pending"),
+    }
+    keys.payment_ids.add(payment_id)
+    return row
+
+
+# Table name -> (ORM model, record converter)
+TABLES = {
+    "orders": (Order, convert_order),
+    "order_items": (OrderItem, convert_order_item),
+    "payments": (Payment, convert_payment),
+}
+
+
+# ================================================================
+# CHECKPOINTS
+# ================================================================
+
+def _get_checkpoint(connection, load_key):
+    return connection.execute(
+        select(LoadCheckpoint).where(LoadCheckpoint.load_key == load_key)
+    ).first()
+
+
+def _save_checkpoint(connection, load_key, **values):
+    updated = connection.execute(
+        update(LoadCheckpoint).where(LoadCheckpoint.load_key == load_key).values(**values)
+    )
+    if updated.rowcount == 0:
+        connection.execute(insert(LoadCheckpoint).values(load_key=load_key, **values))
+
+
+def _delete_checkpoint(connection, load_key):
+    connection.execute(LoadCheckpoint.__table__.delete().where(LoadCheckpoint.load_key == load_key))
+
+
+# ================================================================
+# SECONDARY INDEXES
+# ================================================================
+
+def _secondary_indexes(connection, tables):
+    """Non-unique, column-only indexes on the target tables"""
+    inspector = inspect(connection)
+    indexes = []
+    for table in tables:
+        for index in inspector.get_indexes(table):
+            columns = index.get("column_names") or []
+            if index.get("unique") or not columns or None in columns:
+                continue
+            indexes.append({"table": table, "name": index["name"], "columns": columns})
+    return indexes
+
+
+def disable_indexes(tables, bind):
+    """
+    Disable (SQL Server) or drop (other backends) secondary indexes before a large load
+
+    The definitions are saved in load_checkpoints first, so an interrupted load
+    still rebuilds them on its next run.
+
+    Args:
+        tables: Table names
+        bind: Engine of the target database
+
+    Returns:
+        list: Index definitions to pass to rebuild_indexes
+    """
+    with bind.begin() as connection:
+        saved = _get_checkpoint(connection, INDEX_CHECKPOINT_KEY)
+        indexes = json.loads(saved.detail) if saved is not None else []
+        known = {(index["table"], index["name"]) for index in indexes}
+        indexes += [
+            index for index in _secondary_indexes(connection, tables)
+            if (index["table"], index["name"]) not in known
+        ]
+        _save_checkpoint(connection, INDEX_CHECKPOINT_KEY, detail=json.dumps(indexes), rows_done=0)
+
+    with bind.begin() as connection:
+        quote = connection.dialect.identifier_preparer.quote
+        for index in indexes:
+            if connection.dialect.name == "mssql":
+                connection.exec_driver_sql(
+                    f"ALTER INDEX {quote(index['name'])} ON {quote(index['table'])} DISABLE"
+                )
+            else:
+                connection.exec_driver_sql(f"DROP INDEX IF EXISTS {quote(index['name'])}")
+    return indexes
+
+
+def rebuild_indexes(indexes, bind):
+    """Rebuild (SQL Server) or recreate (other backends) the indexes removed by disable_indexes"""
+    with bind.begin() as connection:
+        quote = connection.dialect.identifier_preparer.quote
+        existing = {(index["table"], index["name"]) for index in _secondary_indexes(
+            connection, {index["table"] for index in indexes}
+        )}
+        for index in indexes:
+            if connection.dialect.name == "mssql":
+                connection.exec_driver_sql(
+                    f"ALTER INDEX {quote(index['name'])} ON {quote(index['table'])} REBUILD"
+                )
+            elif (index["table"], index["name"]) not in existing:
+                columns = ", ".join(quote(column) for column in index["columns"])
+                connection.exec_driver_sql(
+                    f"CREATE INDEX {quote(index['name'])} ON {quote(index['table'])} ({columns})"
+                )
+        _delete_checkpoint(connection, INDEX_CHECKPOINT_KEY)
+
+
+# ================================================================
+# LOADING
+# ================================================================
+
+class TableStats:
+    """Row counts and timing for one source file"""
+
+    def __init__(self, table, path):
+        self.table = table
+        self.path = path
+        self.loaded = 0
+        self.rejected = 0
+        self.skipped = 0
+        self.seconds = 0.0
+        self.already_complete = False
+
+    @property
+    def rows_per_second(self):
+        return self.loaded / self.seconds if self.seconds else 0.0
+
+
+def load_file(table, path, keys, chunk_size=LOADER_CHUNK_SIZE, restart=False, rejects=None, max_rejects=None,
+              location=None):
+    """
+    Load one source file into a table in committed chunks
+
+    Args:
+        table: "orders", "order_items" or "payments"
+        path: CSV or NDJSON file
+        keys: KeyIndex used for validation (updated as rows are accepted)
+        chunk_size: Records per insert/commit
+        restart: Ignore an existing checkpoint for this file
+        rejects: Writable text file for rejected records, or None
+        max_rejects: Stop the load after this many rejected records
+        location: Restaurant location - selects the shard and is stored on orders and payments
+
+    Returns:
+        TableStats: Loaded, rejected and skipped counts with timing
+    """
+    model, convert = TABLES[table]
+    bind = sharding.router.engine_for(location)
+    stamp = "location" in model.__table__.c
+    load_key = f"{table}:{os.path.abspath(path)}"
+    source_fingerprint = fingerprint(path)
+    stats = TableStats(table, path)
+
+    with bind.connect() as connection:
+        checkpoint = _get_checkpoint(connection, load_key)
+    resume_from = 0
+    if checkpoint is not None and not restart:
+        if checkpoint.fingerprint != source_fingerprint:
+            raise LoadError(
+                f"{path} changed since its checkpoint ({checkpoint.rows_done} records loaded); "
+                f"use --restart to load it from the beginning"
+            )
+        if checkpoint.completed:
+            stats.already_complete = True
+            return stats
+        resume_from = checkpoint.rows_done
+
+    started = time.perf_counter()
+    last_progress = started
+    consumed = 0
+    chunk = []
+
+    def commit(completed=False):
+        with bind.begin() as connection:
+            if chunk:
+                connection.execute(insert(model.__table__), chunk)
+            _save_checkpoint(
+                connection, load_key,
+                fingerprint=source_fingerprint, rows_done=consumed, completed=completed
+            )
+        stats.loaded += len(chunk)
+        chunk.clear()
+
+    for record in read_records(path):
+        consumed += 1
+        if consumed <= resume_from:
+            # Already committed - its keys were read from the database by KeyIndex.load
+            stats.skipped += 1
+            continue
+        try:
+            row = convert(record, keys)
+            if stamp:
+                row["location"] = location or DEFAULT_LOCATION
+            chunk.append(row)
+        except RejectedRecord as e:
+            stats.rejected += 1
+            if rejects is not None:
+                rejects.write(json.dumps(
+                    {"table": table, "source": path, "record": consumed, "reason": str(e), "data": record},
+                    default=str
+                ) + "\n")
+            if max_rejects is not None and stats.rejected > max_rejects:
+                commit()
+                stats.seconds = time.perf_counter() - started
+                raise LoadError(f"{path}: more than {max_rejects} rejected records, stopping")
+        if len(chunk) >= chunk_size:
+            commit()
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                print(f"  {table}: {stats.loaded} rows ({stats.loaded / (now - started):.0f} rows/s)")
+
+    commit(completed=True)
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def run_load(sources, chunk_size=LOADER_CHUNK_SIZE, index_mode="auto", restart=False,
+             rejects_path="load_rejects.ndjson", max_rejects=None, location=None):
+    """
+    Load several source files in foreign key order
+
+    Args:
+        sources: Mapping of table name to source file path
+        chunk_size: Records per insert/commit
+        index_mode: "auto" (disable for inputs over LOADER_INDEX_THRESHOLD_MB), "disable" or "keep"
+        restart: Ignore existing checkpoints
+        rejects_path: NDJSON file that rejected records are appended to
+        max_rejects: Stop a file after this many rejected records
+        location: Restaurant location to load into (default: main database)
+
+    Returns:
+        tuple: (list of TableStats, index rebuild seconds or None)
+    """
+    try:
+        bind = sharding.router.engine_for(location)
+    except sharding.UnknownLocation as e:
+        raise LoadError(str(e))
+    for table, path in sources.items():
+        if table not in TABLES:
+            raise LoadError(f"Unknown table: {table}")
+        if not os.path.exists(path):
+            raise LoadError(f"File not found: {path}")
+
+    # Make sure the checkpoint table exists on databases created from schema.sql before it was added
+    LoadCheckpoint.__table__.create(bind, checkfirst=True)
+
+    total_mb = sum(os.path.getsize(path) for path in sources.values()) / (1024 * 1024)
+    with bind.connect() as connection:
+        interrupted = _get_checkpoint(connection, INDEX_CHECKPOINT_KEY) is not None
+        keys = KeyIndex.load(connection)
+
+    tables = [table for table in LOAD_ORDER if table in sources]
+    drop = index_mode == "disable" or interrupted or (
+        index_mode == "auto" and total_mb >= LOADER_INDEX_THRESHOLD_MB
+    )
+    indexes = disable_indexes(tables, bind) if drop else None
+
+    results = []
+    rebuild_seconds = None
+    with open(rejects_path, "a", encoding="utf-8") as rejects:
+        try:
+            for table in tables:
+                results.append(load_file(
+                    table, sources[table], keys,
+                    chunk_size=chunk_size, restart=restart, rejects=rejects, max_rejects=max_rejects,
+                    location=location
+                ))
+        finally:
+            if indexes is not None:
+                started = time.perf_counter()
+                rebuild_indexes(indexes, bind)
+                rebuild_seconds = time.perf_counter() - started
+    return results, rebuild_seconds
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Bulk load CSV / NDJSON order history")
+    parser.add_argument("--orders", metavar="FILE", help="Orders source file")
+    parser.add_argument("--order-items", metavar="FILE", help="Order items source file")
+    parser.add_argument("--payments", metavar="FILE", help="Payments source file")
+    parser.add_argument("--chunk-size", type=int, default=LOADER_CHUNK_SIZE,
+                        help="Records per bulk insert and commit")
+    parser.add_argument("--indexes", choices=("auto", "disable", "keep"), default="auto",
+                        help=f"Disable secondary indexes during the load (auto: inputs over "
+                             f"{LOADER_INDEX_THRESHOLD_MB:g} MB)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore checkpoints and load every file from the beginning")
+    parser.add_argument("--rejects", default="load_rejects.ndjson", metavar="FILE",
+                        help="Append rejected records here")
+    parser.add_argument("--max-rejects", type=int, default=None, metavar="N",
+                        help="Stop a file after N rejected records")
+    parser.add_argument("--location", default=None,
+                        help=f"Restaurant location to load into (default: {DEFAULT_LOCATION}, the main database)")
+    args = parser.parse_args(argv)
+
+    sources = {
+        table: path for table, path in
+        (("orders", args.orders), ("order_items", args.order_items), ("payments", args.payments))
+        if path
+    }
+    if not sources:
+        parser.error("give at least one of --orders, --order-items, --payments")
+
+    response_cache.register_listeners()  # Loaded rows invalidate the API's cached responses
+    print("=" * 60)
+    print("BULK DATA LOAD")
+    print("=" * 60)
+    try:
+        results, rebuild_seconds = run_load(
+            sources, chunk_size=args.chunk_size, index_mode=args.indexes, restart=args.restart,
+            rejects_path=args.rejects, max_rejects=args.max_rejects, location=args.location
+        )
+    except LoadError as e:
+        print(f"✗ {str(e)}")
+        print("  Committed chunks are kept - run the same command again to resume")
+        return 1
+
+    rejected = 0
+    for stats in results:
+        if stats.already_complete:
+            print(f"✓ {stats.table}: {stats.path} already loaded (checkpoint complete)")
+            continue
+        resumed = f", {stats.skipped} skipped (resumed)" if stats.skipped else ""
+        print(f"✓ {stats.table}: {stats.loaded} rows in {stats.seconds:.2f}s "
+              f"({stats.rows_per_second:.0f} rows/s), {stats.rejected} rejected{resumed}")
+        rejected += stats.rejected
+    if rebuild_seconds is not None:
+        print(f"✓ Secondary indexes rebuilt in {rebuild_seconds:.2f}s")
+    if rejected:
+        print(f"⚠️ {rejected} rejected record(s) written to {args.rejects}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -3,30 +3,34 @@ FastAPI Restaurant Order Management System
 Main application file with API endpoints
 """
 
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi import APIRouter, FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.orm import Session
 from typing import List, Optional
 from decimal import Decimal
 import os
-from dotenv import load_dotenv
+import threading
 
-from app.database import get_db, test_connection
-from app.models import Order, OrderItem, Payment, Item, Category, Menu
+from app.database import DEFAULT_LOCATION, test_connection
 from app.schemas import (
     OrderDetailResponse, OrderSummary, OrderItemResponse, 
-    PaymentResponse, SuccessResponse, ErrorResponse
+    PaymentResponse, SuccessResponse, ErrorResponse, JobRequest,
+    OrderCreate, OrderUpdate, OrderItemCreate, PaymentCreate, PaymentUpdate
 )
+from app import (
+    admission, analytics, archive, jobs, profiling, queries, read_model, response_cache, search, sharding,
+    write_queue
+)
+from app.deadlines import DeadlineMiddleware, QUERY_DEADLINES_ENABLED, get_db_with_deadline
+from datetime import date as date_type
 
-# Load environment variables
-load_dotenv()
+# Startup configuration from environment (.env is loaded by app.database)
+API_DOCS_ENABLED = os.getenv("API_DOCS_ENABLED", "True").lower() == "true"
+STARTUP_DB_CHECK = os.getenv("STARTUP_DB_CHECK", "True").lower() == "true"
 
-# Create FastAPI app
-app = FastAPI(
-    title="Restaurant Order Management API",
-    description="""
+API_DESCRIPTION = """
     ## Fullstack Developer Assessment - Python API
     
     A comprehensive REST API for managing restaurant orders, payments, and menu items.
@@ -47,34 +51,17 @@ app = FastAPI(
     * Database connection pooling
     * Indexed queries for fast lookups
     * Optimized joins with eager loading
-    """,
-    version="1.0.0",
-    contact={
-        "name": "API Support",
-        "email": "support@restaurant-api.com"
-    },
-    license_info={
-        "name": "MIT",
-        "url": "https://opensource.org/licenses/MIT"
-    }
-)
+    """
 
-# Configure CORS
-allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Endpoints are registered on this router; create_app() mounts it on a FastAPI app.
+# Opt-in per-request profiling needs its route class before the routes are added.
+router = APIRouter(route_class=profiling.ProfiledRoute if profiling.profiling_configured() else APIRoute)
 
 
 # ================================================================
 # EXCEPTION HANDLERS
 # ================================================================
 
-@app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """Custom HTTP exception handler"""
     return JSONResponse(
@@ -83,11 +70,11 @@ async def http_exception_handler(request, exc):
             "success": False,
             "error": exc.detail,
             "status_code": exc.status_code
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 
-@app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """General exception handler for unexpected errors"""
     return JSONResponse(
@@ -104,7 +91,7 @@ async def general_exception_handler(request, exc):
 # HEALTH CHECK ENDPOINTS
 # ================================================================
 
-@app.get("/", tags=["Health"])
+@router.get("/", tags=["Health"])
 async def root():
     """
     Root endpoint - API information
@@ -118,7 +105,7 @@ async def root():
     }
 
 
-@app.get("/health", tags=["Health"])
+@router.get("/health", tags=["Health"])
 async def health_check():
     """
     Health check endpoint - Verifies database connectivity
@@ -136,7 +123,81 @@ async def health_check():
 # ORDER ENDPOINTS
 # ================================================================
 
-@app.get(
+LOCATION_QUERY = Query(None, description="Restaurant location (all locations when omitted)")
+
+
+def _all_locations(location):
+    """True when a request without a location has to read every shard"""
+    return location is None and sharding.router.sharded
+
+
+def _request_deadline(request):
+    return getattr(request.state, "query_deadline", None)
+
+
+def build_order_detail(order):
+    """
+    Build the complete order response from an eagerly loaded order
+    
+    Args:
+        order: Order or ArchivedOrder with items (item, category, menu) and payments loaded
+    
+    Returns:
+        OrderDetailResponse: Order with items, payments and calculated totals
+    """
+    # Build order items response
+    items_response = []
+    order_subtotal = Decimal('0.00')
+    
+    for order_item in order.order_items:
+        items_response.append(OrderItemResponse(
+            id=order_item.id,
+            item_id=order_item.item_id,
+            item_name=order_item.item.item_name,
+            category_name=order_item.item.category.category_name,
+            menu_name=order_item.item.menu.menu_name,
+            size=order_item.size,
+            price=order_item.price,
+            quantity=order_item.quantity,
+            total=order_item.total
+        ))
+        order_subtotal += order_item.total
+    
+    # Build payments response
+    payments_response = []
+    total_paid = Decimal('0.00')
+    
+    for payment in order.payments:
+        payments_response.append(PaymentResponse(
+            payment_id=payment.payment_id,
+            payment_date=payment.payment_date,
+            amount_due=payment.amount_due,
+            tips=payment.tips,
+            discount=payment.discount,
+            total_paid=payment.total_paid,
+            payment_type=payment.payment_type,
+            payment_status=payment.payment_status
+        ))
+        if payment.payment_status == 'Completed':
+            total_paid += payment.total_paid
+    
+    # Build complete response
+    return OrderDetailResponse(
+        order_id=order.order_id,
+        order_date=order.order_date,
+        order_status=order.order_status,
+        location=order.location,
+        created_at=order.created_at,
+        items=items_response,
+        payments=payments_response,
+        total_items_count=len(items_response),
+        order_subtotal=order_subtotal,
+        total_paid=total_paid,
+        payment_balance=order_subtotal - total_paid
+    )
+
+
+@router.get(
     "/api/orders",
     response_model=List[OrderSummary],
     tags=["Orders"],
@@ -148,54 +209,45 @@ async def health_check():
     - Balance due
     - Item count
     
+    Without a date filter only active (non-archived) orders are listed; with
+    `date`, `start_date` or `end_date` archived orders in the range are included.
+    Without `location` the lists of all locations are merged.
+    
     **Performance**: Optimized query with aggregations
     """
 )
-async def get_orders_summary(
+def get_orders_summary(
+    request: Request,
     status: Optional[str] = Query(None, description="Filter by order status (e.g., 'Completed')"),
-    date: Optional[str] = Query(None, description="Filter by order date (YYYY-MM-DD format)"),
-    db: Session = Depends(get_db)
+    date: Optional[date_type] = Query(None, description="Filter by order date (YYYY-MM-DD format)"),
+    start_date: Optional[date_type] = Query(None, description="Orders on or after this date (YYYY-MM-DD)"),
+    end_date: Optional[date_type] = Query(None, description="Orders on or before this date (YYYY-MM-DD)"),
+    location: Optional[str] = LOCATION_QUERY,
+    db: Session = Depends(get_db_with_deadline)
 ):
     """Get all orders with summary information"""
     try:
-        # Base query
-        query = db.query(Order)
-        
-        # Apply filters
-        if status:
-            query = query.filter(Order.order_status == status)
+        start, end = start_date, end_date
         if date:
-            query = query.filter(Order.order_date == date)
+            start = end = date
+        
+        def shard_summaries(db, shard_location):
+            summaries = _hot_order_summaries(db, status, start, end, shard_location)
+            # Date-bounded lists also reach archived orders
+            if start is not None or end is not None:
+                summaries += archive.archived_summaries(db, status=status, start=start, end=end)
+            return summaries
         
-        orders = query.order_by(desc(Order.order_date), desc(Order.order_id)).all()
+        if _all_locations(location):
+            result = [
+                summary for summaries in sharding.router.fan_out(shard_summaries, _request_deadline(request)).values()
+                for summary in summaries
+            ]
+        else:
+            result = shard_summaries(db, location)
         
-        result = []
-        for order in orders:
-            # Calculate order total
-            order_total = db.query(func.sum(OrderItem.total)).filter(
-                OrderItem.order_id == order.order_id
-            ).scalar() or Decimal('0.00')
-            
-            # Calculate total payments
-            total_payments = db.query(func.sum(Payment.total_paid)).filter(
-                Payment.order_id == order.order_id,
-                Payment.payment_status == 'Completed'
-            ).scalar() or Decimal('0.00')
-            
-            # Count items
-            total_items = db.query(func.count(OrderItem.id)).filter(
-                OrderItem.order_id == order.order_id
-            ).scalar() or 0
-            
-            result.append(OrderSummary(
-                order_id=order.order_id,
-                order_date=order.order_date,
-                order_status=order.order_status,
-                total_items=total_items,
-                order_total=order_total,
-                total_payments=total_payments,
-                payment_balance=order_total - total_payments
-            ))
+        if start is not None or end is not None or _all_locations(location):
+            result.sort(key=lambda summary: (summary.order_date, summary.order_id), reverse=True)
         
         return result
         
@@ -206,7 +258,54 @@ async def get_orders_summary(
         )
 
 
-@app.get(
+def _hot_order_summaries(db, status, start, end, location=None):
+    """Summaries of active orders from the read model or the hot tables"""
+    # Serve from the in-memory read model when enabled (it holds the main database only)
+    model = read_model.get_read_model() if sharding.router.is_default(location) else None
+    if model is not None:
+        order_ids = model.order_ids(status=status, start=start, end=end)
+        return [model.summary(order_id) for order_id in order_ids]
+    
+    # Prebuilt statement for this filter combination
+    statement = queries.ORDER_LIST[(bool(status), start is not None, end is not None)]
+    params = {}
+    if status:
+        params["status"] = status
+    if start is not None:
+        params["start_date"] = start
+    if end is not None:
+        params["end_date"] = end
+    
+    orders = db.scalars(statement, params).all()
+    
+    result = []
+    for order in orders:
+        params = {"order_id": order.order_id}
+        
+        # Calculate order total
+        order_total = db.scalar(queries.ORDER_ITEMS_TOTAL, params) or Decimal('0.00')
+        
+        # Calculate total payments
+        total_payments = db.scalar(queries.ORDER_PAYMENTS_TOTAL, params) or Decimal('0.00')
+        
+        # Count items
+        total_items = db.scalar(queries.ORDER_ITEM_COUNT, params) or 0
+        
+        result.append(OrderSummary(
+            order_id=order.order_id,
+            order_date=order.order_date,
+            order_status=order.order_status,
+            location=order.location,
+            total_items=total_items,
+            order_total=order_total,
+            total_payments=total_payments,
+            payment_balance=order_total - total_payments
+        ))
+    
+    return result
+
+
+@router.get(
     "/api/orders/{order_id}",
     response_model=OrderDetailResponse,
     tags=["Orders"],
@@ -217,77 +316,44 @@ async def get_orders_summary(
     - All payment records
     - Calculated totals and balances
     
+    Without `location` every location is searched in parallel; when the order id
+    exists in more than one location the request is rejected with 409 and has to
+    name the location.
+    
     **Performance**: Uses eager loading to minimize database queries
     """
 )
-async def get_order_detail(
+def get_order_detail(
     order_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    location: Optional[str] = LOCATION_QUERY,
+    db: Session = Depends(get_db_with_deadline)
 ):
     """Get complete order details with items and payments"""
     try:
-        # Fetch order with eager loading
-        order = db.query(Order).options(
-            joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.category),
-            joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.menu),
-            joinedload(Order.payments)
-        ).filter(Order.order_id == order_id).first()
+        if _all_locations(location):
+            found = [
+                detail for detail in sharding.router.fan_out(
+                    lambda shard_db, shard_location: _find_order(shard_db, order_id, shard_location),
+                    _request_deadline(request)
+                ).values() if detail is not None
+            ]
+            if len(found) > 1:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Order {order_id} exists in several locations "
+                           f"({', '.join(detail.location for detail in found)}) - pass location"
+                )
+            detail = found[0] if found else None
+        else:
+            detail = _find_order(db, order_id, location)
         
-        if not order:
+        if detail is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Order {order_id} not found"
             )
-        
-        # Build order items response
-        items_response = []
-        order_subtotal = Decimal('0.00')
-        
-        for order_item in order.order_items:
-            items_response.append(OrderItemResponse(
-                id=order_item.id,
-                item_id=order_item.item_id,
-                item_name=order_item.item.item_name,
-                category_name=order_item.item.category.category_name,
-                menu_name=order_item.item.menu.menu_name,
-                size=order_item.size,
-                price=order_item.price,
-                quantity=order_item.quantity,
-                total=order_item.total
-            ))
-            order_subtotal += order_item.total
-        
-        # Build payments response
-        payments_response = []
-        total_paid = Decimal('0.00')
-        
-        for payment in order.payments:
-            payments_response.append(PaymentResponse(
-                payment_id=payment.payment_id,
-                payment_date=payment.payment_date,
-                amount_due=payment.amount_due,
-                tips=payment.tips,
-                discount=payment.discount,
-                total_paid=payment.total_paid,
-                payment_type=payment.payment_type,
-                payment_status=payment.payment_status
-            ))
-            if payment.payment_status == 'Completed':
-                total_paid += payment.total_paid
-        
-        # Build complete response
-        return OrderDetailResponse(
-            order_id=order.order_id,
-            order_date=order.order_date,
-            order_status=order.order_status,
-            created_at=order.created_at,
-            items=items_response,
-            payments=payments_response,
-            total_items_count=len(items_response),
-            order_subtotal=order_subtotal,
-            total_paid=total_paid,
-            payment_balance=order_subtotal - total_paid
-        )
+        return detail
         
     except HTTPException:
         raise
@@ -298,7 +364,7 @@ async def get_order_detail(
         )
 
 
-@app.get(
+@router.get(
     "/api/orders/complete/all",
     response_model=List[OrderDetailResponse],
     tags=["Orders"],
@@ -316,6 +382,9 @@ async def get_order_detail(
     This endpoint fulfills Task 2 of the assessment:
     "List all orders with payment details and full order details"
     
+    Without a date range only active (non-archived) orders are listed; with
+    `start_date` or `end_date` orders in the range are listed, archived ones included.
+    
     **Performance Considerations**:
     - Uses optimized queries with joins
     - Implements eager loading to reduce N+1 queries
@@ -329,75 +398,19 @@ async def get_order_detail(
     - Calculated aggregates (subtotal, total paid, balance)
     """
 )
-async def get_all_orders_complete(
-    db: Session = Depends(get_db)
+def get_all_orders_complete(
+    request: Request,
+    start_date: Optional[date_type] = Query(None, description="Orders on or after this date (YYYY-MM-DD)"),
+    end_date: Optional[date_type] = Query(None, description="Orders on or before this date (YYYY-MM-DD)"),
+    location: Optional[str] = LOCATION_QUERY,
+    db: Session = Depends(get_db_with_deadline)
 ):
     """
     Get all orders with complete details - Main assessment endpoint
     Task 2: List all orders with payment details and full order details
     """
     try:
-        # Fetch all orders with eager loading for optimal performance
-        orders = db.query(Order).options(
-            joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.category),
-            joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.menu),
-            joinedload(Order.payments)
-        ).order_by(desc(Order.order_date), desc(Order.order_id)).all()
-        
-        result = []
-        
-        for order in orders:
-            # Build order items
-            items_response = []
-            order_subtotal = Decimal('0.00')
-            
-            for order_item in order.order_items:
-                items_response.append(OrderItemResponse(
-                    id=order_item.id,
-                    item_id=order_item.item_id,
-                    item_name=order_item.item.item_name,
-                    category_name=order_item.item.category.category_name,
-                    menu_name=order_item.item.menu.menu_name,
-                    size=order_item.size,
-                    price=order_item.price,
-                    quantity=order_item.quantity,
-                    total=order_item.total
-                ))
-                order_subtotal += order_item.total
-            
-            # Build payments
-            payments_response = []
-            total_paid = Decimal('0.00')
-            
-            for payment in order.payments:
-                payments_response.append(PaymentResponse(
-                    payment_id=payment.payment_id,
-                    payment_date=payment.payment_date,
-                    amount_due=payment.amount_due,
-                    tips=payment.tips,
-                    discount=payment.discount,
-                    total_paid=payment.total_paid,
-                    payment_type=payment.payment_type,
-                    payment_status=payment.payment_status
-                ))
-                if payment.payment_status == 'Completed':
-                    total_paid += payment.total_paid
-            
-            # Add to result
-            result.append(OrderDetailResponse(
-                order_id=order.order_id,
-                order_date=order.order_date,
-                order_status=order.order_status,
-                created_at=order.created_at,
-                items=items_response,
-                payments=payments_response,
-                total_items_count=len(items_response),
-                order_subtotal=order_subtotal,
-                total_paid=total_paid,
-                payment_balance=order_subtotal - total_paid
-            ))
-        
-        return result
+        return orders_complete_report(db, location, _request_deadline(request), start=start_date, end=end_date)
         
     except Exception as e:
         raise HTTPException(
@@ -406,62 +419,1038 @@ async def get_all_orders_complete(
         )
 
 
+def _find_order(db, order_id, location=None):
+    """Active or archived order detail on one shard, or None"""
+    model = read_model.get_read_model() if sharding.router.is_default(location) else None
+    if model is not None:
+        detail = model.detail(order_id)
+        if detail is not None:
+            return detail
+    else:
+        # Fetch order with eager loading
+        order = db.execute(
+            queries.ORDER_DETAIL, {"order_id": order_id}
+        ).unique().scalar_one_or_none()
+        if order:
+            return build_order_detail(order)
+    
+    # Not an active order - look in the archive
+    order = archive.get_archived_order(db, order_id)
+    return build_order_detail(order) if order else None
+
+
+def orders_complete_report(db, location=None, deadline=None, start=None, end=None):
+    """
+    Orders with complete details, newest first
+    
+    Args:
+        db: Session on the location's shard
+        location: Restaurant location, or None for all locations
+        deadline: QueryDeadline for the cross-shard reads
+        start, end: Inclusive date range - when set, archived orders in the range are included
+    
+    Returns:
+        list: OrderDetailResponse per order
+    """
+    if not _all_locations(location):
+        return _complete_orders(db, location, start, end)
+    
+    per_location = sharding.router.fan_out(
+        lambda shard_db, shard_location: _complete_orders(shard_db, shard_location, start, end), deadline
+    )
+    result = [detail for details in per_location.values() for detail in details]
+    result.sort(key=lambda detail: (detail.order_date, detail.order_id), reverse=True)
+    return result
+
+
+def _complete_orders(db, location=None, start=None, end=None):
+    """Orders on one shard with complete details, newest first"""
+    bounded = start is not None or end is not None
+    model = read_model.get_read_model() if sharding.router.is_default(location) else None
+    if model is not None:
+        result = [model.detail(order_id) for order_id in model.order_ids(start=start, end=end)]
+    elif bounded:
+        orders = db.execute(
+            queries.ORDERS_COMPLETE_BETWEEN, {"start_date": start or date_type.min, "end_date": end or date_type.max}
+        ).unique().scalars().all()
+        result = [build_order_detail(order) for order in orders]
+    else:
+        # Fetch all orders with eager loading for optimal performance
+        orders = db.execute(queries.ORDERS_COMPLETE).unique().scalars().all()
+        result = [build_order_detail(order) for order in orders]
+    
+    # Date-bounded reports also reach archived orders
+    if bounded:
+        archived = [build_order_detail(order) for order in archive.get_archived_orders(db, start, end)]
+        if archived:
+            result += archived
+            result.sort(key=lambda detail: (detail.order_date, detail.order_id), reverse=True)
+    return result
+
+
 # ================================================================
 # STATISTICS ENDPOINTS
 # ================================================================
 
-@app.get(
+def _shard_statistics(db, location=None):
+    """Order count, revenue and payments received on one shard, archived orders included"""
+    is_default = sharding.router.is_default(location)
+    model = read_model.get_read_model() if is_default else None
+    mirror = analytics.get_mirror() if is_default else None
+    if model is not None or mirror is not None:
+        stats = model.statistics() if model is not None else mirror.statistics()
+        total_orders = stats["total_orders"]
+        total_revenue = stats["total_revenue"]
+        total_payments = stats["total_payments_received"]
+    else:
+        total_orders = db.scalar(queries.TOTAL_ORDERS)
+        total_revenue = db.scalar(queries.TOTAL_REVENUE) or Decimal('0.00')
+        total_payments = db.scalar(queries.TOTAL_PAYMENTS) or Decimal('0.00')
+    
+    # Archived orders are counted from the running totals, not by scanning the archive
+    archived = archive.archive_totals(db)
+    return {
+        "total_orders": total_orders + archived["total_orders"],
+        "total_revenue": total_revenue + archived["total_revenue"],
+        "total_payments_received": total_payments + archived["total_payments_received"],
+    }
+
+
+def _statistics_response(stats):
+    total_revenue = stats["total_revenue"]
+    total_payments = stats["total_payments_received"]
+    return {
+        "total_orders": stats["total_orders"],
+        "total_revenue": float(total_revenue),
+        "total_payments_received": float(total_payments),
+        "outstanding_balance": float(total_revenue - total_payments)
+    }
+
+
+def statistics_report(db, location=None, deadline=None):
+    """
+    Business statistics for one location, or summed over every location with a per-location breakdown
+    
+    Returns:
+        dict: Order count, revenue, payments received and outstanding balance
+    """
+    if not _all_locations(location):
+        return _statistics_response(_shard_statistics(db, location))
+    
+    per_location = sharding.router.fan_out(_shard_statistics, deadline)
+    totals = {
+        key: sum(stats[key] for stats in per_location.values())
+        for key in ("total_orders", "total_revenue", "total_payments_received")
+    }
+    return {
+        **_statistics_response(totals),
+        "locations": {
+            shard_location: _statistics_response(stats)
+            for shard_location, stats in per_location.items()
+        }
+    }
+
+
+@router.get(
     "/api/statistics/overview",
     tags=["Statistics"],
-    summary="Get business statistics overview"
+    summary="Get business statistics overview",
+    description="""
+    Order count, revenue, payments received and outstanding balance.
+    
+    Without `location` the totals of every location are read in parallel and
+    summed, with a per-location breakdown under `locations`.
+    """
+)
+def get_statistics(
+    request: Request,
+    location: Optional[str] = LOCATION_QUERY,
+    db: Session = Depends(get_db_with_deadline)
+):
+    """Get overall business statistics (served from the read model or analytics mirror when enabled)"""
+    try:
+        return {"success": True, "data": statistics_report(db, location, _request_deadline(request))}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving statistics: {str(e)}"
+        )
+
+
+def _revenue_rows(db, statement):
+    return [
+        {"key": key, "revenue": revenue, "quantity": quantity, "line_items": line_items}
+        for key, revenue, quantity, line_items in db.execute(statement).all()
+    ]
+
+
+def _merge_revenue(row_lists):
+    """Add up revenue rows with the same key, sorted by key"""
+    merged = {}
+    for rows in row_lists:
+        for row in rows:
+            total = merged.setdefault(row["key"], {
+                "key": row["key"], "revenue": Decimal('0.00'), "quantity": 0, "line_items": 0
+            })
+            total["revenue"] += Decimal(str(row["revenue"] or 0))
+            total["quantity"] += row["quantity"] or 0
+            total["line_items"] += row["line_items"] or 0
+    return [merged[key] for key in sorted(merged)]
+
+
+def _shard_revenue(db, group_by, location=None):
+    """Revenue rows of one shard, archived orders included"""
+    mirror = analytics.get_mirror() if sharding.router.is_default(location) else None
+    if mirror is not None:
+        rows, source = mirror.revenue_breakdown(group_by), "mirror"
+    else:
+        rows, source = _revenue_rows(db, queries.REVENUE_BREAKDOWN[group_by]), "database"
+    
+    # The mirror and the hot tables hold active orders only; archived revenue comes from running totals
+    archived = archive.archived_revenue(db, group_by)
+    if archived:
+        rows = _merge_revenue([rows, archived])
+    return rows, source
+
+
+def revenue_report(db, group_by, location=None, deadline=None):
+    """
+    Revenue, quantity and line count per value of one dimension
+    
+    Returns:
+        tuple: (rows, source) - source is "mirror", "database" or "shards" (merged)
+    """
+    if not _all_locations(location):
+        return _shard_revenue(db, group_by, location)
+    
+    per_location = sharding.router.fan_out(
+        lambda shard_db, shard_location: _shard_revenue(shard_db, group_by, shard_location), deadline
+    )
+    return _merge_revenue(rows for rows, _ in per_location.values()), "shards"
+
+
+@router.get(
+    "/api/statistics/revenue",
+    tags=["Statistics"],
+    summary="Get revenue breakdown",
+    description="""
+    Revenue, quantity and line item count grouped by `date`, `item`, `category` or `menu`.
+    
+    Archived orders are included, like in the statistics overview.
+    
+    **Performance**: Answered from the embedded analytics mirror when
+    `ANALYTICS_MIRROR_ENABLED=True`, otherwise aggregated on the main database.
+    Without `location` every location is aggregated in parallel and merged.
+    """
+)
+def get_revenue_breakdown(
+    request: Request,
+    group_by: str = Query("date", description="Breakdown dimension: date, item, category or menu"),
+    location: Optional[str] = LOCATION_QUERY,
+    db: Session = Depends(get_db_with_deadline)
+):
+    """Get revenue grouped by a single dimension"""
+    if group_by not in analytics.REVENUE_DIMENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid group_by '{group_by}'. Use one of: {', '.join(analytics.REVENUE_DIMENSIONS)}"
+        )
+    try:
+        rows, source = revenue_report(db, group_by, location, _request_deadline(request))
+        
+        return {
+            "success": True,
+            "source": source,
+            "group_by": group_by,
+            "data": [
+                {**row, "revenue": float(row["revenue"] or 0)} for row in rows
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving revenue breakdown: {str(e)}"
+        )
+
+
+@router.get(
+    "/api/metrics/admission",
+    tags=["Health"],
+    summary="Get admission control metrics"
+)
+async def get_admission_metrics():
+    """In-flight requests, queue depth and shed counts per endpoint class"""
+    return {"success": True, "data": admission.controller.metrics()}
+
+
+@router.get(
+    "/api/metrics/query-cache",
+    tags=["Health"],
+    summary="Get compiled statement cache hit rate"
+)
+async def get_query_cache_metrics():
+    """Compiled-cache hits, misses and hit rate per query shape"""
+    return {"success": True, "data": queries.cache_report()}
+
+
+@router.get(
+    "/api/metrics/response-cache",
+    tags=["Health"],
+    summary="Get shared response cache size and hit rate"
+)
+def get_response_cache_metrics():
+    """Entries and bytes shared by all workers, plus this worker's hits and misses"""
+    cache = response_cache.get_response_cache()
+    if cache is None:
+        return {"success": True, "data": {"enabled": False}}
+    return {"success": True, "data": {"enabled": True, **cache.status()}}
+
+
+@router.get(
+    "/api/archive/status",
+    tags=["Health"],
+    summary="Get order archival status"
+)
+def get_archive_status(
+    location: Optional[str] = Query(None, description="Restaurant location (main database when omitted)"),
+    db: Session = Depends(get_db_with_deadline)
+):
+    """Archive horizon, last archival run and running totals of archived orders"""
+    runner = archive.archiver or archive.Archiver()
+    totals = archive.archive_totals(db)
+    return {
+        "success": True,
+        "data": {
+            **runner.status(),
+            "archived_orders": totals["total_orders"],
+            "archived_revenue": float(totals["total_revenue"]),
+        }
+    }
+
+
+@router.get(
+    "/api/locations",
+    tags=["Health"],
+    summary="List restaurant locations"
+)
+async def get_locations():
+    """Configured locations and which one is stored in the main database"""
+    return {
+        "success": True,
+        "data": {
+            "default_location": DEFAULT_LOCATION,
+            "locations": sharding.router.locations,
+            "sharded": sharding.router.sharded
+        }
+    }
+
+
+@router.get(
+    "/api/analytics/mirror",
+    tags=["Statistics"],
+    summary="Get analytics mirror freshness"
+)
+async def get_mirror_status():
+    """Report whether the analytics mirror is active and how far behind it is"""
+    if analytics.mirror is None:
+        return {"success": True, "data": {"enabled": False}}
+    return {"success": True, "data": analytics.mirror.freshness()}
+
+
+# ================================================================
+# RECONCILIATION ENDPOINTS
+# ================================================================
+
+@router.get(
+    "/api/reconciliation",
+    tags=["Reconciliation"],
+    summary="Scan orders and payments for data-quality issues",
+    description="""
+    Runs the vectorised reconciliation scan without writing the report table.
+    
+    Detects overpaid/underpaid orders, refunded payments, missing sizes,
+    prices with more than two decimals and line/payment total mismatches.
+    Use `limit` to cap the number of rows returned per anomaly type.
+    """
 )
-async def get_statistics(db: Session = Depends(get_db)):
-    """Get overall business statistics"""
+def get_reconciliation(
+    anomaly_type: Optional[str] = Query(None, description="Only return this anomaly type"),
+    limit: int = Query(100, ge=0, le=10000, description="Maximum rows per anomaly type"),
+    location: Optional[str] = Query(None, description="Restaurant location (main database when omitted)"),
+    db: Session = Depends(get_db_with_deadline)
+):
+    """Scan for reconciliation issues (read-only)"""
+    from app import reconciliation  # NumPy - imported on first use to keep worker start fast
+    
+    if anomaly_type and anomaly_type not in reconciliation.ANOMALY_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid anomaly_type '{anomaly_type}'. Use one of: {', '.join(reconciliation.ANOMALY_TYPES)}"
+        )
     try:
-        total_orders = db.query(func.count(Order.order_id)).scalar()
-        total_revenue = db.query(func.sum(OrderItem.total)).scalar() or Decimal('0.00')
-        total_payments = db.query(func.sum(Payment.total_paid)).filter(
-            Payment.payment_status == 'Completed'
-        ).scalar() or Decimal('0.00')
+        run_id, issues, timings = reconciliation.run_reconciliation(db, persist=False)
+        if anomaly_type:
+            issues = {anomaly_type: issues[anomaly_type]}
         
         return {
             "success": True,
             "data": {
-                "total_orders": total_orders,
-                "total_revenue": float(total_revenue),
-                "total_payments_received": float(total_payments),
-                "outstanding_balance": float(total_revenue - total_payments)
+                "summary": reconciliation.summarize(issues),
+                "timings": timings,
+                "issues": reconciliation.to_records(issues, limit=limit)
             }
         }
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error retrieving statistics: {str(e)}"
+            detail=f"Error running reconciliation: {str(e)}"
+        )
+
+
+@router.post(
+    "/api/reconciliation/run",
+    tags=["Reconciliation"],
+    summary="Run reconciliation and write the report table"
+)
+def run_reconciliation(
+    location: Optional[str] = Query(None, description="Restaurant location (main database when omitted)"),
+    db: Session = Depends(get_db_with_deadline)
+):
+    """Scan for reconciliation issues and persist them to reconciliation_issues"""
+    from app import reconciliation
+    
+    try:
+        run_id, issues, timings = reconciliation.run_reconciliation(db, persist=True)
+        
+        return {
+            "success": True,
+            "data": {
+                "run_id": run_id,
+                "summary": reconciliation.summarize(issues),
+                "timings": timings
+            }
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error running reconciliation: {str(e)}"
+        )
+
+
+# ================================================================
+# SEARCH ENDPOINTS
+# ================================================================
+
+def _search_indexes(location):
+    """Loaded search indexes for a location, or for every location when it is omitted"""
+    indexes = search.get_search_indexes()
+    if indexes is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index is disabled"
+        )
+    try:
+        locations = sharding.router.locations if _all_locations(location) else [location]
+        loaded = [indexes.get(shard_location) for shard_location in locations]
+    except sharding.UnknownLocation as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if any(index is None for index in loaded):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index is still loading",
+            headers={"Retry-After": "5"}
+        )
+    return loaded
+
+
+@router.get(
+    "/api/search/items",
+    tags=["Search"],
+    summary="Search menu items",
+    description="""
+    Matches item, category and menu names by whole word, prefix (`chick`) or
+    close spelling (`chiken`), best matches first. Served from the in-memory
+    search index.
+    """
+)
+def search_items(
+    q: str = Query(..., min_length=1, description="Item, category or menu name (prefix or approximate)"),
+    limit: int = Query(20, ge=1, le=200, description="Maximum items returned"),
+    location: Optional[str] = Query(None, description="Restaurant location (main database when omitted)")
+):
+    """Autocomplete-style item search"""
+    index = _search_indexes(location or DEFAULT_LOCATION)[0]
+    return {"success": True, "data": index.search_items(q, limit=limit)}
+
+
+@router.get(
+    "/api/search/orders",
+    tags=["Search"],
+    summary="Find orders containing matching items",
+    description="""
+    Orders containing any item that matches `q`, newest first, e.g.
+    `q=Item6 Large&start_date=2024-01-01&end_date=2024-03-31`. A word equal
+    to a size (Small, Large...) filters order lines by size. Archived orders
+    are included. Answered from the in-memory item-to-orders index without
+    scanning order_items; without `location` every location is searched.
+    """
+)
+def search_orders(
+    q: str = Query(..., min_length=1, description="Item, category or menu terms, optionally with a size"),
+    size: Optional[str] = Query(None, description="Only order lines with this size"),
+    start_date: Optional[date_type] = Query(None, description="Orders on or after this date (YYYY-MM-DD)"),
+    end_date: Optional[date_type] = Query(None, description="Orders on or before this date (YYYY-MM-DD)"),
+    order_status: Optional[str] = Query(None, alias="status", description="Filter by order status"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum orders returned"),
+    offset: int = Query(0, ge=0, description="Orders to skip"),
+    location: Optional[str] = LOCATION_QUERY
+):
+    """Search orders by the items they contain"""
+    indexes = _search_indexes(location)
+    results = [
+        index.search_orders(q, size=size, start=start_date, end=end_date, status=order_status,
+                            limit=offset + limit)
+        for index in indexes
+    ]
+    if not results[0]["items"]:
+        return {
+            "success": True,
+            "data": {"items": [], "sizes": results[0]["sizes"], "total_orders": 0, "orders": []}
+        }
+    
+    # Merge per-location pages, newest first
+    orders = [order for result in results for order in result["orders"]]
+    orders.sort(key=lambda order: (order["order_date"], order["order_id"]), reverse=True)
+    return {
+        "success": True,
+        "data": {
+            "items": results[0]["items"],
+            "sizes": results[0]["sizes"],
+            "total_orders": sum(result["total_orders"] for result in results),
+            "orders": orders[offset:offset + limit]
+        }
+    }
+
+
+@router.get(
+    "/api/search/status",
+    tags=["Search"],
+    summary="Get search index status"
+)
+async def get_search_status():
+    """Size and freshness of the search index per location"""
+    indexes = search.get_search_indexes()
+    if indexes is None:
+        return {"success": True, "data": {"enabled": False}}
+    return {
+        "success": True,
+        "data": {
+            "enabled": True,
+            "last_error": indexes.last_error,
+            "locations": [index.status() for index in indexes.indexes.values()]
+        }
+    }
+
+
+# ================================================================
+# WRITE ENDPOINTS (POS orders and payments)
+# ================================================================
+
+IDEMPOTENCY_KEY_HEADER = Header(
+    ..., alias="Idempotency-Key", min_length=1, max_length=100,
+    description="Client-generated key; retries with the same key are applied once"
+)
+WRITE_LOCATION_QUERY = Query(None, description="Restaurant location (main database when omitted)")
+
+
+def _write(operation, payload, idempotency_key, location, response):
+    """Apply a write now, or queue it in the write-behind log (202) when WRITE_QUEUE_ENABLED"""
+    queue = write_queue.get_write_queue()
+    if queue is None and write_queue.WRITE_QUEUE_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Write queue is not running"
+        )
+    try:
+        if queue is None:
+            outcome = write_queue.apply_write(operation, payload, idempotency_key, location)
+        else:
+            outcome = queue.submit(operation, payload, idempotency_key, location)
+            response.status_code = status.HTTP_202_ACCEPTED
+    except sharding.UnknownLocation as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except write_queue.IdempotencyConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except write_queue.WriteFailed as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Error applying write: {str(e)}")
+    except write_queue.WriteQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Error queueing write: {str(e)}",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error writing: {str(e)}"
+        )
+    return {"success": True, "data": outcome}
+
+
+def _changes(update):
+    """Fields sent in an update body (400 if there are none)"""
+    payload = update.model_dump(mode="json", exclude_unset=True)
+    if not payload:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
+    return payload
+
+
+@router.post(
+    "/api/orders",
+    status_code=status.HTTP_201_CREATED,
+    tags=["Writes"],
+    summary="Create an order",
+    description="""
+    Applied in its own transaction (201). With `WRITE_QUEUE_ENABLED=True` it is
+    acknowledged with 202 once it is in the durable write log and applied in the
+    next batch (within `WRITE_FLUSH_INTERVAL_MS`) - follow it with `GET /api/writes/{key}`.
+    
+    Requires an `Idempotency-Key` header. Retrying with the same key returns the
+    original write (`duplicate: true`) and is never applied twice; reusing a key
+    for a different body, or a write the database refuses, returns 409.
+    """
+)
+def create_order(
+    order: OrderCreate,
+    response: Response,
+    idempotency_key: str = IDEMPOTENCY_KEY_HEADER,
+    location: Optional[str] = WRITE_LOCATION_QUERY
+):
+    """Create an order"""
+    return _write("create_order", order.model_dump(mode="json"), idempotency_key, location, response)
+
+
+@router.patch(
+    "/api/orders/{order_id}",
+    status_code=status.HTTP_200_OK,
+    tags=["Writes"],
+    summary="Update an order"
+)
+def update_order(
+    order_id: int,
+    changes: OrderUpdate,
+    response: Response,
+    idempotency_key: str = IDEMPOTENCY_KEY_HEADER,
+    location: Optional[str] = WRITE_LOCATION_QUERY
+):
+    """Change an order's date or status"""
+    payload = {**_changes(changes), "order_id": order_id}
+    return _write("update_order", payload, idempotency_key, location, response)
+
+
+@router.post(
+    "/api/orders/{order_id}/items",
+    status_code=status.HTTP_201_CREATED,
+    tags=["Writes"],
+    summary="Add an order line"
+)
+def add_order_item(
+    order_id: int,
+    item: OrderItemCreate,
+    response: Response,
+    idempotency_key: str = IDEMPOTENCY_KEY_HEADER,
+    location: Optional[str] = WRITE_LOCATION_QUERY
+):
+    """Add a line item to an order (when queued, it is applied after the order itself, so it may follow it immediately)"""
+    payload = {**item.model_dump(mode="json"), "order_id": order_id}
+    return _write("add_order_item", payload, idempotency_key, location, response)
+
+
+@router.post(
+    "/api/payments",
+    status_code=status.HTTP_201_CREATED,
+    tags=["Writes"],
+    summary="Record a payment"
+)
+def create_payment(
+    payment: PaymentCreate,
+    response: Response,
+    idempotency_key: str = IDEMPOTENCY_KEY_HEADER,
+    location: Optional[str] = WRITE_LOCATION_QUERY
+):
+    """Record a payment"""
+    return _write("create_payment", payment.model_dump(mode="json"), idempotency_key, location, response)
+
+
+@router.patch(
+    "/api/payments/{payment_id}",
+    status_code=status.HTTP_200_OK,
+    tags=["Writes"],
+    summary="Update a payment"
+)
+def update_payment(
+    payment_id: int,
+    changes: PaymentUpdate,
+    response: Response,
+    idempotency_key: str = IDEMPOTENCY_KEY_HEADER,
+    location: Optional[str] = WRITE_LOCATION_QUERY
+):
+    """Change a payment"""
+    payload = {**_changes(changes), "payment_id": payment_id}
+    return _write("update_payment", payload, idempotency_key, location, response)
+
+
+@router.get(
+    "/api/writes",
+    tags=["Writes"],
+    summary="Get write queue status"
+)
+async def get_write_queue_status():
+    """Queue depth, log position, batch sizes and rejected writes"""
+    queue = write_queue.get_write_queue()
+    if queue is None:
+        return {"success": True, "data": {"enabled": False}}
+    return {"success": True, "data": {"enabled": True, **queue.status()}}
+
+
+@router.get(
+    "/api/writes/{idempotency_key}",
+    tags=["Writes"],
+    summary="Get the outcome of a write"
+)
+def get_write(
+    idempotency_key: str,
+    location: Optional[str] = WRITE_LOCATION_QUERY
+):
+    """Status of a write by idempotency key: accepted (queued), applied or rejected"""
+    queue = write_queue.get_write_queue()
+    try:
+        if queue is None:
+            outcome = write_queue.stored_outcome(idempotency_key, location)
+        else:
+            outcome = queue.lookup(idempotency_key, location)
+    except sharding.UnknownLocation as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if outcome is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Write {idempotency_key} not found"
+        )
+    return {"success": True, "data": write_queue.public_outcome(outcome)}
+
+
+# ================================================================
+# REPORT JOB ENDPOINTS
+# ================================================================
+
+@router.post(
+    "/api/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Jobs"],
+    summary="Submit a report job",
+    description="""
+    Runs a heavy report in the background process pool instead of the request handler.
+    
+    Reports: `orders_complete`, `statistics`, `revenue` (`group_by`) and
+    `reconciliation` (`anomaly_type`, `limit`); each accepts `location`.
+    An identical report finished within `JOB_RESULT_TTL_SECONDS` (or still
+    running) is returned instead of starting a new job, unless `refresh` is set.
+    """
+)
+def submit_job(job_request: JobRequest):
+    """Queue a report and return its job"""
+    try:
+        job = jobs.runner.submit(job_request.report, job_request.params, refresh=job_request.refresh)
+    except jobs.InvalidJob as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except jobs.JobQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Error submitting job: {str(e)}",
+            headers={"Retry-After": "5"}
+        )
+    return {"success": True, "data": job}
+
+
+@router.get(
+    "/api/jobs",
+    tags=["Jobs"],
+    summary="List report jobs"
+)
+async def get_jobs():
+    """Stored jobs (newest first) and the process pool status"""
+    return {"success": True, "data": {"runner": jobs.runner.status(), "jobs": jobs.list_jobs()}}
+
+
+def _load_job_or_404(job_id):
+    job = jobs.load_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job {job_id} not found"
+        )
+    return job
+
+
+@router.get(
+    "/api/jobs/{job_id}",
+    tags=["Jobs"],
+    summary="Get report job status"
+)
+async def get_job(job_id: str):
+    """Status (queued, running, done or failed), timings and result size"""
+    return {"success": True, "data": _load_job_or_404(job_id)}
+
+
+@router.get(
+    "/api/jobs/{job_id}/events",
+    tags=["Jobs"],
+    summary="Subscribe to report job status (server-sent events)"
+)
+async def get_job_events(job_id: str):
+    """Stream a status event on every state change until the job finishes"""
+    _load_job_or_404(job_id)
+    return StreamingResponse(
+        jobs.job_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+@router.get(
+    "/api/jobs/{job_id}/result",
+    tags=["Jobs"],
+    summary="Download a report job result"
+)
+async def get_job_result(job_id: str):
+    """Download the JSON result (same body as the matching endpoint)"""
+    job = _load_job_or_404(job_id)
+    if job["status"] != "done":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job {job_id} is {job['status']}" + (f": {job['error']}" if job.get("error") else "")
+        )
+    return FileResponse(
+        jobs.job_path(job_id, ".result.json"),
+        media_type="application/json",
+        filename=f"{job['report']}-{job_id}.json"
+    )
+
+
+# ================================================================
+# PROFILING ENDPOINTS
+# ================================================================
+
+def require_profile_access(request: Request):
+    """Dependency - allow only the profiling key or allowlisted IPs"""
+    if not profiling.profiling_configured() or not profiling.is_authorized(
+        request.headers, request.client.host if request.client else None
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Profiling access denied"
+        )
+
+
+@router.get(
+    "/api/profiles",
+    tags=["Profiling"],
+    summary="List stored request profiles",
+    dependencies=[Depends(require_profile_access)]
+)
+async def get_profiles():
+    """List profiles captured with the X-Profile opt-in header"""
+    return {"success": True, "data": profiling.list_profiles()}
+
+
+@router.get(
+    "/api/profiles/{profile_id}",
+    tags=["Profiling"],
+    summary="Get profile SQL timings and top functions",
+    dependencies=[Depends(require_profile_access)]
+)
+async def get_profile(profile_id: str):
+    """Get captured SQL statements and a cumulative-time summary for one profile"""
+    metadata = profiling.load_profile(profile_id)
+    if metadata is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {profile_id} not found"
+        )
+    return {"success": True, "data": metadata}
+
+
+@router.get(
+    "/api/profiles/{profile_id}/download",
+    tags=["Profiling"],
+    summary="Download the .prof file for a profile",
+    dependencies=[Depends(require_profile_access)]
+)
+async def download_profile(profile_id: str):
+    """Download cProfile stats (open with snakeviz or python -m pstats)"""
+    path = profiling.profile_path(profile_id, ".prof")
+    if path is None or not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {profile_id} not found"
         )
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
 
 
 # ================================================================
 # STARTUP EVENT
 # ================================================================
 
-@app.on_event("startup")
 async def startup_event():
     """Run on application startup"""
     print("=" * 60)
     print("🚀 Restaurant Order Management API Starting...")
     print("=" * 60)
     
-    # Test database connection
-    if test_connection():
-        print("✓ Database connection verified")
-    else:
-        print("✗ WARNING: Database connection failed")
+    # Test database connection (STARTUP_DB_CHECK=False leaves the first connection to the first request)
+    if STARTUP_DB_CHECK:
+        if test_connection():
+            print("✓ Database connection verified")
+        else:
+            print("✗ WARNING: Database connection failed")
+    
+    # Load the in-memory read model if enabled (order endpoints read the database until it is loaded)
+    try:
+        if read_model.start_read_model() is not None and read_model.get_read_model() is not None:
+            print(f"✓ Read model loaded ({len(read_model.read_model.orders)} orders)")
+    except Exception as e:
+        print(f"✗ WARNING: Read model not started: {str(e)}")
+    
+    # Start the embedded analytics mirror if enabled
+    if analytics.start_mirror() is not None:
+        print("✓ Analytics mirror started")
+    
+    if sharding.router.sharded:
+        print(f"✓ Location shards: {', '.join(sharding.router.locations)}")
+    
+    # Open the write log and replay writes not yet in the database
+    try:
+        if write_queue.start_write_queue() is not None:
+            print(f"✓ Write queue started ({write_queue.write_queue.directory})")
+    except Exception as e:
+        print(f"✗ WARNING: Write queue not started: {str(e)}")
+    
+    cache = response_cache.get_response_cache()
+    if cache is not None:
+        print(f"✓ Shared response cache: {cache.path}")
+    
+    # Build the search index in the background (search endpoints return 503 until loaded)
+    if search.start_search_index() is not None:
+        print("✓ Search index loading")
+    
+    # Start background archival of closed orders if enabled
+    if archive.start_archiver() is not None:
+        print(f"✓ Archiver started (horizon {archive.ARCHIVE_HORIZON_DAYS} days)")
     
-    print(f"✓ API Documentation: http://localhost:8000/docs")
-    print(f"✓ ReDoc Documentation: http://localhost:8000/redoc")
+    if API_DOCS_ENABLED:
+        print(f"✓ API Documentation: http://localhost:8000/docs")
+        print(f"✓ ReDoc Documentation: http://localhost:8000/redoc")
     print("=" * 60)
 
 
+async def shutdown_event():
+    """Run on application shutdown"""
+    archive.stop_archiver()
+    write_queue.stop_write_queue()
+    search.stop_search_index()
+    jobs.runner.shutdown()
+    read_model.stop_read_model()
+    analytics.stop_mirror()
+    sharding.router.close()
+
+
+# ================================================================
+# APPLICATION FACTORY
+# ================================================================
+
+def create_app():
+    """
+    Build the FastAPI application
+    
+    Run with ``uvicorn app.main:app`` or ``uvicorn --factory app.main:create_app``.
+    The OpenAPI schema is generated on the first request to /openapi.json;
+    API_DOCS_ENABLED=False removes /docs, /redoc and /openapi.json.
+    
+    Returns:
+        FastAPI: Application with middleware, exception handlers and all endpoints
+    """
+    application = FastAPI(
+        title="Restaurant Order Management API",
+        description=API_DESCRIPTION,
+        version="1.0.0",
+        contact={
+            "name": "API Support",
+            "email": "support@restaurant-api.com"
+        },
+        license_info={
+            "name": "MIT",
+            "url": "https://opensource.org/licenses/MIT"
+        },
+        docs_url="/docs" if API_DOCS_ENABLED else None,
+        redoc_url="/redoc" if API_DOCS_ENABLED else None,
+        openapi_url="/openapi.json" if API_DOCS_ENABLED else None
+    )
+    
+    # Opt-in per-request profiling (only installed when a key or IP allowlist is set)
+    if profiling.profiling_configured():
+        application.add_middleware(profiling.ProfilingMiddleware)
+    
+    # Query deadlines - cancel statements on timeout or client disconnect (504)
+    if QUERY_DEADLINES_ENABLED:
+        application.add_middleware(DeadlineMiddleware)
+    
+    # Admission control - shed load with 503 before the connection pool is exhausted
+    if admission.ADMISSION_CONTROL_ENABLED:
+        application.add_middleware(admission.AdmissionMiddleware)
+    
+    # Shared response cache - hits are served before admission control; writes
+    # committed by this process (write endpoints, write queue, archiver) invalidate it
+    if response_cache.RESPONSE_CACHE_ENABLED:
+        response_cache.register_listeners()
+        application.add_middleware(response_cache.ResponseCacheMiddleware)
+    
+    # Configure CORS (outermost, so cached and shed responses get CORS headers too)
+    allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    application.add_exception_handler(HTTPException, http_exception_handler)
+    application.add_exception_handler(Exception, general_exception_handler)
+    application.include_router(router)
+    application.add_event_handler("startup", startup_event)
+    application.add_event_handler("shutdown", shutdown_event)
+    return application
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def __getattr__(name):
+    """Module attribute ``app`` (for ``uvicorn app.main:app``), built on first access"""
+    global _app
+    if name == "app":
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
     import uvicorn
     
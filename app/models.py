@@ -3,10 +3,10 @@ SQLAlchemy ORM Models
 Defines database table structures as Python classes
 """
 
-from sqlalchemy import Column, Integer, String, Date, DateTime, Numeric, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, Numeric, Boolean, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from app.database import Base
+from app.database import Base, DEFAULT_LOCATION
 
 
 class Menu(Base):
@@ -80,6 +80,7 @@ class Order(Base):
     order_id = Column(Integer, primary_key=True, index=True)
     order_date = Column(Date, nullable=False)
     order_status = Column(String(50), default="Pending")
+    location = Column(String(50), nullable=False, server_default=DEFAULT_LOCATION)  # Restaurant site (one per shard)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -119,8 +120,128 @@ class Payment(Base):
     total_paid = Column(Numeric(10, 2), nullable=False)
     payment_type = Column(String(50), nullable=False)  # 'Cash', 'Card'
     payment_status = Column(String(50), default="Pending")
+    location = Column(String(50), nullable=False, server_default=DEFAULT_LOCATION)  # Restaurant site (one per shard)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     order = relationship("Order", back_populates="payments")
+
+
+class ArchivedOrder(Base):
+    """Orders archive table - Closed orders moved out of the hot tables"""
+    __tablename__ = "orders_archive"
+    
+    order_id = Column(Integer, primary_key=True, autoincrement=False)
+    order_date = Column(Date, nullable=False, index=True)
+    order_status = Column(String(50))
+    location = Column(String(50), nullable=False, server_default=DEFAULT_LOCATION)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, nullable=False, index=True)
+    
+    # Relationships
+    order_items = relationship("ArchivedOrderItem", back_populates="order")
+    payments = relationship("ArchivedPayment", back_populates="order")
+
+
+class ArchivedOrderItem(Base):
+    """Order items archive table - Line items of archived orders"""
+    __tablename__ = "order_items_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_id = Column(Integer, ForeignKey("orders_archive.order_id"), nullable=False, index=True)
+    item_id = Column(Integer, ForeignKey("items.item_id"), nullable=False)
+    size = Column(String(20), nullable=True)
+    price = Column(Numeric(10, 2), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    total = Column(Numeric(10, 2), nullable=False)
+    created_at = Column(DateTime)
+    
+    # Relationships
+    order = relationship("ArchivedOrder", back_populates="order_items")
+    item = relationship("Item")
+
+
+class ArchivedPayment(Base):
+    """Payments archive table - Payment records of archived orders"""
+    __tablename__ = "payments_archive"
+    
+    payment_id = Column(Integer, primary_key=True, autoincrement=False)
+    order_id = Column(Integer, ForeignKey("orders_archive.order_id"), nullable=False, index=True)
+    payment_date = Column(Date, nullable=False)
+    amount_due = Column(Numeric(10, 2), nullable=False)
+    tips = Column(Numeric(10, 2))
+    discount = Column(Numeric(10, 2))
+    total_paid = Column(Numeric(10, 2), nullable=False)
+    payment_type = Column(String(50), nullable=False)
+    payment_status = Column(String(50))
+    location = Column(String(50), nullable=False, server_default=DEFAULT_LOCATION)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    
+    # Relationships
+    order = relationship("ArchivedOrder", back_populates="payments")
+
+
+class ArchiveTotals(Base):
+    """Archive totals table - Running statistics of archived orders (single row)"""
+    __tablename__ = "archive_totals"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    total_orders = Column(BigInteger, nullable=False, default=0)
+    total_revenue = Column(Numeric(18, 2), nullable=False, default=0)
+    total_payments_received = Column(Numeric(18, 2), nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class ArchiveRevenueTotals(Base):
+    """Archive revenue totals table - Running revenue of archived orders per breakdown dimension value"""
+    __tablename__ = "archive_revenue_totals"
+    
+    dimension = Column(String(20), primary_key=True)         # 'date', 'item', 'category', 'menu'
+    dimension_value = Column(String(100), primary_key=True)  # ISO date or catalog name
+    revenue = Column(Numeric(18, 2), nullable=False, default=0)
+    quantity = Column(BigInteger, nullable=False, default=0)
+    line_items = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class ReconciliationIssue(Base):
+    """Reconciliation issues table - Output of the payment/data-quality scanner"""
+    __tablename__ = "reconciliation_issues"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(32), nullable=False, index=True)
+    anomaly_type = Column(String(50), nullable=False, index=True)
+    order_id = Column(Integer, nullable=True, index=True)
+    payment_id = Column(Integer, nullable=True)
+    order_item_id = Column(Integer, nullable=True)
+    expected_value = Column(Numeric(12, 4), nullable=True)
+    actual_value = Column(Numeric(12, 4), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+
+class LoadCheckpoint(Base):
+    """Load checkpoints table - Resume state for the bulk data loader"""
+    __tablename__ = "load_checkpoints"
+    
+    load_key = Column(String(400), primary_key=True)  # '<table>:<source path>'
+    fingerprint = Column(String(100), nullable=True)  # Source size and mtime
+    rows_done = Column(BigInteger, nullable=False, default=0)  # Input records committed
+    completed = Column(Boolean, nullable=False, default=False)
+    detail = Column(Text, nullable=True)  # JSON, e.g. dropped index definitions
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+
+class WriteIdempotencyKey(Base):
+    """Write idempotency keys table - Outcome of each write applied from the write-behind queue"""
+    __tablename__ = "write_idempotency_keys"
+    
+    idempotency_key = Column(String(100), primary_key=True)  # Client-supplied Idempotency-Key
+    operation = Column(String(30), nullable=False)
+    fingerprint = Column(String(40), nullable=False)  # SHA-1 of operation, location and payload
+    sequence = Column(BigInteger, nullable=False)  # Write log position
+    status = Column(String(20), nullable=False)  # 'applied' or 'rejected'
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
@@ -0,0 +1,384 @@
+"""
+Request Profiling Module
+Opt-in cProfile + SQL timing capture for individual API calls
+
+A request is profiled when it carries ``X-Profile: 1`` (or ``?profile=1``) AND
+either a matching ``X-Profile-Key`` header or a client IP in the allowlist.
+The middleware is only installed when a key or allowlist is configured.
+
+cProfile allows one active profiler per thread (one per process from Python
+3.12), so a worker profiles one request at a time and answers other profiled
+requests with 429. Only the endpoint itself is profiled: sync endpoints in
+their worker thread, async endpoints only while their own coroutine runs, so
+other requests sharing the event loop do not show up in the stats.
+"""
+
+import asyncio
+import cProfile
+import functools
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Profiling configuration from environment
+PROFILE_SECRET_KEY = os.getenv("PROFILE_SECRET_KEY", "")
+PROFILE_ALLOWED_IPS = {ip.strip() for ip in os.getenv("PROFILE_ALLOWED_IPS", "").split(",") if ip.strip()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_PROFILES = int(os.getenv("PROFILE_MAX_PROFILES", "200"))
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# SQL statements captured for the profile active in the current context
+_current_sql = ContextVar("current_sql", default=None)
+
+# Profilers filled in by ProfiledRoute endpoints for the request being profiled
+_profilers = ContextVar("profilers", default=None)
+
+# Held while a request is profiled; a second profiled request is rejected
+_profile_slot = threading.Lock()
+
+# SQL listeners are attached only while at least one profile is running
+_listener_lock = threading.Lock()
+_active_profiles = 0
+
+
+def profiling_configured():
+    """
+    Check whether profiling can be requested at all
+
+    Returns:
+        bool: True if a secret key or IP allowlist is configured
+    """
+    return bool(PROFILE_SECRET_KEY or PROFILE_ALLOWED_IPS)
+
+
+def is_authorized(headers, client_host):
+    """
+    Check the profiling key header or client IP allowlist
+
+    Args:
+        headers: Mapping of lower-case header names to values
+        client_host: Client IP address
+
+    Returns:
+        bool: True if the caller may profile requests and download profiles
+    """
+    key = headers.get("x-profile-key", "")
+    if PROFILE_SECRET_KEY and key and hmac.compare_digest(key, PROFILE_SECRET_KEY):
+        return True
+    return bool(client_host and client_host in PROFILE_ALLOWED_IPS)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_sql.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    captured = _current_sql.get()
+    if captured is None:
+        return
+    started = conn.info.get("profile_query_start")
+    elapsed = time.perf_counter() - started.pop() if started else None
+    captured.append({
+        "statement": statement,
+        "parameters": repr(parameters)[:500],
+        "executemany": executemany,
+        "duration_ms": round(elapsed * 1000, 3) if elapsed is not None else None,
+    })
+
+
+def _attach_sql_listeners():
+    global _active_profiles
+    with _listener_lock:
+        if _active_profiles == 0:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _active_profiles += 1
+
+
+def _detach_sql_listeners():
+    global _active_profiles
+    with _listener_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0:
+            event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def profile_path(profile_id, suffix):
+    """
+    Path of a stored profile artefact
+
+    Args:
+        profile_id: 32-character hex profile ID
+        suffix: ".prof" for cProfile stats, ".json" for metadata and SQL
+
+    Returns:
+        str: File path, or None if the ID is malformed
+    """
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    return os.path.join(PROFILE_DIR, f"{profile_id}{suffix}")
+
+
+def load_profile(profile_id):
+    """
+    Load profile metadata and captured SQL
+
+    Returns:
+        dict: Stored metadata, or None if not found
+    """
+    path = profile_path(profile_id, ".json")
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_profiles():
+    """
+    List stored profiles, newest first
+
+    Returns:
+        list: Metadata dicts without the SQL statements
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            metadata = load_profile(name[:-5])
+            if metadata is not None:
+                metadata.pop("sql", None)
+                metadata.pop("top_functions", None)
+                profiles.append(metadata)
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def _profile_in_thread(endpoint):
+    """Wrap a sync endpoint so it is profiled in its worker thread"""
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profilers = _profilers.get()
+        if profilers is None:
+            return endpoint(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profilers.append(profiler)
+
+    return wrapper
+
+
+class _ProfiledSteps:
+    """Await a coroutine with the profiler enabled only while it runs"""
+
+    def __init__(self, coroutine, profiler):
+        self.coroutine = coroutine
+        self.profiler = profiler
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            self.profiler.enable()
+            try:
+                if error is None:
+                    future = self.coroutine.send(value)
+                else:
+                    future = self.coroutine.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self.profiler.disable()
+            try:
+                value, error = (yield future), None
+            except BaseException as e:
+                value, error = None, e
+
+
+def _profile_coroutine(endpoint):
+    """Wrap an async endpoint so other coroutines on the event loop are not profiled"""
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        profilers = _profilers.get()
+        if profilers is None:
+            return await endpoint(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return await _ProfiledSteps(endpoint(*args, **kwargs), profiler)
+        finally:
+            profilers.append(profiler)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class that lets profiled requests capture their endpoint's work"""
+
+    def __init__(self, path, endpoint, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            endpoint = _profile_coroutine(endpoint)
+        else:
+            endpoint = _profile_in_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _save_profile(profile_id, profilers, sql, metadata):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    # A request that never reached a ProfiledRoute endpoint still gets its SQL stored
+    stats = pstats.Stats()
+    for profiler in profilers:
+        stats.add(profiler)
+    stats.dump_stats(profile_path(profile_id, ".prof"))
+
+    summary = io.StringIO()
+    stats.stream = summary
+    stats.sort_stats("cumulative").print_stats(25)
+
+    metadata.update({
+        "sql_count": len(sql),
+        "sql_total_ms": round(sum(q["duration_ms"] or 0 for q in sql), 3),
+        "sql": sql,
+        "top_functions": summary.getvalue(),
+    })
+    with open(profile_path(profile_id, ".json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    _prune_profiles()
+
+
+def _prune_profiles():
+    """Delete the oldest profiles beyond PROFILE_MAX_PROFILES"""
+    stored = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json") and PROFILE_ID_PATTERN.match(name[:-5]):
+            try:
+                stored.append((os.path.getmtime(os.path.join(PROFILE_DIR, name)), name[:-5]))
+            except FileNotFoundError:
+                continue
+    stored.sort(reverse=True)
+    for _, profile_id in stored[PROFILE_MAX_PROFILES:]:
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(profile_path(profile_id, suffix))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles authorised opt-in requests.
+
+    Requests without the opt-in flag are passed straight through. Profiled
+    responses carry an ``X-Profile-Id`` header naming the stored artefact.
+    Endpoints are profiled by ProfiledRoute; the middleware collects their
+    profilers and the SQL, and saves both in the threadpool. While one request
+    is profiled, other profiled requests get 429 with a Retry-After header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        client = scope.get("client")
+        if not is_authorized(headers, client[0] if client else None):
+            await self.app(scope, receive, send)
+            return
+
+        if not _profile_slot.acquire(blocking=False):
+            await self._reject(send)
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _profile_slot.release()
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex
+        response_status = {}
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                response_status["code"] = message["status"]
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        sql = []
+        profilers = []
+        sql_token = _current_sql.set(sql)
+        profilers_token = _profilers.set(profilers)
+        _attach_sql_listeners()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            _detach_sql_listeners()
+            _profilers.reset(profilers_token)
+            _current_sql.reset(sql_token)
+            await run_in_threadpool(_save_profile, profile_id, profilers, sql, {
+                "profile_id": profile_id,
+                "created_at": datetime.now().isoformat(),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "status_code": response_status.get("code"),
+                "duration_ms": round(elapsed * 1000, 3),
+            })
+
+    @staticmethod
+    async def _reject(send):
+        body = json.dumps({
+            "success": False,
+            "error": "Another request is being profiled, retry later",
+            "status_code": 429
+        }).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def _requested(scope):
+        for name, value in scope["headers"]:
+            if name == b"x-profile" and value in (b"1", b"true"):
+                return True
+        query_string = scope.get("query_string", b"")
+        if b"profile=" in query_string:
+            values = parse_qs(query_string.decode("latin-1")).get("profile", [])
+            return any(v in ("1", "true") for v in values)
+        return False
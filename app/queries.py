@@ -0,0 +1,297 @@
+"""
+Hot Query Statements Module
+Reusable select() constructs for the per-request ORM queries in app/main.py
+
+Each statement is built once at import time with bound parameters, so requests
+skip rebuilding the expression tree and loader options, and SQLAlchemy reuses
+the memoized cache key to find the compiled SQL in the engine's compiled cache.
+Every statement is tagged with a ``query_shape`` execution option; a cursor
+listener counts compiled-cache hits and misses per shape, across the engines
+of every location.
+"""
+
+import threading
+
+from sqlalchemy import bindparam, desc, event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.orm import joinedload
+
+from app import sharding
+from app.database import DEFAULT_LOCATION
+from app.models import (
+    Order, OrderItem, Payment, Item, Category, Menu,
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, ArchiveTotals, ArchiveRevenueTotals
+)
+
+
+def _shape(name, statement):
+    return statement.execution_options(query_shape=name)
+
+
+# ================================================================
+# ORDER QUERIES
+# ================================================================
+
+_ORDER_DETAIL_OPTIONS = (
+    joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.category),
+    joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.menu),
+    joinedload(Order.payments),
+)
+
+_ORDER_NEWEST_FIRST = (desc(Order.order_date), desc(Order.order_id))
+
+# Order with items (and their menu/category) and payments - params: order_id
+ORDER_DETAIL = _shape(
+    "order_detail",
+    select(Order).options(*_ORDER_DETAIL_OPTIONS).where(Order.order_id == bindparam("order_id"))
+)
+
+# Every order with items and payments, newest first
+ORDERS_COMPLETE = _shape(
+    "orders_complete",
+    select(Order).options(*_ORDER_DETAIL_OPTIONS).order_by(*_ORDER_NEWEST_FIRST)
+)
+
+# Orders in a date range with items and payments, newest first - params: start_date, end_date
+ORDERS_COMPLETE_BETWEEN = _shape(
+    "orders_complete_between",
+    select(Order).options(*_ORDER_DETAIL_OPTIONS).where(
+        Order.order_date >= bindparam("start_date"),
+        Order.order_date <= bindparam("end_date")
+    ).order_by(*_ORDER_NEWEST_FIRST)
+)
+
+# Order list keyed by (filter on status, from date, to date) - params: status, start_date, end_date
+ORDER_LIST = {}
+for _by_status in (False, True):
+    for _from in (False, True):
+        for _to in (False, True):
+            _statement = select(Order)
+            if _by_status:
+                _statement = _statement.where(Order.order_status == bindparam("status"))
+            if _from:
+                _statement = _statement.where(Order.order_date >= bindparam("start_date"))
+            if _to:
+                _statement = _statement.where(Order.order_date <= bindparam("end_date"))
+            ORDER_LIST[(_by_status, _from, _to)] = _shape(
+                "order_list" + ("_by_status" if _by_status else "")
+                + ("_from" if _from else "") + ("_to" if _to else ""),
+                _statement.order_by(*_ORDER_NEWEST_FIRST)
+            )
+
+# Per-order aggregates for the summary list - params: order_id
+ORDER_ITEMS_TOTAL = _shape(
+    "order_items_total",
+    select(func.sum(OrderItem.total)).where(OrderItem.order_id == bindparam("order_id"))
+)
+ORDER_PAYMENTS_TOTAL = _shape(
+    "order_payments_total",
+    select(func.sum(Payment.total_paid)).where(
+        Payment.order_id == bindparam("order_id"),
+        Payment.payment_status == "Completed"
+    )
+)
+ORDER_ITEM_COUNT = _shape(
+    "order_item_count",
+    select(func.count(OrderItem.id)).where(OrderItem.order_id == bindparam("order_id"))
+)
+
+
+# ================================================================
+# ARCHIVE QUERIES
+# ================================================================
+
+_ARCHIVED_ORDER_DETAIL_OPTIONS = (
+    joinedload(ArchivedOrder.order_items).joinedload(ArchivedOrderItem.item).joinedload(Item.category),
+    joinedload(ArchivedOrder.order_items).joinedload(ArchivedOrderItem.item).joinedload(Item.menu),
+    joinedload(ArchivedOrder.payments),
+)
+
+# Archived order with items and payments - params: order_id
+ARCHIVED_ORDER_DETAIL = _shape(
+    "archived_order_detail",
+    select(ArchivedOrder).options(*_ARCHIVED_ORDER_DETAIL_OPTIONS).where(
+        ArchivedOrder.order_id == bindparam("order_id")
+    )
+)
+
+# Archived orders in a date range with items and payments, newest first - params: start_date, end_date
+ARCHIVED_ORDERS_COMPLETE = _shape(
+    "archived_orders_complete",
+    select(ArchivedOrder).options(*_ARCHIVED_ORDER_DETAIL_OPTIONS).where(
+        ArchivedOrder.order_date >= bindparam("start_date"),
+        ArchivedOrder.order_date <= bindparam("end_date")
+    ).order_by(desc(ArchivedOrder.order_date), desc(ArchivedOrder.order_id))
+)
+
+_archived_lines = select(
+    ArchivedOrderItem.order_id,
+    func.sum(ArchivedOrderItem.total).label("order_total"),
+    func.count(ArchivedOrderItem.id).label("total_items")
+).group_by(ArchivedOrderItem.order_id).subquery()
+
+_archived_paid = select(
+    ArchivedPayment.order_id,
+    func.sum(ArchivedPayment.total_paid).label("total_payments")
+).where(ArchivedPayment.payment_status == "Completed").group_by(ArchivedPayment.order_id).subquery()
+
+# Archived order summaries in a date range, keyed by filter on status - params: status, start_date, end_date
+ARCHIVED_ORDER_SUMMARIES = {}
+for _by_status in (False, True):
+    _statement = select(
+        ArchivedOrder.order_id,
+        ArchivedOrder.order_date,
+        ArchivedOrder.order_status,
+        ArchivedOrder.location,
+        func.coalesce(_archived_lines.c.total_items, 0),
+        _archived_lines.c.order_total,
+        _archived_paid.c.total_payments
+    ).outerjoin(
+        _archived_lines, _archived_lines.c.order_id == ArchivedOrder.order_id
+    ).outerjoin(
+        _archived_paid, _archived_paid.c.order_id == ArchivedOrder.order_id
+    ).where(
+        ArchivedOrder.order_date >= bindparam("start_date"),
+        ArchivedOrder.order_date <= bindparam("end_date")
+    )
+    if _by_status:
+        _statement = _statement.where(ArchivedOrder.order_status == bindparam("status"))
+    ARCHIVED_ORDER_SUMMARIES[_by_status] = _shape(
+        "archived_order_summaries" + ("_by_status" if _by_status else ""),
+        _statement.order_by(desc(ArchivedOrder.order_date), desc(ArchivedOrder.order_id))
+    )
+
+ARCHIVE_TOTALS = _shape("archive_totals", select(ArchiveTotals).where(ArchiveTotals.id == 1))
+
+# Running archived revenue rows of one breakdown dimension - params: dimension
+ARCHIVE_REVENUE_TOTALS = _shape(
+    "archive_revenue_totals",
+    select(
+        ArchiveRevenueTotals.dimension_value,
+        ArchiveRevenueTotals.revenue,
+        ArchiveRevenueTotals.quantity,
+        ArchiveRevenueTotals.line_items
+    ).where(
+        ArchiveRevenueTotals.dimension == bindparam("dimension")
+    ).order_by(ArchiveRevenueTotals.dimension_value)
+)
+
+
+# ================================================================
+# STATISTICS QUERIES
+# ================================================================
+
+TOTAL_ORDERS = _shape("total_orders", select(func.count(Order.order_id)))
+TOTAL_REVENUE = _shape("total_revenue", select(func.sum(OrderItem.total)))
+TOTAL_PAYMENTS = _shape(
+    "total_payments",
+    select(func.sum(Payment.total_paid)).where(Payment.payment_status == "Completed")
+)
+
+
+def _revenue_dimensions(line, order):
+    """Dimension -> (key column, joins) for the line items of the hot or the archive tables"""
+    return {
+        "date": (order.order_date, [(order, order.order_id == line.order_id)]),
+        "item": (Item.item_name, [(Item, Item.item_id == line.item_id)]),
+        "category": (Category.category_name, [
+            (Item, Item.item_id == line.item_id),
+            (Category, Category.cat_id == Item.cat_id)
+        ]),
+        "menu": (Menu.menu_name, [
+            (Item, Item.item_id == line.item_id),
+            (Menu, Menu.menu_id == Item.menu_id)
+        ]),
+    }
+
+
+def _revenue_breakdown(line, order, prefix):
+    statements = {}
+    for group_by, (key_column, joins) in _revenue_dimensions(line, order).items():
+        statement = select(
+            key_column,
+            func.sum(line.total),
+            func.sum(line.quantity),
+            func.count(line.id)
+        ).select_from(line)
+        for target, on_clause in joins:
+            statement = statement.join(target, on_clause)
+        statements[group_by] = _shape(
+            f"{prefix}_by_{group_by}",
+            statement.group_by(key_column).order_by(key_column)
+        )
+    return statements
+
+
+# Revenue, quantity and line count per dimension value, keyed by dimension
+# (the archived breakdown feeds archive_revenue_totals one batch at a time)
+REVENUE_BREAKDOWN = _revenue_breakdown(OrderItem, Order, "revenue")
+ARCHIVED_REVENUE_BREAKDOWN = _revenue_breakdown(ArchivedOrderItem, ArchivedOrder, "archived_revenue")
+
+
+# ================================================================
+# COMPILED CACHE HIT RATE
+# ================================================================
+
+_stats_lock = threading.Lock()
+_cache_stats = {}
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_cache_hit(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    shape = context.execution_options.get("query_shape", "other")
+    with _stats_lock:
+        counts = _cache_stats.get(shape)
+        if counts is None:
+            counts = _cache_stats[shape] = {"executions": 0, "hits": 0, "misses": 0}
+        counts["executions"] += 1
+        if context.cache_hit is CACHE_HIT:
+            counts["hits"] += 1
+        elif context.cache_hit is CACHE_MISS:
+            counts["misses"] += 1
+
+
+def _compiled_cache_size(engine):
+    compiled_cache = getattr(engine, "_compiled_cache", None)
+    return {
+        "compiled_cache_entries": len(compiled_cache) if compiled_cache is not None else None,
+        "compiled_cache_capacity": compiled_cache.capacity if compiled_cache is not None else None,
+    }
+
+
+def cache_report(shard_router=None):
+    """
+    Compiled-cache hit rate per query shape
+
+    Args:
+        shard_router: Router whose engines are reported (defaults to sharding.router)
+
+    Returns:
+        dict: Main engine cache size, cache size per location and per-shape
+              executions, hits, misses and hit rate over all locations.
+              Executions that are neither hits nor misses were not cacheable.
+    """
+    with _stats_lock:
+        shapes = {name: dict(counts) for name, counts in _cache_stats.items()}
+    for counts in shapes.values():
+        looked_up = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / looked_up, 4) if looked_up else None
+
+    engines = {
+        location: _compiled_cache_size(engine)
+        for location, engine in (shard_router or sharding.router).engines.items()
+    }
+    return {
+        **engines[DEFAULT_LOCATION],
+        "locations": engines,
+        "shapes": dict(sorted(shapes.items())),
+    }
+
+
+def reset_cache_stats():
+    """Clear the per-shape counters"""
+    with _stats_lock:
+        _cache_stats.clear()
@@ -0,0 +1,579 @@
+"""
+In-Memory Read Model Module
+Compact array-backed copy of orders, order items and payments for read endpoints
+"""
+
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select, or_
+
+from app.database import get_session_factory, DEFAULT_LOCATION, RecentKeys
+from app.models import Order, OrderItem, Payment, Item, Category, Menu, ArchivedOrder
+from app.schemas import OrderDetailResponse, OrderSummary, OrderItemResponse, PaymentResponse
+
+
+# Read model configuration from environment
+READ_MODEL_ENABLED = os.getenv("READ_MODEL_ENABLED", "False").lower() == "true"
+READ_MODEL_REFRESH_SECONDS = float(os.getenv("READ_MODEL_REFRESH_SECONDS", "10"))
+READ_MODEL_BATCH_SIZE = int(os.getenv("READ_MODEL_BATCH_SIZE", "10000"))
+# Rebuild the column arrays once this fraction of their rows belongs to removed (archived) orders
+READ_MODEL_COMPACT_RATIO = float(os.getenv("READ_MODEL_COMPACT_RATIO", "0.25"))
+# Drop lines/payments whose order header has not arrived after this many refreshes
+READ_MODEL_PENDING_REFRESHES = int(os.getenv("READ_MODEL_PENDING_REFRESHES", "3"))
+
+LINE_COLUMNS = ("line_id", "line_item", "line_size", "line_price", "line_quantity", "line_total")
+PAYMENT_COLUMNS = (
+    "payment_id", "payment_date", "payment_due", "payment_tips", "payment_discount",
+    "payment_paid", "payment_type", "payment_status",
+)
+
+
+def _to_cents(value):
+    return int((Decimal(value or 0) * 100).to_integral_value())
+
+
+def _from_cents(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class _Codes:
+    """Interns repeated short strings (sizes, statuses, payment types) as small ints"""
+
+    __slots__ = ("values", "index")
+
+    def __init__(self):
+        self.values = [None]
+        self.index = {None: 0}
+
+    def code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.index[value] = code
+        return code
+
+
+class OrderRecord:
+    """Order header plus row numbers of its lines and payments in the column stores"""
+
+    __slots__ = ("order_id", "order_date", "status", "created_at", "lines", "payments")
+
+    def __init__(self, order_id, order_date, status, created_at):
+        self.order_id = order_id
+        self.order_date = order_date
+        self.status = status
+        self.created_at = created_at
+        self.lines = array("I")
+        self.payments = array("I")
+
+
+class ReadModel:
+    """
+    Order history held in typed arrays, indexed by order_id and order date.
+
+    Line items and payments are stored column-wise (``array`` of ints, money
+    in cents, strings interned to codes); each order keeps the row numbers of
+    its lines and payments. Refreshed from the database by key and
+    ``updated_at`` watermarks, like the analytics mirror; order lines have no
+    ``updated_at``, so the trailing LATE_COMMIT_WINDOW of line ids is re-read
+    to pick up lines committed late under a lower id.
+
+    Rows of removed (archived) orders stay in the columns until they make up
+    ``compact_ratio`` of them; the arrays are then rebuilt without them.
+    """
+
+    def __init__(self, session_factory=None, compact_ratio=READ_MODEL_COMPACT_RATIO,
+                 pending_refreshes=READ_MODEL_PENDING_REFRESHES):
+        self.session_factory = session_factory or get_session_factory()
+        self._lock = threading.RLock()
+        self.codes = _Codes()
+        self.catalog = {}
+        self.orders = {}
+        self._by_date = []
+
+        # Line item columns
+        self.line_id = array("q")
+        self.line_item = array("i")
+        self.line_size = array("H")
+        self.line_price = array("q")
+        self.line_quantity = array("i")
+        self.line_total = array("q")
+
+        # Payment columns
+        self.payment_id = array("q")
+        self.payment_date = array("i")
+        self.payment_due = array("q")
+        self.payment_tips = array("q")
+        self.payment_discount = array("q")
+        self.payment_paid = array("q")
+        self.payment_type = array("H")
+        self.payment_status = array("H")
+        self._payment_rows = {}
+
+        # Lines/payments seen before their order header, replayed on upsert_order;
+        # _pending_since holds the refresh in which each order's first one was seen
+        self._pending = {}
+        self._pending_since = {}
+        self.pending_refreshes = pending_refreshes
+        self.pending_expired = 0
+
+        # Column rows of removed orders, reclaimed by _compact()
+        self.compact_ratio = compact_ratio
+        self._dead_lines = 0
+        self._dead_payments = 0
+        self.compactions = 0
+        self.refreshes = 0
+
+        self._watermarks = {"orders": (0, None), "payments": (0, None)}
+        self._lines = RecentKeys()
+        self._archived_since = None
+        self.last_refreshed_at = None
+        self.snapshot_at = None  # time.time() when the last refresh started reading
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------
+    # Write events
+    # ------------------------------------------------------------
+
+    def upsert_order(self, order_id, order_date, status, created_at=None):
+        """Insert or update an order header"""
+        with self._lock:
+            record = self.orders.get(order_id)
+            if record is None:
+                record = OrderRecord(order_id, order_date, status, created_at)
+                self.orders[order_id] = record
+                insort(self._by_date, (order_date.toordinal(), order_id))
+                self._pending_since.pop(order_id, None)
+                for apply, values in self._pending.pop(order_id, ()):
+                    apply(*values)
+                return record
+            if record.order_date != order_date:
+                self._by_date.remove((record.order_date.toordinal(), order_id))
+                insort(self._by_date, (order_date.toordinal(), order_id))
+                record.order_date = order_date
+            record.status = status
+            if created_at is not None:
+                record.created_at = created_at
+            return record
+
+    def append_line(self, line_id, order_id, item_id, size, price, quantity, total):
+        """Append an order line (order lines are immutable once written)"""
+        with self._lock:
+            record = self.orders.get(order_id)
+            if record is None:
+                self._defer(order_id, self.append_line, (line_id, order_id, item_id, size, price, quantity, total))
+                return
+            record.lines.append(len(self.line_id))
+            self.line_id.append(line_id)
+            self.line_item.append(item_id)
+            self.line_size.append(self.codes.code(size))
+            self.line_price.append(_to_cents(price))
+            self.line_quantity.append(quantity)
+            self.line_total.append(_to_cents(total))
+
+    def upsert_payment(self, payment_id, order_id, payment_date, amount_due, tips,
+                       discount, total_paid, payment_type, payment_status):
+        """Insert or update a payment in place"""
+        with self._lock:
+            record = self.orders.get(order_id)
+            if record is None:
+                self._defer(order_id, self.upsert_payment, (
+                    payment_id, order_id, payment_date, amount_due, tips,
+                    discount, total_paid, payment_type, payment_status
+                ))
+                return
+            values = (
+                (self.payment_date, payment_date.toordinal()),
+                (self.payment_due, _to_cents(amount_due)),
+                (self.payment_tips, _to_cents(tips)),
+                (self.payment_discount, _to_cents(discount)),
+                (self.payment_paid, _to_cents(total_paid)),
+                (self.payment_type, self.codes.code(payment_type)),
+                (self.payment_status, self.codes.code(payment_status)),
+            )
+            row = self._payment_rows.get(payment_id)
+            if row is None:
+                row = len(self.payment_id)
+                self._payment_rows[payment_id] = row
+                self.payment_id.append(payment_id)
+                for column, value in values:
+                    column.append(value)
+                record.payments.append(row)
+            else:
+                for column, value in values:
+                    column[row] = value
+
+    def _defer(self, order_id, apply, values):
+        self._pending.setdefault(order_id, []).append((apply, values))
+        self._pending_since.setdefault(order_id, self.refreshes)
+
+    def remove_order(self, order_id):
+        """Drop an order that left the hot tables (archived); its rows stop counting"""
+        with self._lock:
+            self._pending.pop(order_id, None)
+            self._pending_since.pop(order_id, None)
+            record = self.orders.pop(order_id, None)
+            if record is None:
+                return
+            key = (record.order_date.toordinal(), order_id)
+            index = bisect_left(self._by_date, key)
+            if index < len(self._by_date) and self._by_date[index] == key:
+                del self._by_date[index]
+            # Zero the amounts so totals exclude the rows until _compact() drops them
+            for row in record.lines:
+                self.line_total[row] = 0
+            for row in record.payments:
+                self.payment_paid[row] = 0
+                self._payment_rows.pop(self.payment_id[row], None)
+            self._dead_lines += len(record.lines)
+            self._dead_payments += len(record.payments)
+
+    def _compact(self):
+        """Rebuild the column arrays with only the rows of current orders"""
+        with self._lock:
+            lines = {name: array(getattr(self, name).typecode) for name in LINE_COLUMNS}
+            payments = {name: array(getattr(self, name).typecode) for name in PAYMENT_COLUMNS}
+            for record in self.orders.values():
+                first = len(lines["line_id"])
+                for name, column in lines.items():
+                    source = getattr(self, name)
+                    column.extend(source[row] for row in record.lines)
+                record.lines = array("I", range(first, len(lines["line_id"])))
+
+                first = len(payments["payment_id"])
+                for name, column in payments.items():
+                    source = getattr(self, name)
+                    column.extend(source[row] for row in record.payments)
+                record.payments = array("I", range(first, len(payments["payment_id"])))
+
+            for name, column in {**lines, **payments}.items():
+                setattr(self, name, column)
+            self._payment_rows = {payment_id: row for row, payment_id in enumerate(self.payment_id)}
+            self._dead_lines = self._dead_payments = 0
+            self.compactions += 1
+
+    def _maintain(self):
+        """After a refresh: expire lines/payments whose order never arrived, and compact"""
+        expired = [
+            order_id for order_id, since in self._pending_since.items()
+            if self.refreshes - since >= self.pending_refreshes
+        ]
+        for order_id in expired:
+            self.pending_expired += len(self._pending.pop(order_id, ()))
+            del self._pending_since[order_id]
+        if expired:
+            print(f"⚠️ Read model dropped rows of {len(expired)} order(s) that never arrived")
+
+        if (self._dead_lines > self.compact_ratio * len(self.line_id)
+                or self._dead_payments > self.compact_ratio * len(self.payment_id)):
+            self._compact()
+
+    # ------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------
+
+    def refresh(self):
+        """
+        Apply new and changed rows from the database
+
+        Returns:
+            dict: Number of rows applied per table
+        """
+        applied = {}
+        db = self.session_factory()
+        try:
+            with self._lock:
+                started = time.time()
+                self._load_catalog(db)
+                applied["orders"] = self._apply_delta(
+                    db, "orders", Order.order_id,
+                    [Order.order_id, Order.order_date, Order.order_status, Order.created_at],
+                    Order.updated_at, self.upsert_order
+                )
+                applied["order_items"] = self._apply_delta(
+                    db, "order_items", OrderItem.id,
+                    [OrderItem.id, OrderItem.order_id, OrderItem.item_id, OrderItem.size,
+                     OrderItem.price, OrderItem.quantity, OrderItem.total],
+                    None, self.append_line, recent=self._lines
+                )
+                applied["payments"] = self._apply_delta(
+                    db, "payments", Payment.payment_id,
+                    [Payment.payment_id, Payment.order_id, Payment.payment_date,
+                     Payment.amount_due, Payment.tips, Payment.discount, Payment.total_paid,
+                     Payment.payment_type, Payment.payment_status],
+                    Payment.updated_at, self.upsert_payment
+                )
+                applied["archived"] = self._remove_archived(db)
+                self.refreshes += 1
+                self._maintain()
+                self.last_refreshed_at = datetime.now()
+                self.snapshot_at = started
+        finally:
+            db.close()
+        return applied
+
+    def _load_catalog(self, db):
+        rows = db.execute(
+            select(Item.item_id, Item.item_name, Category.category_name, Menu.menu_name)
+            .join(Category, Category.cat_id == Item.cat_id)
+            .join(Menu, Menu.menu_id == Item.menu_id)
+        ).all()
+        self.catalog = {item_id: (name, category, menu) for item_id, name, category, menu in rows}
+
+    def _apply_delta(self, db, table, pk_column, columns, updated_column, apply, recent=None):
+        # Append-only tables (recent: RecentKeys) re-read their late-commit window instead of a watermark
+        last_pk, last_updated = self._watermarks.get(table, (0, None))
+        condition = pk_column > (recent.floor if recent is not None else last_pk)
+        if updated_column is not None and last_updated is not None:
+            condition = or_(condition, updated_column >= last_updated)
+        query_columns = list(columns)
+        if updated_column is not None:
+            query_columns.append(updated_column)
+
+        applied = 0
+        result = db.execute(
+            select(*query_columns).where(condition).order_by(pk_column)
+        ).yield_per(READ_MODEL_BATCH_SIZE)
+        for row in result:
+            values = tuple(row[:len(columns)])
+            if recent is not None and not recent.add(values[0]):
+                continue
+            apply(*values)
+            last_pk = max(last_pk, values[0])
+            if updated_column is not None and row[-1] is not None:
+                if last_updated is None or row[-1] > last_updated:
+                    last_updated = row[-1]
+            applied += 1
+
+        if recent is None:
+            self._watermarks[table] = (last_pk, last_updated)
+        return applied
+
+    def _remove_archived(self, db):
+        """Drop orders moved to the archive since the last refresh"""
+        query = select(ArchivedOrder.order_id, ArchivedOrder.archived_at)
+        if self._archived_since is not None:
+            query = query.where(ArchivedOrder.archived_at >= self._archived_since)
+        removed = 0
+        for order_id, archived_at in db.execute(query).yield_per(READ_MODEL_BATCH_SIZE):
+            if order_id in self.orders:
+                self.remove_order(order_id)
+                removed += 1
+            if self._archived_since is None or archived_at > self._archived_since:
+                self._archived_since = archived_at
+        return removed
+
+    def start(self, interval=READ_MODEL_REFRESH_SECONDS):
+        """Start periodic delta refresh in a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="read-model", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"✗ Read model refresh failed: {str(e)}")
+
+    # ------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------
+
+    def _totals(self, record):
+        subtotal = sum(self.line_total[row] for row in record.lines)
+        completed = self.codes.index.get("Completed")
+        paid = sum(
+            self.payment_paid[row] for row in record.payments
+            if self.payment_status[row] == completed
+        )
+        return subtotal, paid
+
+    def order_ids(self, status=None, order_date=None, start=None, end=None):
+        """
+        Order IDs newest first, optionally filtered
+
+        Args:
+            status: Order status to match
+            order_date: Single order date
+            start, end: Inclusive date range
+
+        Returns:
+            list: Matching order IDs ordered by date desc, order_id desc
+        """
+        with self._lock:
+            if order_date is not None:
+                start = end = order_date
+            low = bisect_left(self._by_date, (start.toordinal(), -1)) if start else 0
+            high = bisect_right(self._by_date, (end.toordinal() + 1, -1)) if end else len(self._by_date)
+            ids = [order_id for _, order_id in reversed(self._by_date[low:high])]
+            if status is not None:
+                ids = [order_id for order_id in ids if self.orders[order_id].status == status]
+            return ids
+
+    def summary(self, order_id):
+        """Build an OrderSummary for one order"""
+        with self._lock:
+            record = self.orders[order_id]
+            subtotal, paid = self._totals(record)
+            return OrderSummary(
+                order_id=record.order_id,
+                order_date=record.order_date,
+                order_status=record.status,
+                location=DEFAULT_LOCATION,  # The read model holds the main database only
+                total_items=len(record.lines),
+                order_total=_from_cents(subtotal),
+                total_payments=_from_cents(paid),
+                payment_balance=_from_cents(subtotal - paid)
+            )
+
+    def detail(self, order_id):
+        """
+        Build an OrderDetailResponse for one order
+
+        Returns:
+            OrderDetailResponse: Order details, or None if the order is unknown
+        """
+        with self._lock:
+            record = self.orders.get(order_id)
+            if record is None:
+                return None
+            strings = self.codes.values
+
+            items = []
+            for row in record.lines:
+                item_id = self.line_item[row]
+                item_name, category_name, menu_name = self.catalog.get(item_id, ("", "", ""))
+                items.append(OrderItemResponse(
+                    id=self.line_id[row],
+                    item_id=item_id,
+                    item_name=item_name,
+                    category_name=category_name,
+                    menu_name=menu_name,
+                    size=strings[self.line_size[row]],
+                    price=_from_cents(self.line_price[row]),
+                    quantity=self.line_quantity[row],
+                    total=_from_cents(self.line_total[row])
+                ))
+
+            payments = []
+            for row in record.payments:
+                payments.append(PaymentResponse(
+                    payment_id=self.payment_id[row],
+                    payment_date=date.fromordinal(self.payment_date[row]),
+                    amount_due=_from_cents(self.payment_due[row]),
+                    tips=_from_cents(self.payment_tips[row]),
+                    discount=_from_cents(self.payment_discount[row]),
+                    total_paid=_from_cents(self.payment_paid[row]),
+                    payment_type=strings[self.payment_type[row]],
+                    payment_status=strings[self.payment_status[row]]
+                ))
+
+            subtotal, paid = self._totals(record)
+            return OrderDetailResponse(
+                order_id=record.order_id,
+                order_date=record.order_date,
+                order_status=record.status,
+                location=DEFAULT_LOCATION,
+                created_at=record.created_at,
+                items=items,
+                payments=payments,
+                total_items_count=len(items),
+                order_subtotal=_from_cents(subtotal),
+                total_paid=_from_cents(paid),
+                payment_balance=_from_cents(subtotal - paid)
+            )
+
+    def statistics(self):
+        """
+        Business overview computed from the column stores
+
+        Returns:
+            dict: Same fields as the database statistics query
+        """
+        with self._lock:
+            completed = self.codes.index.get("Completed")
+            paid = sum(
+                amount for amount, code in zip(self.payment_paid, self.payment_status)
+                if code == completed
+            )
+            return {
+                "total_orders": len(self.orders),
+                "total_revenue": _from_cents(sum(self.line_total)),
+                "total_payments_received": _from_cents(paid),
+            }
+
+    def memory_bytes(self):
+        """Approximate bytes held by the column arrays and order records"""
+        with self._lock:
+            columns = [getattr(self, name) for name in LINE_COLUMNS + PAYMENT_COLUMNS]
+            total = sum(column.itemsize * len(column) for column in columns)
+            for record in self.orders.values():
+                total += (OrderRecord.__basicsize__
+                          + record.lines.itemsize * len(record.lines)
+                          + record.payments.itemsize * len(record.payments))
+            return total
+
+
+# Process-wide read model instance (None when disabled)
+read_model = None
+
+
+def start_read_model():
+    """
+    Load the read model and start periodic refresh
+
+    If the initial load fails the order endpoints read the database until a
+    background refresh succeeds.
+
+    Returns:
+        ReadModel: The read model, or None if disabled
+    """
+    global read_model
+    if not READ_MODEL_ENABLED:
+        return None
+    model = ReadModel()
+    try:
+        model.refresh()
+    except Exception as e:
+        print(f"✗ WARNING: Initial read model load failed: {str(e)}")
+    model.start()
+    read_model = model
+    return model
+
+
+def stop_read_model():
+    """Stop background refresh of the read model"""
+    if read_model is not None:
+        read_model.stop()
+
+
+def get_read_model():
+    """
+    Get the read model if enabled and loaded
+
+    Returns:
+        ReadModel: Loaded read model, or None to fall back to the database
+    """
+    if read_model is not None and read_model.last_refreshed_at is not None:
+        return read_model
+    return None
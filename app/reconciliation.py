@@ -0,0 +1,360 @@
+"""
+Payment Reconciliation Module
+Vectorised data-quality scan over orders, order items and payments
+
+Usage:
+    python -m app.reconciliation            # scan and write the report table
+    python -m app.reconciliation --dry-run  # scan and print the summary only
+"""
+
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import BigInteger, Float, Integer, case, cast, func, insert, select
+
+from app.database import get_session_factory
+from app.models import Order, OrderItem, Payment, Item, ReconciliationIssue
+
+
+# Anomaly classes detected by the scanner (see TASK1_DATA_ANALYSIS_FINDINGS.md, 6.2)
+ANOMALY_TYPES = (
+    "overpaid",                 # Completed payments exceed subtotal - discount + tips
+    "underpaid",                # Completed payments fall short of subtotal - discount + tips
+    "open_underpaid",           # Same shortfall on an open order (not due yet, e.g. Pending)
+    "refunded_payment",         # Payment marked as Refunded
+    "refunded_order_completed", # Order still Completed although a payment was refunded
+    "missing_size",             # Item has size variants but the line has no size
+    "price_precision",          # Price carries more than two decimal places
+    "line_total_mismatch",      # price x quantity differs from the stored line total
+    "payment_total_mismatch",   # Completed payments differ from amount_due - discount + tips
+    "amount_due_mismatch",      # amount_due differs from the order subtotal
+)
+
+# Order statuses that are not due for payment yet
+OPEN_ORDER_STATUSES = [
+    s.strip() for s in os.getenv("RECONCILIATION_OPEN_STATUSES", "Pending").split(",") if s.strip()
+]
+
+# Loading batch size for streaming rows into the column arrays
+FETCH_BATCH_SIZE = 50000
+
+# Amounts are compared in whole cents; anything finer is a precision issue
+CENT_TOLERANCE = 1e-6
+
+
+def _load_columns(db, columns):
+    """
+    Stream a select into one NumPy array per column
+
+    Args:
+        db: SQLAlchemy session
+        columns: (name, column expression, dtype) triples
+
+    Returns:
+        dict: Column name -> array (object dtype for strings)
+    """
+    buffers = [[] for _ in columns]
+    result = db.execute(select(*(expression for _, expression, _ in columns))).yield_per(FETCH_BATCH_SIZE)
+    for batch in result.partitions(FETCH_BATCH_SIZE):
+        for index, values in enumerate(zip(*batch)):
+            buffers[index].extend(values)
+    return {
+        name: np.asarray(buffer, dtype=dtype) for (name, _, dtype), buffer in zip(columns, buffers)
+    }
+
+
+def _cents(column):
+    """Amount in whole cents, rounded by the database (NULL as 0)"""
+    return cast(func.round(func.coalesce(column, 0) * 100, 0), BigInteger)
+
+
+def load_frames(db):
+    """
+    Load orders, items, order lines and payments as columnar arrays
+
+    Amounts arrive as integer cents computed in SQL, so no Decimal is built
+    per row; only the line price is also loaded as a float, for the precision check.
+
+    Args:
+        db: SQLAlchemy session
+
+    Returns:
+        dict: Table name -> {column name: np.ndarray}
+    """
+    return {
+        "orders": _load_columns(db, [
+            ("order_id", Order.order_id, np.int64),
+            ("order_status", Order.order_status, object),
+        ]),
+        "items": _load_columns(db, [
+            ("item_id", Item.item_id, np.int64),
+            ("has_size_variants", Item.has_size_variants, bool),
+        ]),
+        "order_items": _load_columns(db, [
+            ("id", OrderItem.id, np.int64),
+            ("order_id", OrderItem.order_id, np.int64),
+            ("item_id", OrderItem.item_id, np.int64),
+            ("size_missing", case((func.coalesce(OrderItem.size, "") == "", 1), else_=0).cast(Integer), bool),
+            ("price", cast(OrderItem.price, Float), np.float64),
+            ("quantity", OrderItem.quantity, np.int64),
+            ("total_cents", _cents(OrderItem.total), np.int64),
+        ]),
+        "payments": _load_columns(db, [
+            ("payment_id", Payment.payment_id, np.int64),
+            ("order_id", Payment.order_id, np.int64),
+            ("amount_due_cents", _cents(Payment.amount_due), np.int64),
+            ("tips_cents", _cents(Payment.tips), np.int64),
+            ("discount_cents", _cents(Payment.discount), np.int64),
+            ("total_paid_cents", _cents(Payment.total_paid), np.int64),
+            ("payment_status", Payment.payment_status, object),
+        ]),
+    }
+
+
+def _position(sorted_keys, keys):
+    """Map keys to their index in sorted_keys (-1 where absent)"""
+    if len(sorted_keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    index = np.searchsorted(sorted_keys, keys)
+    index = np.clip(index, 0, len(sorted_keys) - 1)
+    return np.where(sorted_keys[index] == keys, index, -1)
+
+
+def scan(frames):
+    """
+    Detect every anomaly class in a single vectorised pass
+
+    Args:
+        frames: Output of load_frames()
+
+    Returns:
+        dict: Anomaly type -> dict of equal-length arrays
+              (order_id, payment_id, order_item_id, expected, actual)
+    """
+    orders, items = frames["orders"], frames["items"]
+    lines, pays = frames["order_items"], frames["payments"]
+
+    # Sort orders once so every table can be mapped to an order slot
+    order_sort = np.argsort(orders["order_id"], kind="stable")
+    order_ids = orders["order_id"][order_sort]
+    order_status = orders["order_status"][order_sort]
+    n_orders = len(order_ids)
+
+    line_slot = _position(order_ids, lines["order_id"])
+    pay_slot = _position(order_ids, pays["order_id"])
+    line_known = line_slot >= 0
+    pay_known = pay_slot >= 0
+
+    # Per-order aggregates in cents (split payments repeat the order's amount_due)
+    def per_order(slots, mask, values):
+        return np.bincount(slots[mask], weights=values[mask], minlength=n_orders).astype(np.int64)
+
+    completed = pays["payment_status"] == "Completed"
+    refunded = pays["payment_status"] == "Refunded"
+    paid_mask = completed & pay_known
+    line_total_cents = lines["total_cents"]
+    subtotal = per_order(line_slot, line_known, line_total_cents)
+    paid = per_order(pay_slot, paid_mask, pays["total_paid_cents"])
+    tips = per_order(pay_slot, paid_mask, pays["tips_cents"])
+    discount = per_order(pay_slot, paid_mask, pays["discount_cents"])
+    amount_due = np.full(n_orders, -1, dtype=np.int64)
+    np.maximum.at(amount_due, pay_slot[pay_known], pays["amount_due_cents"][pay_known])
+
+    # What the customer should have paid after discounts and tips
+    net_due = subtotal - discount + tips
+    balance = net_due - paid
+
+    issues = {}
+
+    def add(kind, mask, order_id=None, payment_id=None, order_item_id=None,
+            expected=None, actual=None):
+        count = int(np.count_nonzero(mask))
+        missing = np.full(count, -1, dtype=np.int64)
+        nan = np.full(count, np.nan)
+        issues[kind] = {
+            "order_id": order_id[mask] if order_id is not None else missing,
+            "payment_id": payment_id[mask] if payment_id is not None else missing,
+            "order_item_id": order_item_id[mask] if order_item_id is not None else missing,
+            "expected": expected[mask] if expected is not None else nan,
+            "actual": actual[mask] if actual is not None else nan,
+        }
+
+    # Order-level balance checks (orders without any payment count as underpaid once they are due)
+    is_open = np.isin(order_status, OPEN_ORDER_STATUSES)
+    add("overpaid", balance < 0, order_id=order_ids,
+        expected=net_due / 100, actual=paid / 100)
+    add("underpaid", (balance > 0) & ~is_open, order_id=order_ids,
+        expected=net_due / 100, actual=paid / 100)
+    add("open_underpaid", (balance > 0) & is_open, order_id=order_ids,
+        expected=net_due / 100, actual=paid / 100)
+
+    # Refunds
+    add("refunded_payment", refunded, order_id=pays["order_id"], payment_id=pays["payment_id"],
+        actual=pays["total_paid_cents"] / 100)
+    refund_slots = np.zeros(n_orders, dtype=bool)
+    refund_slots[pay_slot[refunded & pay_known]] = True
+    add("refunded_order_completed", refund_slots & (order_status == "Completed"),
+        order_id=order_ids)
+
+    # Line-level checks
+    item_sort = np.argsort(items["item_id"], kind="stable")
+    item_slot = _position(items["item_id"][item_sort], lines["item_id"])
+    sized = np.zeros(len(item_slot), dtype=bool)
+    sized[item_slot >= 0] = items["has_size_variants"][item_sort][item_slot[item_slot >= 0]]
+    add("missing_size", sized & lines["size_missing"], order_id=lines["order_id"],
+        order_item_id=lines["id"])
+
+    price_cents = lines["price"] * 100
+    add("price_precision", np.abs(price_cents - np.rint(price_cents)) > CENT_TOLERANCE,
+        order_id=lines["order_id"], order_item_id=lines["id"],
+        expected=np.round(lines["price"], 2), actual=lines["price"])
+
+    expected_line = np.rint(price_cents * lines["quantity"]).astype(np.int64)
+    add("line_total_mismatch", expected_line != line_total_cents,
+        order_id=lines["order_id"], order_item_id=lines["id"],
+        expected=expected_line / 100, actual=lines["total_cents"] / 100)
+
+    # Payment checks against the order (only orders that have payments)
+    has_due = amount_due >= 0
+    expected_paid = amount_due - discount + tips
+    add("payment_total_mismatch", has_due & (expected_paid != paid), order_id=order_ids,
+        expected=expected_paid / 100, actual=paid / 100)
+    add("amount_due_mismatch", has_due & (amount_due != subtotal), order_id=order_ids,
+        expected=subtotal / 100, actual=amount_due / 100)
+
+    return issues
+
+
+def summarize(issues):
+    """
+    Count issues per anomaly type
+
+    Returns:
+        dict: Anomaly type -> number of affected rows
+    """
+    return {kind: int(len(columns["order_id"])) for kind, columns in issues.items()}
+
+
+def to_records(issues, run_id=None, limit=None):
+    """
+    Flatten scan output into report rows
+
+    Args:
+        issues: Output of scan()
+        run_id: Identifier stored with every row
+        limit: Optional maximum number of rows per anomaly type
+
+    Returns:
+        list: Dicts matching the reconciliation_issues columns
+    """
+    def optional_id(value):
+        return int(value) if value >= 0 else None
+
+    def optional_amount(value):
+        return round(float(value), 4) if not np.isnan(value) else None
+
+    records = []
+    for kind, columns in issues.items():
+        count = len(columns["order_id"])
+        if limit is not None:
+            count = min(count, limit)
+        for i in range(count):
+            records.append({
+                "run_id": run_id,
+                "anomaly_type": kind,
+                "order_id": optional_id(columns["order_id"][i]),
+                "payment_id": optional_id(columns["payment_id"][i]),
+                "order_item_id": optional_id(columns["order_item_id"][i]),
+                "expected_value": optional_amount(columns["expected"][i]),
+                "actual_value": optional_amount(columns["actual"][i]),
+            })
+    return records
+
+
+def write_report(db, issues, run_id):
+    """
+    Persist scan output to the reconciliation_issues table
+
+    Returns:
+        int: Number of rows written
+    """
+    records = to_records(issues, run_id=run_id)
+    created_at = datetime.now()
+    for record in records:
+        record["created_at"] = created_at
+    for start in range(0, len(records), FETCH_BATCH_SIZE):
+        db.execute(insert(ReconciliationIssue), records[start:start + FETCH_BATCH_SIZE])
+    db.commit()
+    return len(records)
+
+
+def run_reconciliation(db, persist=True):
+    """
+    Load, scan and optionally persist a reconciliation run
+
+    Args:
+        db: SQLAlchemy session
+        persist: Write the issues to the report table
+
+    Returns:
+        tuple: (run_id, issues, timings dict)
+    """
+    run_id = uuid.uuid4().hex
+    started = time.perf_counter()
+    frames = load_frames(db)
+    loaded = time.perf_counter()
+    issues = scan(frames)
+    scanned = time.perf_counter()
+    if persist:
+        write_report(db, issues, run_id)
+    finished = time.perf_counter()
+
+    timings = {
+        "rows": {table: len(next(iter(columns.values()))) for table, columns in frames.items()},
+        "load_seconds": round(loaded - started, 4),
+        "scan_seconds": round(scanned - loaded, 4),
+        "write_seconds": round(finished - scanned, 4),
+    }
+    return run_id, issues, timings
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Reconcile orders, order items and payments")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Scan only, do not write the reconciliation_issues table")
+    parser.add_argument("--show", type=int, default=0, metavar="N",
+                        help="Print up to N rows per anomaly type")
+    args = parser.parse_args(argv)
+
+    db = get_session_factory()()
+    try:
+        run_id, issues, timings = run_reconciliation(db, persist=not args.dry_run)
+    finally:
+        db.close()
+
+    print("=" * 60)
+    print(f"Reconciliation run {run_id}")
+    print("=" * 60)
+    for table, count in timings["rows"].items():
+        print(f"  {table}: {count} rows")
+    print(f"  Load: {timings['load_seconds']}s  Scan: {timings['scan_seconds']}s  "
+          f"Write: {timings['write_seconds']}s")
+    print("-" * 60)
+    for kind, count in summarize(issues).items():
+        print(f"  {kind:<26} {count}")
+    if args.show:
+        print("-" * 60)
+        for record in to_records(issues, run_id=run_id, limit=args.show):
+            print(f"  {record}")
+    if args.dry_run:
+        print("\nDry run - report table not written")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,718 @@
+"""
+Response Cache Module
+Serialised GET responses shared by every API worker on a host
+
+The expensive read endpoints (order lists and details, complete orders,
+statistics, revenue, the reconciliation scan) are cached as the exact bytes
+they returned, in one SQLite file on tmpfs (``/dev/shm``) that every worker
+process opens memory-mapped. A response computed by one worker is a hit for
+all of them, so adding workers does not divide the hit rate.
+
+Entries are evicted least-recently-used once the store exceeds
+RESPONSE_CACHE_MAX_BYTES, and expire after RESPONSE_CACHE_TTL_SECONDS.
+Committed writes - from an API worker, the write queue, the archiver or the
+bulk loader - bump generation counters in the shared file: one per table,
+and one per bucket of order ids for writes to order, line, payment and
+archive rows. An entry is valid while the generations of the tables (and,
+for an order detail, the order) its route reads are unchanged, so a payment
+for one order leaves the catalog, the other orders' details and the revenue
+report cached. A response built across a change, or from a read model or
+analytics snapshot taken before the change, is not stored.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.dml import Delete, Insert, Update
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+from starlette.concurrency import run_in_threadpool
+
+from app import profiling, sharding
+from app.database import SQLALCHEMY_DATABASE_URL
+from app.models import (
+    Menu, Category, Item, Order, OrderItem, Payment,
+    ArchivedOrder, ArchivedOrderItem, ArchivedPayment, ArchiveTotals, ArchiveRevenueTotals
+)
+
+
+# Response cache configuration from environment
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "False").lower() == "true"
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "")  # Default: /dev/shm, one file per database
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(RESPONSE_CACHE_MAX_BYTES // 4)))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+
+# Order ids share ORDER_BUCKETS generation counters; a statement touching more
+# than MAX_SCOPED_ORDERS orders (bulk load, large archive batch) invalidates all of them
+ORDER_BUCKETS = 4096
+MAX_SCOPED_ORDERS = 1000
+ALL_ORDERS = "order:*"
+
+_CATALOG = tuple(model.__tablename__ for model in (Menu, Category, Item))
+_ORDERS = tuple(model.__tablename__ for model in (Order, OrderItem, Payment))
+_ARCHIVE = tuple(model.__tablename__ for model in (ArchivedOrder, ArchivedOrderItem, ArchivedPayment))
+
+# Tables whose rows belong to one order - their writes are also scoped to the order ids
+ORDER_SCOPED_TABLES = frozenset(_ORDERS + _ARCHIVE)
+
+
+def order_token(order_id):
+    """Generation counter shared by the order ids in one bucket"""
+    return f"order:{int(order_id) % ORDER_BUCKETS}"
+
+
+class CachedRoute:
+    """
+    A cached GET path: the tables its response is read from, and the
+    in-memory snapshots (read model, analytics mirror) it may be served from
+    """
+
+    def __init__(self, pattern, tables, sources=(), per_order=False):
+        self.pattern = re.compile(pattern)
+        self.tables = tuple(tables)
+        self.sources = sources
+        self.per_order = per_order  # Depends on the order in the path, not the whole order tables
+
+    def dependencies(self, match):
+        """Generation counters a response for this path depends on"""
+        if self.per_order:
+            return [*self.tables, order_token(match.group("order_id")), ALL_ORDERS]
+        return list(self.tables)
+
+
+CACHED_ROUTES = [
+    CachedRoute(r"^/api/orders$", _ORDERS + _ARCHIVE, sources=("read_model",)),
+    CachedRoute(r"^/api/orders/(?P<order_id>\d+)$", _CATALOG, sources=("read_model",), per_order=True),
+    CachedRoute(r"^/api/orders/complete/all$", _ORDERS + _ARCHIVE + _CATALOG, sources=("read_model",)),
+    CachedRoute(r"^/api/statistics/overview$", _ORDERS + (ArchiveTotals.__tablename__,),
+                sources=("read_model", "analytics")),
+    CachedRoute(r"^/api/statistics/revenue$",
+                (Order.__tablename__, OrderItem.__tablename__, ArchiveRevenueTotals.__tablename__) + _CATALOG,
+                sources=("analytics",)),
+    CachedRoute(r"^/api/reconciliation$", _ORDERS + (Item.__tablename__,)),
+]
+
+# Writes to these tables bump generations; bookkeeping tables (write keys, load checkpoints) do not
+TRACKED_TABLES = frozenset(
+    table for route in CACHED_ROUTES for table in route.tables
+) | ORDER_SCOPED_TABLES
+
+# Headers that describe one response rather than the resource
+_UNCACHED_HEADERS = {b"date", b"server", b"x-profile-id", b"x-response-cache"}
+
+# Seconds between last-used updates of an entry (LRU order is approximate to this)
+_TOUCH_INTERVAL = 1.0
+
+# Bumped when the layout of the shared file changes; an older file is reset on open
+_SCHEMA_VERSION = 2
+
+_SCHEMA = f"""
+BEGIN IMMEDIATE;
+DROP TABLE IF EXISTS cache_meta;
+DROP TABLE IF EXISTS cache_entries;
+DROP TABLE IF EXISTS cache_generations;
+CREATE TABLE cache_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_bytes INTEGER NOT NULL
+);
+INSERT INTO cache_meta VALUES (1, 0);
+CREATE TABLE cache_generations (
+    token TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    changed_at REAL NOT NULL
+);
+CREATE TABLE cache_entries (
+    key TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX ix_cache_entries_last_used ON cache_entries (last_used);
+PRAGMA user_version = {_SCHEMA_VERSION};
+COMMIT;
+"""
+
+
+def default_path():
+    """Store file shared by the workers of one deployment (keyed by its database URLs)"""
+    identity = "|".join([SQLALCHEMY_DATABASE_URL, *sorted(sharding.SHARD_URLS.split(","))])
+    digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16]
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"restaurant-api-cache-{digest}.db")
+
+
+def snapshot_time(sources):
+    """
+    When the snapshot a route is served from was taken
+
+    Args:
+        sources: "read_model" and/or "analytics", in the order the endpoint prefers them
+
+    Returns:
+        float: time.time() at which the first loaded source started its last refresh,
+               or None when the endpoint reads the database directly
+    """
+    if not sources:
+        return None
+    from app import analytics, read_model
+
+    for source in sources:
+        snapshot = read_model.get_read_model() if source == "read_model" else analytics.get_mirror()
+        if snapshot is not None:
+            return snapshot.snapshot_at
+    return None
+
+
+def cache_key(scope):
+    """Path plus query parameters in a canonical order"""
+    params = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+    return f"{scope['path']}?{urlencode(sorted(params))}"
+
+
+def cached_route(method, path):
+    """
+    Returns:
+        tuple: (CachedRoute, match) for a cached GET path, or (None, None)
+    """
+    if method == "GET":
+        for route in CACHED_ROUTES:
+            match = route.pattern.match(path)
+            if match:
+                return route, match
+    return None, None
+
+
+def _version_query(count):
+    """Sum of `count` generation counters and when the latest of them changed"""
+    return (
+        "SELECT COALESCE(SUM(generation), 0), COALESCE(MAX(changed_at), 0) "
+        f"FROM cache_generations WHERE token IN ({','.join('?' * count)})"
+    )
+
+
+class ResponseCache:
+    """
+    Shared store of serialised responses, safe to use from many threads and processes.
+
+    Each thread has its own SQLite connection; the file is in WAL mode, so
+    readers never wait for a writer.
+    """
+
+    def __init__(self, path=None, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 max_entry_bytes=RESPONSE_CACHE_MAX_ENTRY_BYTES, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.path = path or default_path()
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # This worker's counters
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.errors = 0
+        self.last_error = None
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")  # tmpfs - nothing to make durable
+            connection.execute(f"PRAGMA mmap_size={self.max_bytes * 2}")
+            if connection.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _failed(self, error):
+        with self._lock:
+            self.errors += 1
+            self.last_error = str(error)
+
+    def lookup(self, key, tokens):
+        """
+        Find a fresh entry and read the version of its dependencies in one query
+
+        Args:
+            key: cache_key() of the request, or None to read only the version
+            tokens: Generation counters the response depends on (CachedRoute.dependencies())
+
+        Returns:
+            tuple: ((status, headers, body) or None, version, changed_at) - version is the
+                   sum of the dependencies' generations (None when the store cannot be read),
+                   changed_at when the most recent of them was bumped
+        """
+        now = time.time()
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                f"WITH current (version, changed_at) AS ({_version_query(len(tokens))}) "
+                "SELECT c.version, c.changed_at, e.status, e.headers, e.body, e.last_used FROM current c "
+                "LEFT JOIN cache_entries e ON e.key = ? AND e.version = c.version AND e.expires_at > ?",
+                (*tokens, key, now)
+            ).fetchone()
+            version, changed_at, response_status, headers, body, last_used = row
+            if key is None:
+                return None, version, changed_at
+            if body is None:
+                self._count("misses")
+                return None, version, changed_at
+            if last_used < now - _TOUCH_INTERVAL:
+                connection.execute("UPDATE cache_entries SET last_used = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            self._failed(e)
+            return None, None, None
+        self._count("hits")
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(headers)]
+        return (response_status, headers, body), version, changed_at
+
+    def store(self, key, response_status, headers, body, tokens, version, snapshot=None):
+        """
+        Store a response computed while its dependencies were at `version`
+
+        Args:
+            key: cache_key() of the request
+            response_status: HTTP status code
+            headers: Response headers as (bytes, bytes) pairs
+            body: Response body
+            tokens: Generation counters the response depends on
+            version: Version returned by lookup() before the response was computed
+            snapshot: snapshot_time() of the route's source before the response was
+                      computed, or None when it read the database
+
+        Returns:
+            bool: True if stored; False if too large, a dependency changed since the
+                  response was computed, or the snapshot it was read from predates the change
+        """
+        encoded_headers = json.dumps([
+            (name.decode("latin-1"), value.decode("latin-1"))
+            for name, value in headers if name.lower() not in _UNCACHED_HEADERS
+        ])
+        size = len(key) + len(encoded_headers) + len(body)
+        if size > self.max_entry_bytes:
+            self._count("skipped")
+            return False
+
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                current, changed_at = connection.execute(_version_query(len(tokens)), tokens).fetchone()
+                if current != version or (snapshot is not None and snapshot < changed_at):
+                    connection.execute("ROLLBACK")
+                    self._count("skipped")
+                    return False
+
+                total_bytes = connection.execute("SELECT total_bytes FROM cache_meta WHERE id = 1").fetchone()[0]
+                replaced = connection.execute("SELECT size FROM cache_entries WHERE key = ?", (key,)).fetchone()
+                if replaced is not None:
+                    connection.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                    total_bytes -= replaced[0]
+                connection.execute(
+                    "INSERT INTO cache_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, version, response_status, encoded_headers, body, size, now + self.ttl, now)
+                )
+                total_bytes += size
+
+                # Evict least recently used entries until the store fits its byte budget
+                evicted = 0
+                while total_bytes > self.max_bytes:
+                    victims = connection.execute(
+                        "SELECT key, size FROM cache_entries WHERE key != ? ORDER BY last_used LIMIT 64", (key,)
+                    ).fetchall()
+                    if not victims:
+                        break
+                    for victim, victim_size in victims:
+                        connection.execute("DELETE FROM cache_entries WHERE key = ?", (victim,))
+                        total_bytes -= victim_size
+                        evicted += 1
+                        if total_bytes <= self.max_bytes:
+                            break
+
+                connection.execute("UPDATE cache_meta SET total_bytes = ? WHERE id = 1", (total_bytes,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._failed(e)
+            return False
+        self._count("stores")
+        if evicted:
+            self._count("evictions", evicted)
+        return True
+
+    def invalidate(self, tokens):
+        """
+        Bump generation counters for all workers; entries that depend on them stop matching
+
+        Args:
+            tokens: Table names, order_token()s and ALL_ORDERS
+        """
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT INTO cache_generations VALUES (?, 1, ?) ON CONFLICT (token) "
+                    "DO UPDATE SET generation = generation + 1, changed_at = excluded.changed_at",
+                    [(token, now) for token in sorted(tokens)]
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._failed(e)
+            return
+        self._count("invalidations")
+
+    def status(self):
+        """
+        Store size and this worker's counters
+
+        Returns:
+            dict: Shared entries, bytes and generation counters; per-worker hits, misses and hit rate
+        """
+        shared = None
+        try:
+            connection = self._connection()
+            total_bytes = connection.execute("SELECT total_bytes FROM cache_meta WHERE id = 1").fetchone()[0]
+            entries = connection.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+            generations, changed_at = connection.execute(
+                "SELECT COUNT(*), MAX(changed_at) FROM cache_generations"
+            ).fetchone()
+            shared = {
+                "entries": entries,
+                "bytes": total_bytes,
+                "generation_counters": generations,
+                "seconds_since_invalidation": round(time.time() - changed_at, 3) if changed_at else None,
+            }
+        except sqlite3.Error as e:
+            self._failed(e)
+
+        with self._lock:
+            looked_up = self.hits + self.misses
+            worker = {
+                "pid": os.getpid(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / looked_up, 4) if looked_up else None,
+                "stores": self.stores,
+                "skipped": self.skipped,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
+        return {
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "max_entry_bytes": self.max_entry_bytes,
+            "ttl_seconds": self.ttl,
+            "shared": shared,
+            "worker": worker,
+        }
+
+
+# ================================================================
+# INVALIDATION ON WRITE
+# ================================================================
+
+# INSERT/UPDATE/DELETE/DROP target table, with optional schema and [quoting]
+_WRITE_STATEMENT = re.compile(
+    r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+(?:FROM\s+)?|TRUNCATE\s+TABLE"
+    r"|DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?)\s*(?:[\[\"`]?\w+[\]\"`]?\.)?[\[\"`]?(\w+)",
+    re.IGNORECASE
+)
+
+_WRITTEN = "response_cache_written"
+_COMMITTED = "response_cache_committed"
+
+
+def _where_order_ids(tables, whereclause, rows):
+    """Order ids a WHERE clause restricts a statement to (`order_id = ?` or `order_id IN (...)`), or None"""
+    if whereclause is None:
+        return None
+    if isinstance(whereclause, BooleanClauseList) and whereclause.operator is operators.and_:
+        conditions = whereclause.clauses
+    else:
+        conditions = [whereclause]
+    for condition in conditions:
+        if (not isinstance(condition, BinaryExpression) or not isinstance(condition.right, BindParameter)
+                or getattr(condition.left, "name", None) != "order_id"
+                or not any(getattr(condition.left, "table", None) is table for table in tables)):
+            continue
+        bound = condition.right
+        if condition.operator is operators.eq:
+            values = [bound.value] if bound.value is not None else [row.get(bound.key) for row in rows]
+        elif condition.operator is operators.in_op and bound.value is not None:
+            values = list(bound.value)
+        else:
+            continue
+        if None not in values:
+            return set(values)
+    return None
+
+
+def _written_tokens(conn, statement, rows):
+    """
+    Generation counters a Core INSERT/UPDATE/DELETE bumps once committed
+
+    Writes to order, line, payment and archive rows are scoped to their order
+    ids: from the inserted rows, the WHERE clause, or - for an update or delete
+    by another key, such as a payment update - the rows it is about to change.
+    """
+    table = statement.table
+    if table.name not in TRACKED_TABLES:
+        return set()
+    tokens = {table.name}
+    if table.name not in ORDER_SCOPED_TABLES:
+        return tokens
+
+    if isinstance(statement, Insert):
+        if statement.select is not None:
+            source = statement.select  # INSERT ... SELECT (archiving): the ids the SELECT is limited to
+            order_ids = _where_order_ids(source.get_final_froms(), getattr(source, "whereclause", None), rows)
+        else:
+            order_ids = {row.get("order_id") for row in rows}
+    else:
+        order_ids = _where_order_ids([table], statement.whereclause, rows)
+        # An update that sets order_id moves rows between orders - not scoped
+        moves_rows = isinstance(statement, Update) and (any("order_id" in row for row in rows) or "order_id" in {
+            getattr(column, "key", column) for column in getattr(statement, "_values", None) or ()
+        })
+        if moves_rows:
+            order_ids = None
+        elif order_ids is None and statement.whereclause is not None and len(rows) == 1:
+            order_ids = set(conn.execute(
+                select(table.c.order_id).where(statement.whereclause).limit(MAX_SCOPED_ORDERS + 1), rows[0]
+            ).scalars())
+
+    if order_ids is None or None in order_ids or len(order_ids) > MAX_SCOPED_ORDERS:
+        tokens.add(ALL_ORDERS)
+    else:
+        tokens.update(order_token(order_id) for order_id in order_ids)
+    return tokens
+
+
+def _note_statement(conn, clauseelement, multiparams, params, execution_options):
+    if isinstance(clauseelement, (Insert, Update, Delete)):
+        tokens = _written_tokens(conn, clauseelement, list(multiparams) or [params])
+        if tokens:
+            conn.info.setdefault(_WRITTEN, set()).update(tokens)
+
+
+def _note_sql(conn, cursor, statement, parameters, context, executemany):
+    # Plain SQL (schema scripts, exec_driver_sql); Core statements were scoped before execution
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+        return
+    match = _WRITE_STATEMENT.match(statement)
+    if match and match.group(1).lower() in TRACKED_TABLES:
+        table = match.group(1).lower()
+        written = conn.info.setdefault(_WRITTEN, set())
+        written.add(table)
+        if table in ORDER_SCOPED_TABLES:
+            written.add(ALL_ORDERS)
+
+
+def _note_commit(conn):
+    written = conn.info.pop(_WRITTEN, None)
+    if written:
+        conn.info.setdefault(_COMMITTED, set()).update(written)
+
+
+def _note_rollback(conn):
+    conn.info.pop(_WRITTEN, None)
+
+
+def _invalidate_committed(info):
+    # The commit event fires before the database commits, so generations are
+    # bumped afterwards: when the connection starts its next transaction or goes
+    # back to the pool. A response read in between is never stored (its
+    # version is already out of date by the time it would be).
+    info.pop(_WRITTEN, None)
+    committed = info.pop(_COMMITTED, None)
+    if committed:
+        cache = get_response_cache()
+        if cache is not None:
+            cache.invalidate(committed)
+
+
+def _after_begin(conn):
+    _invalidate_committed(conn.info)
+
+
+def _after_checkin(dbapi_connection, connection_record):
+    if connection_record is not None:
+        _invalidate_committed(connection_record.info)
+
+
+_LISTENERS = [
+    (Engine, "before_execute", _note_statement),
+    (Engine, "after_cursor_execute", _note_sql),
+    (Engine, "commit", _note_commit),
+    (Engine, "rollback", _note_rollback),
+    (Engine, "begin", _after_begin),
+    (Pool, "checkin", _after_checkin),
+]
+_listening = False
+_listening_lock = threading.Lock()
+
+
+def register_listeners():
+    """
+    Invalidate cached responses on writes committed by every engine in this process
+
+    Called by create_app() and by the CLIs that write order data (bulk loader,
+    archiver); does nothing when the cache is disabled or already registered.
+
+    Returns:
+        bool: True if the listeners were registered by this call
+    """
+    global _listening
+    if not RESPONSE_CACHE_ENABLED:
+        return False
+    with _listening_lock:
+        if _listening:
+            return False
+        for target, name, listener in _LISTENERS:
+            event.listen(target, name, listener)
+        _listening = True
+    return True
+
+
+def remove_listeners():
+    """Stop invalidating on writes (undoes register_listeners())"""
+    global _listening
+    with _listening_lock:
+        if not _listening:
+            return
+        for target, name, listener in _LISTENERS:
+            event.remove(target, name, listener)
+        _listening = False
+
+
+# ================================================================
+# MIDDLEWARE
+# ================================================================
+
+class ResponseCacheMiddleware:
+    """
+    ASGI middleware serving cached GET responses and storing new ones.
+
+    A request with ``Cache-Control: no-cache`` skips the lookup (and refreshes
+    the entry). Profiled requests are never cached. Responses carry
+    ``X-Response-Cache: hit`` or ``miss``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        cache = get_response_cache()
+        route, match = cached_route(scope.get("method"), scope.get("path", "")) if cache is not None else (None, None)
+        if (route is None or scope["type"] != "http"
+                or (profiling.profiling_configured() and profiling.ProfilingMiddleware._requested(scope))):
+            await self.app(scope, receive, send)
+            return
+
+        key = cache_key(scope)
+        tokens = route.dependencies(match)
+        refresh = any(
+            name == b"cache-control" and b"no-cache" in value.lower() for name, value in scope["headers"]
+        )
+        snapshot = snapshot_time(route.sources)
+        entry, version, changed_at = await run_in_threadpool(cache.lookup, None if refresh else key, tokens)
+        if entry is not None:
+            response_status, headers, body = entry
+            await send({
+                "type": "http.response.start",
+                "status": response_status,
+                "headers": headers + [(b"x-response-cache", b"hit")],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # Not stored when the snapshot the endpoint reads predates the last change it depends on
+        storable = version is not None and (snapshot is None or snapshot >= changed_at)
+        response = {"storable": storable, "size": 0, "chunks": []}
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = list(message.get("headers", []))
+                if message["status"] != 200 or any(name.lower() == b"set-cookie" for name, _ in response["headers"]):
+                    response["storable"] = False
+                message = dict(message)
+                message["headers"] = response["headers"] + [(b"x-response-cache", b"miss")]
+                await send(message)
+                return
+
+            if message["type"] == "http.response.body" and response["storable"]:
+                body = message.get("body", b"")
+                response["size"] += len(body)
+                if response["size"] > cache.max_entry_bytes:
+                    response["storable"] = False
+                    response["chunks"] = []
+                else:
+                    response["chunks"].append(body)
+            await send(message)
+
+            if (message["type"] == "http.response.body" and not message.get("more_body", False)
+                    and response["storable"]):
+                response["storable"] = False
+                await run_in_threadpool(
+                    cache.store, key, response["status"], response["headers"],
+                    b"".join(response["chunks"]), tokens, version, snapshot
+                )
+
+        await self.app(scope, receive, send_and_capture)
+
+
+# Global response cache instance (created on first use when enabled)
+response_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Get the shared response cache, opening it on first use
+
+    Returns:
+        ResponseCache: The cache, or None if disabled
+    """
+    global response_cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if response_cache is None:
+        with _cache_lock:
+            if response_cache is None:
+                response_cache = ResponseCache(path=RESPONSE_CACHE_PATH or None)
+    return response_cache
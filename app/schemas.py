@@ -3,7 +3,7 @@ Pydantic Schemas
 Defines request and response models for API validation and documentation
 """
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 from typing import Optional, List
 from datetime import date, datetime
 from decimal import Decimal
@@ -109,6 +109,7 @@ class OrderSummary(BaseModel):
     order_id: int
     order_date: date
     order_status: str
+    location: Optional[str] = Field(None, description="Restaurant location")
     total_items: int = Field(..., description="Number of line items")
     order_total: Decimal = Field(..., description="Sum of all order items")
     total_payments: Decimal = Field(..., description="Sum of all payments")
@@ -122,6 +123,7 @@ class OrderDetailResponse(BaseModel):
     order_id: int
     order_date: date
     order_status: str
+    location: Optional[str] = Field(None, description="Restaurant location")
     created_at: Optional[datetime] = None
     
     # Order items
@@ -139,6 +141,73 @@ class OrderDetailResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# ================================================================
+# WRITE SCHEMAS (POS order and payment writes)
+# ================================================================
+
+class OrderCreate(BaseModel):
+    """New order header"""
+    order_id: int = Field(..., gt=0)
+    order_date: date
+    order_status: str = Field("Pending", max_length=50)
+
+
+class OrderUpdate(BaseModel):
+    """Order header changes (only the fields sent are updated)"""
+    order_date: Optional[date] = None
+    order_status: Optional[str] = Field(None, max_length=50)
+
+
+class OrderItemCreate(BaseModel):
+    """New order line"""
+    item_id: int = Field(..., gt=0)
+    size: Optional[str] = Field(None, max_length=20)
+    price: Decimal = Field(..., ge=0, max_digits=10, decimal_places=2, description="Price at time of order")
+    quantity: int = Field(1, gt=0)
+    total: Optional[Decimal] = Field(None, description="Defaults to price × quantity")
+    
+    @model_validator(mode="after")
+    def default_total(self):
+        if self.total is None:
+            self.total = self.price * self.quantity
+        return self
+
+
+class PaymentCreate(BaseModel):
+    """New payment record"""
+    payment_id: int = Field(..., gt=0)
+    order_id: int = Field(..., gt=0)
+    payment_date: date
+    amount_due: Decimal = Field(..., max_digits=10, decimal_places=2)
+    tips: Decimal = Field(Decimal("0"), max_digits=10, decimal_places=2)
+    discount: Decimal = Field(Decimal("0"), max_digits=10, decimal_places=2)
+    total_paid: Decimal = Field(..., max_digits=10, decimal_places=2)
+    payment_type: str = Field(..., max_length=50, description="Cash or Card")
+    payment_status: str = Field("Pending", max_length=50)
+
+
+class PaymentUpdate(BaseModel):
+    """Payment changes (only the fields sent are updated)"""
+    payment_date: Optional[date] = None
+    amount_due: Optional[Decimal] = None
+    tips: Optional[Decimal] = None
+    discount: Optional[Decimal] = None
+    total_paid: Optional[Decimal] = None
+    payment_type: Optional[str] = Field(None, max_length=50)
+    payment_status: Optional[str] = Field(None, max_length=50)
+
+
+# ================================================================
+# JOB SCHEMAS
+# ================================================================
+
+class JobRequest(BaseModel):
+    """Report job submission"""
+    report: str = Field(..., description="orders_complete, statistics, revenue or reconciliation")
+    params: dict = Field(default_factory=dict, description="Report parameters, e.g. {\"group_by\": \"item\"}")
+    refresh: bool = Field(False, description="Run again even if a cached result exists")
+
+
 # ================================================================
 # API RESPONSE WRAPPERS
 # ================================================================
@@ -0,0 +1,572 @@
+"""
+Search Index Module
+In-memory prefix/fuzzy index over menu items and an inverted index from items to orders
+
+Item, category and menu names are split into lowercase tokens. A query term
+matches a token exactly or as a prefix (bisect over the sorted token list); a
+term of three or more characters that matches nothing that way matches
+fuzzily (shared trigrams, then a small edit distance). Every (item, size) pair
+keeps the orders that contain it sorted by order date, so "orders containing
+Item6 Large between two dates" is two bisects per posting list instead of a
+scan of order_items.
+
+The index covers hot and archived orders. It is loaded in the background at
+startup, then kept current from the database by key and ``updated_at``
+watermarks, like the read model; order lines are read again over the trailing
+LATE_COMMIT_WINDOW of ids, so lines committed late under a lower id are not
+missed. There is one index per location.
+"""
+
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+from sqlalchemy import select, or_
+
+from app import sharding
+from app.database import DEFAULT_LOCATION, RecentKeys
+from app.models import (
+    Order, OrderItem, Item, Category, Menu, ArchivedOrder, ArchivedOrderItem
+)
+
+
+# Search index configuration from environment
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "True").lower() == "true"
+SEARCH_REFRESH_SECONDS = float(os.getenv("SEARCH_REFRESH_SECONDS", "5"))
+SEARCH_BATCH_SIZE = int(os.getenv("SEARCH_BATCH_SIZE", "10000"))
+
+# Relevance of a match by field and by kind of match
+FIELD_WEIGHTS = {"item": 3.0, "category": 2.0, "menu": 1.0}
+MATCH_WEIGHTS = {"exact": 1.0, "prefix": 0.7, "fuzzy": 0.4}
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a name or query"""
+    return _TOKEN.findall((text or "").lower())
+
+
+def _trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _max_distance(term):
+    return 1 if len(term) <= 5 else 2
+
+
+def _within_distance(a, b, limit):
+    """True if a and b are at most limit edits apart (insert, delete, substitute, swap adjacent)"""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+class _Postings:
+    """Order IDs containing one (item, size), sorted by order date"""
+
+    __slots__ = ("dates", "orders")
+
+    def __init__(self):
+        self.dates = array("l")  # date ordinals, ascending
+        self.orders = array("q")
+
+    def add(self, day, order_id):
+        if not self.dates or day >= self.dates[-1]:
+            self.dates.append(day)
+            self.orders.append(order_id)
+            return
+        position = bisect_right(self.dates, day)
+        self.dates.insert(position, day)
+        self.orders.insert(position, order_id)
+
+    def remove(self, day, order_id):
+        position = bisect_left(self.dates, day)
+        while position < len(self.dates) and self.dates[position] == day:
+            if self.orders[position] == order_id:
+                del self.dates[position]
+                del self.orders[position]
+                return
+            position += 1
+
+    def between(self, first=None, last=None):
+        """(date ordinal, order_id) pairs with first <= date <= last"""
+        low = bisect_left(self.dates, first) if first is not None else 0
+        high = bisect_right(self.dates, last) if last is not None else len(self.dates)
+        return zip(self.dates[low:high], self.orders[low:high])
+
+
+class CatalogIndex:
+    """Token index over item, category and menu names"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog  # item_id -> (item name, category name, menu name)
+        self.postings = {}  # token -> {item_id: field weight}
+        for item_id, names in catalog.items():
+            for field, name in zip(("item", "category", "menu"), names):
+                for token in tokenize(name):
+                    items = self.postings.setdefault(token, {})
+                    items[item_id] = max(items.get(item_id, 0), FIELD_WEIGHTS[field])
+        self.tokens = sorted(self.postings)
+        self.trigrams = {}
+        for token in self.tokens:
+            for trigram in _trigrams(token):
+                self.trigrams.setdefault(trigram, []).append(token)
+
+    def match_term(self, term):
+        """
+        Tokens matching one query term
+
+        Returns:
+            dict: token -> match kind (exact, prefix or fuzzy)
+        """
+        matches = {}
+        position = bisect_left(self.tokens, term)
+        while position < len(self.tokens) and self.tokens[position].startswith(term):
+            token = self.tokens[position]
+            matches[token] = "exact" if token == term else "prefix"
+            position += 1
+        # Approximate matches only when the term matches nothing as typed
+        if not matches and len(term) >= 3:
+            grams = _trigrams(term)
+            shared = {}
+            for trigram in grams:
+                for token in self.trigrams.get(trigram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            limit = _max_distance(term)
+            for token, count in shared.items():
+                # Each edit destroys at most three trigrams (four for a swap)
+                if count >= len(grams) - 4 * limit and _within_distance(term, token, limit):
+                    matches[token] = "fuzzy"
+        return matches
+
+    def search(self, terms):
+        """
+        Items matching every term, best first
+
+        Returns:
+            list: (item_id, score, matched tokens) tuples
+        """
+        scores = None
+        matched = {}
+        for term in terms:
+            term_scores = {}
+            for token, kind in self.match_term(term).items():
+                for item_id, weight in self.postings[token].items():
+                    score = weight * MATCH_WEIGHTS[kind]
+                    if score > term_scores.get(item_id, 0):
+                        term_scores[item_id] = score
+                    matched.setdefault(item_id, set()).add(token)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {item_id: scores[item_id] + score
+                          for item_id, score in term_scores.items() if item_id in scores}
+            if not scores:
+                return []
+        return sorted(
+            ((item_id, round(score, 3), sorted(matched[item_id])) for item_id, score in (scores or {}).items()),
+            key=lambda entry: (-entry[1], self.catalog[entry[0]][0], entry[0])
+        )
+
+
+class SearchIndex:
+    """
+    Search index for one location's database.
+
+    Postings are keyed by (item_id, size code); each order keeps its posting
+    keys so a changed order date can be moved in every list it appears in.
+    """
+
+    def __init__(self, location=DEFAULT_LOCATION, session_factory=None):
+        self.location = location
+        self.session_factory = session_factory or sharding.router.session_factory(location)
+        self._lock = threading.RLock()
+        self.catalog = CatalogIndex({})
+        self.sizes = [None]  # size code -> size
+        self._size_codes = {None: 0}
+        self.postings = {}  # (item_id, size code) -> _Postings
+        self.item_sizes = {}  # item_id -> set of size codes
+        self.order_dates = {}  # order_id -> date ordinal
+        self.order_status = {}  # order_id -> status
+        self.order_keys = {}  # order_id -> posting keys
+        self.archived = set()
+        self._pending_lines = {}  # order_id -> posting keys seen before the order header
+        self._watermarks = {"orders": (0, None)}
+        self._lines = RecentKeys()
+        self._archive_loaded = False
+        self._archived_since = None
+        self.last_refreshed_at = None
+
+    # ------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------
+
+    def _size_code(self, size):
+        code = self._size_codes.get(size)
+        if code is None:
+            code = len(self.sizes)
+            self.sizes.append(size)
+            self._size_codes[size] = code
+        return code
+
+    def upsert_order(self, order_id, order_date, status):
+        day = order_date.toordinal()
+        previous = self.order_dates.get(order_id)
+        self.order_dates[order_id] = day
+        self.order_status[order_id] = status
+        if previous is None:
+            keys = self._pending_lines.pop(order_id, [])
+            self.order_keys[order_id] = keys
+            for key in keys:
+                self._posting(key).add(day, order_id)
+        elif previous != day:
+            for key in self.order_keys[order_id]:
+                self.postings[key].remove(previous, order_id)
+                self.postings[key].add(day, order_id)
+
+    def add_line(self, order_id, item_id, size):
+        key = (item_id, self._size_code(size))
+        keys = self.order_keys.get(order_id)
+        if keys is None:
+            pending = self._pending_lines.setdefault(order_id, [])
+            if key not in pending:
+                pending.append(key)
+            return
+        if key in keys:
+            return  # Same item and size twice in one order
+        keys.append(key)
+        self._posting(key).add(self.order_dates[order_id], order_id)
+
+    def _posting(self, key):
+        postings = self.postings.get(key)
+        if postings is None:
+            postings = self.postings[key] = _Postings()
+            self.item_sizes.setdefault(key[0], set()).add(key[1])
+        return postings
+
+    def refresh(self):
+        """
+        Apply new and changed rows from the database
+
+        Returns:
+            dict: Number of rows applied per table
+        """
+        applied = {}
+        db = self.session_factory()
+        try:
+            with self._lock:
+                self._load_catalog(db)
+                applied["orders"] = self._apply_orders(db)
+                applied["order_items"] = self._apply_lines(db)
+                # Archive after the hot tables, so an order archived meanwhile is not missed
+                if self._archive_loaded:
+                    applied["archived"] = self._mark_archived(db)
+                else:
+                    applied["archive"] = self._load_archive(db)
+                self.last_refreshed_at = datetime.now()
+        finally:
+            db.close()
+        return applied
+
+    def _load_catalog(self, db):
+        rows = db.execute(
+            select(Item.item_id, Item.item_name, Category.category_name, Menu.menu_name)
+            .join(Category, Category.cat_id == Item.cat_id)
+            .join(Menu, Menu.menu_id == Item.menu_id)
+        ).all()
+        catalog = {item_id: (name, category, menu) for item_id, name, category, menu in rows}
+        if catalog != self.catalog.catalog:
+            self.catalog = CatalogIndex(catalog)  # Small - rebuilt whenever it changes
+
+    def _load_archive(self, db):
+        """Archived orders never change, so they are read once"""
+        loaded = 0
+        for order_id, order_date, status, archived_at in db.execute(
+            select(ArchivedOrder.order_id, ArchivedOrder.order_date, ArchivedOrder.order_status,
+                   ArchivedOrder.archived_at)
+        ).yield_per(SEARCH_BATCH_SIZE):
+            self.upsert_order(order_id, order_date, status)
+            self.archived.add(order_id)
+            if self._archived_since is None or archived_at > self._archived_since:
+                self._archived_since = archived_at
+            loaded += 1
+        for order_id, item_id, size in db.execute(
+            select(ArchivedOrderItem.order_id, ArchivedOrderItem.item_id, ArchivedOrderItem.size)
+        ).yield_per(SEARCH_BATCH_SIZE):
+            self.add_line(order_id, item_id, size)
+            loaded += 1
+        self._archive_loaded = True
+        return loaded
+
+    def _apply_orders(self, db):
+        last_id, last_updated = self._watermarks["orders"]
+        condition = Order.order_id > last_id
+        if last_updated is not None:
+            condition = or_(condition, Order.updated_at >= last_updated)
+        applied = 0
+        for order_id, order_date, status, updated_at in db.execute(
+            select(Order.order_id, Order.order_date, Order.order_status, Order.updated_at)
+            .where(condition).order_by(Order.order_id)
+        ).yield_per(SEARCH_BATCH_SIZE):
+            self.upsert_order(order_id, order_date, status)
+            last_id = max(last_id, order_id)
+            if updated_at is not None and (last_updated is None or updated_at > last_updated):
+                last_updated = updated_at
+            applied += 1
+        self._watermarks["orders"] = (last_id, last_updated)
+        return applied
+
+    def _apply_lines(self, db):
+        # Order lines are append-only, but ids are assigned before commit: re-read the late-commit window
+        applied = 0
+        for line_id, order_id, item_id, size in db.execute(
+            select(OrderItem.id, OrderItem.order_id, OrderItem.item_id, OrderItem.size)
+            .where(OrderItem.id > self._lines.floor).order_by(OrderItem.id)
+        ).yield_per(SEARCH_BATCH_SIZE):
+            if self._lines.add(line_id):
+                self.add_line(order_id, item_id, size)
+                applied += 1
+        return applied
+
+    def _mark_archived(self, db):
+        """Flag orders moved to the archive since the last refresh (they stay searchable)"""
+        query = select(ArchivedOrder.order_id, ArchivedOrder.archived_at)
+        if self._archived_since is not None:
+            query = query.where(ArchivedOrder.archived_at >= self._archived_since)
+        marked = 0
+        for order_id, archived_at in db.execute(query).yield_per(SEARCH_BATCH_SIZE):
+            if order_id not in self.archived:
+                self.archived.add(order_id)
+                marked += 1
+            if self._archived_since is None or archived_at > self._archived_since:
+                self._archived_since = archived_at
+        return marked
+
+    # ------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------
+
+    def parse(self, query, size=None):
+        """
+        Split a query into name terms and size filters
+
+        A term equal to a known size (e.g. "large") filters by size unless it is
+        also an exact catalog token.
+
+        Returns:
+            tuple: (name terms, sizes or None)
+        """
+        sizes_by_name = {value.lower(): value for value in self.sizes[1:] if value}
+        terms, sizes = [], []
+        for term in tokenize(query):
+            if term in sizes_by_name and term not in self.catalog.postings:
+                sizes.append(sizes_by_name[term])
+            else:
+                terms.append(term)
+        if size:
+            sizes.append(sizes_by_name.get(size.lower(), size))
+        return terms, sizes or None
+
+    def search_items(self, query, limit=20):
+        """
+        Menu items matching a name, category or menu query
+
+        Returns:
+            list: Item dicts with score and matched tokens, best first
+        """
+        terms, _ = self.parse(query)
+        with self._lock:
+            matches = self.catalog.search(terms) if terms else []
+            return [self._item(item_id, score, tokens) for item_id, score, tokens in matches[:limit]]
+
+    def _item(self, item_id, score=None, tokens=None):
+        name, category, menu = self.catalog.catalog.get(item_id, (None, None, None))
+        item = {"item_id": item_id, "item_name": name, "category_name": category, "menu_name": menu}
+        if score is not None:
+            item["score"] = score
+            item["matched"] = tokens
+        return item
+
+    def search_orders(self, query, size=None, start=None, end=None, status=None, limit=100, offset=0):
+        """
+        Orders containing items that match the query
+
+        Args:
+            query: Item/category/menu terms, optionally with a size ("Item6 Large")
+            size: Size filter in addition to sizes named in the query
+            start, end: Inclusive order date range
+            status: Order status to match
+            limit, offset: Page of orders (newest first)
+
+        Returns:
+            dict: Matched items and sizes, total order count and the page of orders
+        """
+        terms, sizes = self.parse(query, size)
+        with self._lock:
+            items = self.catalog.search(terms) if terms else []
+            item_ids = [item_id for item_id, _, _ in items]
+            size_codes = None
+            if sizes is not None:
+                size_codes = {self._size_codes[value] for value in sizes if value in self._size_codes}
+
+            keys = []
+            for item_id in item_ids:
+                for code in self.item_sizes.get(item_id, ()):
+                    if size_codes is None or code in size_codes:
+                        keys.append((item_id, code))
+
+            first = start.toordinal() if start is not None else None
+            last = end.toordinal() if end is not None else None
+            found = {}
+            for key in keys:
+                for day, order_id in self.postings[key].between(first, last):
+                    found[order_id] = day
+            if status is not None:
+                found = {order_id: day for order_id, day in found.items() if self.order_status[order_id] == status}
+
+            ordered = sorted(found.items(), key=lambda entry: (entry[1], entry[0]), reverse=True)
+            wanted = set(keys)
+            orders = [
+                {
+                    "order_id": order_id,
+                    "order_date": date.fromordinal(day),
+                    "order_status": self.order_status[order_id],
+                    "archived": order_id in self.archived,
+                    "location": self.location,
+                    "matched_lines": [
+                        {"item_id": item_id, "item_name": self.catalog.catalog.get(item_id, (None,))[0],
+                         "size": self.sizes[code]}
+                        for item_id, code in self.order_keys[order_id] if (item_id, code) in wanted
+                    ],
+                }
+                for order_id, day in ordered[offset:offset + limit]
+            ]
+            return {
+                "items": [self._item(item_id, score, tokens) for item_id, score, tokens in items],
+                "sizes": sizes,
+                "total_orders": len(found),
+                "orders": orders,
+            }
+
+    def status(self):
+        """
+        Index size and freshness
+
+        Returns:
+            dict: Counts and last refresh time for /api/search/status
+        """
+        with self._lock:
+            return {
+                "location": self.location,
+                "ready": self.last_refreshed_at is not None,
+                "last_refreshed_at": self.last_refreshed_at,
+                "items": len(self.catalog.catalog),
+                "tokens": len(self.catalog.tokens),
+                "orders": len(self.order_dates),
+                "archived_orders": len(self.archived),
+                "postings": len(self.postings),
+                "posting_entries": sum(len(postings.orders) for postings in self.postings.values()),
+            }
+
+
+class SearchIndexes:
+    """One SearchIndex per location, loaded and refreshed by one background thread"""
+
+    def __init__(self, locations=None):
+        self.indexes = {location: SearchIndex(location) for location in (locations or sharding.router.locations)}
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    def start(self, interval=SEARCH_REFRESH_SECONDS):
+        """Load every index, then refresh them periodically, in a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="search-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def refresh(self):
+        for index in self.indexes.values():
+            index.refresh()
+
+    def _run(self, interval):
+        while True:
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"✗ Search index refresh failed: {str(e)}")
+            if self._stop.wait(interval):
+                return
+
+    def get(self, location=None):
+        """
+        Loaded index for a location
+
+        Returns:
+            SearchIndex: The index, or None while it is still loading
+
+        Raises:
+            UnknownLocation: Location is not configured
+        """
+        sharding.router.check(location)
+        index = self.indexes.get(location or DEFAULT_LOCATION)
+        if index is None or index.last_refreshed_at is None:
+            return None
+        return index
+
+
+# Process-wide search indexes (None when disabled)
+search_indexes = None
+
+
+def start_search_index():
+    """
+    Create the search indexes and start loading them in the background
+
+    Returns:
+        SearchIndexes: The indexes (queries return 503 until loaded), or None if disabled
+    """
+    global search_indexes
+    if not SEARCH_INDEX_ENABLED:
+        return None
+    indexes = SearchIndexes()
+    indexes.start()
+    search_indexes = indexes
+    return indexes
+
+
+def stop_search_index():
+    """Stop background refresh of the search indexes"""
+    if search_indexes is not None:
+        search_indexes.stop()
+
+
+def get_search_indexes():
+    """Return the search indexes, or None if disabled"""
+    return search_indexes
@@ -0,0 +1,270 @@
+"""
+Location Sharding Module
+Routes each restaurant location to its own database and fans group-wide reads out across them
+
+Usage:
+    python -m app.sharding --init       # create the schema on every shard
+    python -m app.sharding --migrate    # add the location column to existing databases
+
+DEFAULT_LOCATION lives in the main database (DATABASE_URL); SHARD_URLS adds one
+database per further location. A request picks its shard with the ``location``
+query parameter. Group-wide reads run the same per-shard function on every
+shard in a thread pool and merge the results, so their latency follows the
+slowest shard instead of the sum of all shards.
+"""
+
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from sqlalchemy import String, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, DEFAULT_LOCATION, create_db_engine, get_engine, get_session_factory
+from app import models  # noqa: F401 - registers the tables for --init
+
+
+# Comma-separated location=url pairs, e.g. "airport=sqlite:///airport.db,harbour=sqlite:///harbour.db"
+SHARD_URLS = os.getenv("SHARD_URLS", "")
+# Threads for cross-shard reads (0 = one per shard)
+SHARD_FANOUT_WORKERS = int(os.getenv("SHARD_FANOUT_WORKERS", "0"))
+
+# Tables that carry the location column
+# (not indexed - every row in a shard has the shard's location)
+LOCATION_TABLES = ("orders", "payments", "orders_archive", "payments_archive")
+
+
+class UnknownLocation(LookupError):
+    """Raised when a location has no configured shard"""
+
+
+def parse_shard_urls(value):
+    """
+    Parse SHARD_URLS
+
+    Returns:
+        dict: Location to database URL, in configuration order
+    """
+    shards = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        location, separator, url = entry.partition("=")
+        location, url = location.strip(), url.strip()
+        if not separator or not location or not url:
+            raise ValueError(f"Invalid SHARD_URLS entry '{entry}' (expected location=url)")
+        if location == DEFAULT_LOCATION or location in shards:
+            raise ValueError(f"Location '{location}' is configured twice")
+        shards[location] = url
+    return shards
+
+
+class ShardRouter:
+    """
+    Engines and session factories per location, plus parallel fan-out across them
+
+    Engines are created on first use; the default location uses the main
+    engine from app.database unless another one is passed in.
+    """
+
+    def __init__(self, shard_urls=None, default_engine=None, default_session_factory=None,
+                 fanout_workers=SHARD_FANOUT_WORKERS):
+        self.shard_urls = dict(shard_urls or {})
+        self._default_engine = default_engine
+        self._default_session_factory = default_session_factory
+        self._engines = None
+        self._session_factories = None
+        self.fanout_workers = fanout_workers or len(self.shard_urls) + 1
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def engines(self):
+        """Engine per location, in configuration order"""
+        if self._engines is None:
+            self._connect()
+        return self._engines
+
+    @property
+    def session_factories(self):
+        """Session factory per location"""
+        if self._session_factories is None:
+            self._connect()
+        return self._session_factories
+
+    def _connect(self):
+        with self._lock:
+            if self._engines is not None:
+                return
+            if self._default_engine is None:
+                default_engine, default_factory = get_engine(), get_session_factory()
+            else:
+                default_engine = self._default_engine
+                default_factory = self._default_session_factory or sessionmaker(
+                    autocommit=False, autoflush=False, bind=default_engine
+                )
+            engines = {DEFAULT_LOCATION: default_engine}
+            session_factories = {DEFAULT_LOCATION: default_factory}
+            for location, url in self.shard_urls.items():
+                shard_engine = create_db_engine(url)
+                engines[location] = shard_engine
+                session_factories[location] = sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+            self._session_factories = session_factories
+            self._engines = engines
+
+    @property
+    def locations(self):
+        return [DEFAULT_LOCATION, *self.shard_urls]
+
+    @property
+    def sharded(self):
+        """True when more than one location is configured"""
+        return bool(self.shard_urls)
+
+    def is_default(self, location):
+        return location is None or location == DEFAULT_LOCATION
+
+    def check(self, location=None):
+        """Raise UnknownLocation unless the location is configured (does not connect)"""
+        if location is not None and location != DEFAULT_LOCATION and location not in self.shard_urls:
+            raise UnknownLocation(f"Unknown location '{location}'")
+
+    def engine_for(self, location=None):
+        shard_engine = self.engines.get(location or DEFAULT_LOCATION)
+        if shard_engine is None:
+            raise UnknownLocation(f"Unknown location '{location}'")
+        return shard_engine
+
+    def session_factory(self, location=None):
+        factory = self.session_factories.get(location or DEFAULT_LOCATION)
+        if factory is None:
+            raise UnknownLocation(f"Unknown location '{location}'")
+        return factory
+
+    @contextmanager
+    def session_scope(self, location=None, deadline=None):
+        """
+        Session on a location's shard, optionally armed with a request's query deadline
+
+        Yields:
+            Session: SQLAlchemy database session
+        """
+        db = self.session_factory(location)()
+        if deadline is not None:
+            event.listen(db, "after_begin", lambda session, transaction, connection: deadline.arm(connection))
+        try:
+            yield db
+        finally:
+            if deadline is not None:
+                deadline.disarm()
+            db.close()
+
+    def fan_out(self, function, deadline=None, locations=None):
+        """
+        Run ``function(db, location)`` on every shard in parallel
+
+        Args:
+            function: Per-shard read, called with a session and its location
+            deadline: Request QueryDeadline - each shard session gets a child of it
+            locations: Subset of locations (default: all)
+
+        Returns:
+            dict: Location to result, in configuration order
+        """
+        locations = list(locations or self.locations)
+
+        def run(location):
+            child = deadline.child() if deadline is not None else None
+            with self.session_scope(location, child) as db:
+                return function(db, location)
+
+        if len(locations) == 1:
+            return {locations[0]: run(locations[0])}
+        futures = [(location, self._get_executor().submit(run, location)) for location in locations]
+        return {location: future.result() for location, future in futures}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.fanout_workers, thread_name_prefix="shard")
+            return self._executor
+
+    def close(self):
+        """Stop the fan-out threads and dispose the shard engines (not the main engine)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        for location, shard_engine in (self._engines or {}).items():
+            if location != DEFAULT_LOCATION:
+                shard_engine.dispose()
+
+
+# Process-wide router built from SHARD_URLS
+router = ShardRouter(parse_shard_urls(SHARD_URLS))
+
+
+def init_shards(shard_router=router):
+    """Create any missing tables on every shard"""
+    for location, shard_engine in shard_router.engines.items():
+        Base.metadata.create_all(shard_engine)
+        print(f"✓ {location}: schema ready ({shard_engine.url.render_as_string(hide_password=True)})")
+
+
+def migrate_shards(shard_router=router):
+    """
+    Add the location column to databases created before it existed
+
+    Existing rows are stamped with the shard's own location.
+    """
+    for location, shard_engine in shard_router.engines.items():
+        with shard_engine.begin() as connection:
+            inspector = inspect(connection)
+            quote = connection.dialect.identifier_preparer.quote
+            column_type = String(50).compile(dialect=connection.dialect)
+            add = "ADD" if connection.dialect.name == "mssql" else "ADD COLUMN"
+            added = []
+            for table in LOCATION_TABLES:
+                if not inspector.has_table(table):
+                    continue
+                if "location" in {column["name"] for column in inspector.get_columns(table)}:
+                    continue
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {quote(table)} {add} location {column_type} NOT NULL "
+                    f"DEFAULT '{DEFAULT_LOCATION}'"
+                )
+                if location != DEFAULT_LOCATION:
+                    connection.execute(
+                        text(f"UPDATE {quote(table)} SET location = :location"), {"location": location}
+                    )
+                added.append(table)
+        if added:
+            print(f"✓ {location}: location column added to {', '.join(added)}")
+        else:
+            print(f"✓ {location}: already up to date")
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Manage location shard databases")
+    parser.add_argument("--init", action="store_true", help="Create missing tables on every shard")
+    parser.add_argument("--migrate", action="store_true", help="Add the location column to existing tables")
+    args = parser.parse_args(argv)
+    if not args.init and not args.migrate:
+        parser.error("give --init and/or --migrate")
+
+    print("=" * 60)
+    print(f"Location shards: {', '.join(router.locations)}")
+    print("=" * 60)
+    if args.migrate:
+        migrate_shards()
+    if args.init:
+        init_shards()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,823 @@
+"""
+Write-Behind Queue Module
+Durable append-only log for POS order and payment writes, flushed to the database in batches
+
+Each write is appended to a local log segment and acknowledged once the segment
+is fsynced (concurrent writers share one fsync). A flusher thread applies the
+queued writes in grouped transactions when WRITE_BATCH_SIZE writes are waiting
+or every WRITE_FLUSH_INTERVAL_MS. Every transaction also stores the writes'
+idempotency keys and the log position it reached, so after a crash only the
+missing writes are replayed and a retried request is never applied twice.
+
+Retries are answered from an in-memory cache of recent keys (preloaded from
+the database at start). A retry of a key that has left the cache, or that went
+to another worker process, is queued again and then resolved at flush time by
+the key's primary key, keeping the outcome of the first write.
+
+The queue is opt-in (WRITE_QUEUE_ENABLED=True). Otherwise the write endpoints
+apply each write in its own transaction with apply_write() and answer once it
+is committed, with the same idempotency keys.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+
+from sqlalchemy import insert, inspect, select, update
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app import sharding
+from app.database import DEFAULT_LOCATION
+from app.models import Order, OrderItem, Payment, LoadCheckpoint, WriteIdempotencyKey
+from app.schemas import OrderCreate, OrderUpdate, OrderItemCreate, PaymentCreate, PaymentUpdate
+
+try:
+    import fcntl
+except ImportError:  # Windows - a single writer per log directory is assumed
+    fcntl = None
+
+
+# Write queue configuration from environment
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "False").lower() == "true"
+WRITE_LOG_DIR = os.getenv("WRITE_LOG_DIR", "write_log")
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+WRITE_FLUSH_INTERVAL_MS = float(os.getenv("WRITE_FLUSH_INTERVAL_MS", "200"))
+WRITE_SEGMENT_BYTES = int(os.getenv("WRITE_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+WRITE_LOG_FSYNC = os.getenv("WRITE_LOG_FSYNC", "True").lower() == "true"
+WRITE_MAX_PENDING = int(os.getenv("WRITE_MAX_PENDING", "100000"))
+WRITE_KEY_CACHE_SIZE = int(os.getenv("WRITE_KEY_CACHE_SIZE", "100000"))
+
+# Pause after a failed flush before trying again (database unavailable)
+FLUSH_RETRY_SECONDS = 5.0
+
+
+class WriteQueueFull(Exception):
+    """Raised when WRITE_MAX_PENDING writes are waiting to be flushed"""
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different write"""
+
+
+class WriteFailed(Exception):
+    """Raised while applying a write that the database cannot accept"""
+
+
+class LogCorrupted(Exception):
+    """Raised when a log segment other than the newest has an unreadable record"""
+
+
+class SchemaMissing(Exception):
+    """Raised at start when the write queue's tables have not been created"""
+
+
+# Errors that mean the database will never accept a write (constraint, data or
+# validation errors); anything else - deadlocks, timeouts, lost connections - is retried
+PERMANENT_ERRORS = (IntegrityError, DataError, ValueError, WriteFailed)
+
+
+# ================================================================
+# OPERATIONS
+# ================================================================
+
+class Operation:
+    """One kind of write: how its payload is validated and applied"""
+
+    def __init__(self, schema, model, key_field=None, is_update=False):
+        self.schema = schema
+        self.model = model
+        self.key_field = key_field  # Path parameter carried in the payload
+        self.is_update = is_update
+
+    def row(self, payload, location):
+        """Validated column values for a logged payload"""
+        fields = {name: value for name, value in payload.items() if name != self.key_field}
+        row = self.schema.model_validate(fields).model_dump(exclude_unset=self.is_update)
+        if self.key_field:
+            row[self.key_field] = payload[self.key_field]
+        if not self.is_update and "location" in self.model.__table__.c:
+            row["location"] = location
+        return row
+
+    def apply(self, connection, rows):
+        if not self.is_update:
+            connection.execute(insert(self.model.__table__), rows)
+            return
+        key_column = self.model.__table__.c[self.key_field]
+        for row in rows:
+            changes = {name: value for name, value in row.items() if name != self.key_field}
+            result = connection.execute(
+                update(self.model.__table__).where(key_column == row[self.key_field]).values(**changes)
+            )
+            if result.rowcount == 0:
+                raise WriteFailed(f"{self.model.__tablename__} {row[self.key_field]} not found")
+
+
+OPERATIONS = {
+    "create_order": Operation(OrderCreate, Order),
+    "update_order": Operation(OrderUpdate, Order, key_field="order_id", is_update=True),
+    "add_order_item": Operation(OrderItemCreate, OrderItem, key_field="order_id"),
+    "create_payment": Operation(PaymentCreate, Payment),
+    "update_payment": Operation(PaymentUpdate, Payment, key_field="payment_id", is_update=True),
+}
+
+
+def fingerprint(operation, location, payload):
+    """SHA-1 of a write, used to detect an idempotency key reused for a different request"""
+    return hashlib.sha1(
+        json.dumps([operation, location, payload], sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def public_outcome(outcome):
+    """Outcome without the internal request fingerprint"""
+    return {name: value for name, value in outcome.items() if name != "fingerprint"}
+
+
+def _outcome(record, status, error=None):
+    return {
+        "idempotency_key": record["key"], "operation": record["op"], "location": record["location"],
+        "sequence": record["seq"], "fingerprint": record["fingerprint"], "status": status, "error": error,
+    }
+
+
+def _apply_records(connection, records):
+    # Keys go in first, so a key already applied (another worker, or a replay) fails the group
+    connection.execute(insert(WriteIdempotencyKey.__table__), [
+        {
+            "idempotency_key": record["key"], "operation": record["op"],
+            "fingerprint": record["fingerprint"], "sequence": record["seq"], "status": "applied",
+        }
+        for record in records
+    ])
+    for operation, run in itertools.groupby(records, key=lambda record: record["op"]):
+        handler = OPERATIONS[operation]
+        handler.apply(connection, [handler.row(record["payload"], record["location"]) for record in run])
+
+
+def stored_outcome(key, location=None):
+    """
+    Outcome of an applied or rejected write from the location's write_idempotency_keys
+
+    Returns:
+        dict: Outcome, or None if the key is not stored
+    """
+    location = location or DEFAULT_LOCATION
+    with sharding.router.engine_for(location).connect() as connection:
+        stored = connection.execute(
+            select(WriteIdempotencyKey).where(WriteIdempotencyKey.idempotency_key == key)
+        ).first()
+    if stored is None:
+        return None
+    return {
+        "idempotency_key": key, "operation": stored.operation, "location": location,
+        "sequence": stored.sequence, "fingerprint": stored.fingerprint,
+        "status": stored.status, "error": stored.error,
+    }
+
+
+def apply_write(operation, payload, key, location=None):
+    """
+    Apply one write in its own transaction - the write path when the queue is disabled
+
+    The idempotency key is stored in the same transaction, so a retry returns
+    the first outcome instead of applying the write again.
+
+    Returns:
+        dict: Outcome with status "applied" and "duplicate" when the key was seen before
+
+    Raises:
+        IdempotencyConflict: The key was used for a different write
+        WriteFailed: The database refused the write (duplicate id, unknown order, ...)
+    """
+    location = location or DEFAULT_LOCATION
+    bind = sharding.router.engine_for(location)
+    record = {
+        "seq": 0, "key": key, "op": operation, "location": location,
+        "fingerprint": fingerprint(operation, location, payload), "payload": payload,
+    }
+    try:
+        with bind.begin() as connection:
+            _apply_records(connection, [record])
+        return {**public_outcome(_outcome(record, "applied")), "duplicate": False}
+    except PERMANENT_ERRORS as e:
+        error = str(getattr(e, "orig", None) or e)[:1000]
+
+    stored = stored_outcome(key, location)
+    if stored is None:
+        raise WriteFailed(error)
+    if stored["fingerprint"] != record["fingerprint"]:
+        raise IdempotencyConflict(f"Idempotency key '{key}' was already used for a different write")
+    return {**public_outcome(stored), "duplicate": True}
+
+
+# ================================================================
+# LOG SEGMENTS
+# ================================================================
+
+def _encode(record):
+    body = json.dumps(record, separators=(",", ":"))
+    return f"{zlib.crc32(body.encode('utf-8')):08x} {body}\n".encode("utf-8")
+
+
+def _decode(line):
+    """Record from a log line, or None if the line is torn or corrupted"""
+    try:
+        text = line.decode("utf-8")
+        checksum, body = text.rstrip("\n").split(" ", 1)
+        if not text.endswith("\n") or int(checksum, 16) != zlib.crc32(body.encode("utf-8")):
+            return None
+        return json.loads(body)
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+def _segment_name(first_sequence):
+    return f"segment-{first_sequence:012d}.log"
+
+
+def _lock_dir(path):
+    """Open file holding an exclusive lock on a log directory, or None if another process holds it"""
+    lock = open(os.path.join(path, "lock"), "a+")
+    if fcntl is None:
+        return lock
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock
+    except OSError:
+        lock.close()
+        return None
+
+
+def _claim_log_dir(root):
+    """
+    Lock the first free numbered log directory under root (one per API worker process)
+
+    Returns:
+        tuple: (directory path, open lock file - keep it open while writing)
+    """
+    for number in itertools.count():
+        path = os.path.join(root, str(number))
+        os.makedirs(path, exist_ok=True)
+        lock = _lock_dir(path)
+        if lock is not None:
+            return path, lock
+
+
+def _orphaned_log_dirs(root, claimed):
+    """
+    Lock every other numbered log directory no running worker holds
+
+    These belong to workers that are gone - e.g. the API restarted with fewer workers.
+
+    Returns:
+        list: (directory path, open lock file) pairs
+    """
+    if fcntl is None:
+        return []  # Without locks a live worker's directory cannot be told apart
+    orphans = []
+    for name in sorted(os.listdir(root), key=lambda name: (len(name), name)):
+        path = os.path.join(root, name)
+        if not name.isdigit() or os.path.abspath(path) == os.path.abspath(claimed) or not os.path.isdir(path):
+            continue
+        lock = _lock_dir(path)
+        if lock is not None:
+            orphans.append((path, lock))
+    return orphans
+
+
+def _checkpoint_key(directory):
+    return f"write_log:{socket.gethostname()}:{os.path.abspath(directory)}"
+
+
+# ================================================================
+# QUEUE
+# ================================================================
+
+class WriteQueue:
+    """
+    Write-behind queue: append-only log in front of grouped database transactions.
+
+    Writes are applied in log order per location. ``_applied`` holds the last
+    log sequence committed on each location's shard; the same value is stored
+    in load_checkpoints inside each flush transaction.
+    """
+
+    def __init__(self, root=WRITE_LOG_DIR, batch_size=WRITE_BATCH_SIZE,
+                 flush_interval_ms=WRITE_FLUSH_INTERVAL_MS, segment_bytes=WRITE_SEGMENT_BYTES,
+                 fsync=WRITE_LOG_FSYNC, max_pending=WRITE_MAX_PENDING):
+        self.root = root
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.max_pending = max_pending
+        self.directory = None
+        self.checkpoint_key = None
+
+        self._lock = threading.Lock()  # Appends, pending queue, key cache
+        self._sync_lock = threading.Lock()  # fsync and segment rotation
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._dir_lock = None
+        self._file = None
+        self._segments = []  # (first sequence, path), oldest first
+        self._sequence = 0
+        self._synced = 0
+        self._pending = deque()
+        self._keys = OrderedDict()  # idempotency key -> outcome, most recent last
+        self._key_cache_size = max(WRITE_KEY_CACHE_SIZE, max_pending)
+        self._applied = {}  # location -> last applied sequence
+
+        # Metrics
+        self.accepted = 0
+        self.duplicates = 0
+        self.applied = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.last_flush = None
+        self.last_error = None
+
+    # ---------------- startup and recovery ----------------
+
+    def open(self):
+        """
+        Claim a log directory and replay unapplied writes
+
+        The load_checkpoints and write_idempotency_keys tables must exist on
+        every shard (database/schema.sql or ``python -m app.sharding --init``);
+        the API does not create them.
+
+        Unapplied writes in directories left by workers that are no longer
+        running are moved into this worker's log, so no acknowledged write is
+        stranded when the API restarts with fewer workers.
+
+        Returns:
+            int: Writes queued for replay
+        """
+        self.directory, self._dir_lock = _claim_log_dir(self.root)
+        self.checkpoint_key = _checkpoint_key(self.directory)
+        try:
+            for location, bind in sharding.router.engines.items():
+                self._applied[location] = self._read_checkpoint(bind, self.checkpoint_key)
+                self._load_recent_keys(bind, location)
+        except Exception:
+            self._dir_lock.close()
+            self._dir_lock = None
+            raise
+
+        for first, path, records in self._read_segments(self.directory):
+            self._segments.append((first, path))
+            self._sequence = max(self._sequence, first - 1)
+            for record in records:
+                self._sequence = max(self._sequence, record["seq"])
+                if record["seq"] > self._applied.get(record["location"], 0):
+                    self._pending.append(record)
+                    self._remember(record["key"], _outcome(record, "accepted"))
+        self._synced = self._sequence
+
+        if not self._segments:
+            self._segments.append((self._sequence + 1, os.path.join(self.directory, _segment_name(self._sequence + 1))))
+        self._file = open(self._segments[-1][1], "ab")
+
+        for path, lock in _orphaned_log_dirs(self.root, self.directory):
+            try:
+                adopted = self._adopt(path)
+                if adopted:
+                    print(f"✓ Write log: {adopted} unapplied writes adopted from {path}")
+            finally:
+                lock.close()
+
+        self._delete_applied_segments()
+        return len(self._pending)
+
+    @staticmethod
+    def _read_checkpoint(bind, checkpoint_key):
+        """Last applied sequence of a log directory on one shard (fails if the tables are missing)"""
+        inspector = inspect(bind)
+        missing = [
+            model.__tablename__ for model in (LoadCheckpoint, WriteIdempotencyKey)
+            if not inspector.has_table(model.__tablename__)
+        ]
+        if missing:
+            raise SchemaMissing(
+                f"Table(s) {', '.join(missing)} missing on {bind.url.render_as_string(hide_password=True)} - "
+                "run database/schema.sql or python -m app.sharding --init"
+            )
+        with bind.connect() as connection:
+            checkpoint = connection.execute(
+                select(LoadCheckpoint.rows_done).where(LoadCheckpoint.load_key == checkpoint_key)
+            ).scalar()
+        return checkpoint or 0
+
+    def _read_segments(self, directory):
+        """(first sequence, path, records) per segment of a log directory, oldest first"""
+        names = sorted(name for name in os.listdir(directory) if name.startswith("segment-"))
+        return [
+            (int(name[8:20]), os.path.join(directory, name),
+             self._read_segment(os.path.join(directory, name), is_last=index == len(names) - 1))
+            for index, name in enumerate(names)
+        ]
+
+    def _adopt(self, directory):
+        """
+        Move the unapplied writes of an orphaned log directory into this log
+
+        The writes are appended (with new sequence numbers) and fsynced before
+        the orphaned segments are removed. A crash in between replays them from
+        both logs; the idempotency keys make the second copy a no-op.
+
+        Returns:
+            int: Writes adopted
+        """
+        orphan_key = _checkpoint_key(directory)
+        applied = {
+            location: self._read_checkpoint(bind, orphan_key)
+            for location, bind in sharding.router.engines.items()
+        }
+        segments = self._read_segments(directory)
+        last_sequence = max(
+            [first - 1 for first, _, _ in segments] + [record["seq"] for _, _, records in segments for record in records],
+            default=0
+        )
+        adopted = 0
+        with self._lock:
+            for _, _, records in segments:
+                for record in records:
+                    if record["seq"] <= applied.get(record["location"], 0):
+                        continue
+                    self._sequence += 1
+                    record = {**record, "seq": self._sequence}
+                    self._file.write(_encode(record))
+                    self._pending.append(record)
+                    self._remember(record["key"], _outcome(record, "accepted"))
+                    adopted += 1
+            sequence = self._sequence
+        self._sync(sequence)
+
+        # Keep the orphan's sequence going (its checkpoint stays in the database) for whoever claims it next
+        open(os.path.join(directory, _segment_name(last_sequence + 1)), "ab").close()
+        for first, path, _ in segments:
+            if first != last_sequence + 1:
+                os.remove(path)
+        return adopted
+
+    def _load_recent_keys(self, bind, location):
+        """Cache the newest stored keys so retries across a restart are answered without a query"""
+        with bind.connect() as connection:
+            rows = connection.execute(
+                select(WriteIdempotencyKey).order_by(WriteIdempotencyKey.created_at.desc())
+                .limit(self._key_cache_size)
+            ).all()
+        for row in reversed(rows):
+            self._remember(row.idempotency_key, {
+                "idempotency_key": row.idempotency_key, "operation": row.operation, "location": location,
+                "sequence": row.sequence, "fingerprint": row.fingerprint, "status": row.status, "error": row.error,
+            })
+
+    def _read_segment(self, path, is_last):
+        records = []
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for line in f:
+                record = _decode(line)
+                if record is None:
+                    if not is_last:
+                        raise LogCorrupted(f"{path}: unreadable record at byte {valid_bytes}")
+                    break  # Torn tail from a crash mid-append - the write was never acknowledged
+                records.append(record)
+                valid_bytes += len(line)
+        if is_last and valid_bytes < os.path.getsize(path):
+            with open(path, "r+b") as f:
+                f.truncate(valid_bytes)
+        return records
+
+    # ---------------- accepting writes ----------------
+
+    def submit(self, operation, payload, key, location=None):
+        """
+        Append a write to the log and wait until it is durable
+
+        Args:
+            operation: Name in OPERATIONS
+            payload: JSON-serialisable request body (plus its path parameter)
+            key: Client-supplied idempotency key
+            location: Restaurant location (default location if None)
+
+        Returns:
+            dict: Outcome - sequence, status ("accepted", "applied" or "rejected") and
+                  "duplicate" when the key was seen before
+
+        Raises:
+            IdempotencyConflict: The key was used for a different write
+            WriteQueueFull: Too many writes waiting to be flushed
+        """
+        location = location or DEFAULT_LOCATION
+        sharding.router.check(location)
+        write_fingerprint = fingerprint(operation, location, payload)
+
+        with self._lock:
+            known = self._keys.get(key)
+            if known is not None:
+                if known["fingerprint"] != write_fingerprint:
+                    raise IdempotencyConflict(f"Idempotency key '{key}' was already used for a different write")
+                self.duplicates += 1
+                return {**public_outcome(known), "duplicate": True}
+            if len(self._pending) >= self.max_pending:
+                raise WriteQueueFull(f"{len(self._pending)} writes waiting to be flushed")
+
+            self._sequence += 1
+            record = {
+                "seq": self._sequence, "key": key, "op": operation, "location": location,
+                "fingerprint": write_fingerprint, "payload": payload,
+            }
+            self._file.write(_encode(record))
+            self._pending.append(record)
+            outcome = _outcome(record, "accepted")
+            self._remember(key, outcome)
+            self.accepted += 1
+            sequence = self._sequence
+            wake = len(self._pending) >= self.batch_size
+
+        self._sync(sequence)
+        if wake:
+            self._wake.set()
+        return {**public_outcome(outcome), "duplicate": False}
+
+    def _sync(self, sequence):
+        """Make the log durable up to sequence; concurrent callers share one fsync"""
+        with self._sync_lock:
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                target = self._sequence
+                self._file.flush()
+                segment = self._file
+            if self.fsync:
+                os.fsync(segment.fileno())
+            self._synced = target
+            if os.fstat(segment.fileno()).st_size >= self.segment_bytes:
+                with self._lock:
+                    self._rotate()
+
+    def _rotate(self):
+        """Start a new segment (caller holds both locks)"""
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        first = self._sequence + 1
+        path = os.path.join(self.directory, _segment_name(first))
+        self._segments.append((first, path))
+        self._file = open(path, "ab")
+
+    # ---------------- idempotency keys ----------------
+
+    def _remember(self, key, outcome):
+        # Caller holds self._lock
+        self._keys[key] = outcome
+        self._keys.move_to_end(key)
+        while len(self._keys) > self._key_cache_size:
+            self._keys.popitem(last=False)
+
+    def lookup(self, key, location=None):
+        """
+        Outcome of a write by idempotency key - pending writes from memory, older ones from the database
+
+        Returns:
+            dict: Outcome, or None if the key is unknown
+        """
+        with self._lock:
+            known = self._keys.get(key)
+        if known is not None:
+            return known
+        return stored_outcome(key, location)
+
+    # ---------------- flushing ----------------
+
+    def flush(self):
+        """
+        Apply every pending write in batches of at most batch_size
+
+        Returns:
+            int: Writes applied or rejected
+        """
+        done = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = list(itertools.islice(self._pending, self.batch_size))
+                if not batch:
+                    return done
+                started = time.perf_counter()
+                self._apply_batch(batch)
+                with self._lock:
+                    for _ in batch:
+                        self._pending.popleft()
+                done += len(batch)
+                self.flushes += 1
+                self.last_flush = {
+                    "writes": len(batch),
+                    "last_sequence": batch[-1]["seq"],
+                    "milliseconds": round((time.perf_counter() - started) * 1000, 3),
+                }
+                self._delete_applied_segments()
+
+    def _apply_batch(self, batch):
+        by_location = OrderedDict()
+        for record in batch:
+            if record["seq"] > self._applied.get(record["location"], 0):
+                by_location.setdefault(record["location"], []).append(record)
+
+        for location, records in by_location.items():
+            try:
+                bind = sharding.router.engine_for(location)
+            except sharding.UnknownLocation as e:
+                # Location removed from SHARD_URLS after the write was accepted
+                for record in records:
+                    self._finish(record, "rejected", str(e))
+                continue
+            try:
+                # Fast path: the whole group in one transaction
+                with bind.begin() as connection:
+                    _apply_records(connection, records)
+                    self._save_checkpoint(connection, records[-1]["seq"])
+            except PERMANENT_ERRORS:
+                # A write was refused - apply one transaction per write to isolate it.
+                # Any other error propagates and leaves the rest of the group in the log.
+                for record in records:
+                    outcome = self._apply_single(bind, record)
+                    self._applied[location] = record["seq"]
+                    self._finish(*outcome)
+                continue
+            self._applied[location] = records[-1]["seq"]
+            for record in records:
+                self._finish(record, "applied", None)
+
+    def _apply_single(self, bind, record):
+        try:
+            with bind.begin() as connection:
+                _apply_records(connection, [record])
+                self._save_checkpoint(connection, record["seq"])
+            return record, "applied", None
+        except PERMANENT_ERRORS as e:
+            error = str(getattr(e, "orig", None) or e)[:1000]
+
+        with bind.begin() as connection:
+            stored = connection.execute(
+                select(WriteIdempotencyKey.status, WriteIdempotencyKey.error)
+                .where(WriteIdempotencyKey.idempotency_key == record["key"])
+            ).first()
+            if stored is None:
+                connection.execute(insert(WriteIdempotencyKey.__table__).values(
+                    idempotency_key=record["key"], operation=record["op"], fingerprint=record["fingerprint"],
+                    sequence=record["seq"], status="rejected", error=error,
+                ))
+            self._save_checkpoint(connection, record["seq"])
+        if stored is not None:
+            # Applied earlier under the same key - keep that outcome
+            return record, stored.status, stored.error
+        return record, "rejected", error
+
+    def _save_checkpoint(self, connection, sequence):
+        updated = connection.execute(
+            update(LoadCheckpoint).where(LoadCheckpoint.load_key == self.checkpoint_key)
+            .values(rows_done=sequence)
+        )
+        if updated.rowcount == 0:
+            connection.execute(insert(LoadCheckpoint).values(
+                load_key=self.checkpoint_key, rows_done=sequence, completed=False
+            ))
+
+    def _finish(self, record, status, error):
+        if status == "applied":
+            self.applied += 1
+        else:
+            self.rejected += 1
+            print(f"✗ Write {record['key']} ({record['op']}) rejected: {error}")
+        with self._lock:
+            self._remember(record["key"], _outcome(record, status, error))
+
+    def _delete_applied_segments(self):
+        """Remove closed segments whose writes are all applied"""
+        with self._lock:
+            lowest_pending = self._pending[0]["seq"] if self._pending else self._sequence + 1
+            while len(self._segments) > 1 and self._segments[1][0] <= lowest_pending:
+                first, path = self._segments.pop(0)
+                os.remove(path)
+
+    # ---------------- background flusher ----------------
+
+    def start(self):
+        """Start the flusher thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="write-flusher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"✗ Write flush failed: {str(e)}")
+                self._stop.wait(FLUSH_RETRY_SECONDS)
+
+    def stop(self):
+        """Flush what is pending, stop the flusher and close the log"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"⚠️ {len(self._pending)} writes left in the log for the next start: {str(e)}")
+        with self._sync_lock, self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self._dir_lock is not None:
+            self._dir_lock.close()
+            self._dir_lock = None
+
+    def status(self):
+        """
+        Queue depth, log position and flush statistics
+
+        Returns:
+            dict: Metrics for /api/writes
+        """
+        with self._lock:
+            pending = len(self._pending)
+            oldest = self._pending[0]["seq"] if self._pending else None
+        return {
+            "log_directory": self.directory,
+            "last_sequence": self._sequence,
+            "pending": pending,
+            "oldest_pending_sequence": oldest,
+            "applied_sequence": dict(self._applied),
+            "segments": len(self._segments),
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "applied": self.applied,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "avg_batch_size": round((self.applied + self.rejected) / self.flushes, 1) if self.flushes else None,
+            "last_flush": self.last_flush,
+            "last_error": self.last_error,
+            "batch_size": self.batch_size,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "fsync": self.fsync,
+        }
+
+
+# Process-wide queue (None unless WRITE_QUEUE_ENABLED and started)
+write_queue = None
+
+
+def start_write_queue():
+    """
+    Open the write log, replay unapplied writes and start the flusher
+
+    Returns:
+        WriteQueue: The running queue, or None if disabled
+    """
+    global write_queue
+    if not WRITE_QUEUE_ENABLED:
+        return None
+    if write_queue is None:
+        queue = WriteQueue()
+        replayed = queue.open()
+        if replayed:
+            print(f"✓ Write log: {replayed} unapplied writes queued for replay")
+        queue.start()
+        write_queue = queue
+    return write_queue
+
+
+def stop_write_queue():
+    """Flush and close the write queue"""
+    global write_queue
+    if write_queue is not None:
+        write_queue.stop()
+        write_queue = None
+
+
+def get_write_queue():
+    """Return the running write queue, or None if it is not started"""
+    return write_queue
@@ -0,0 +1,119 @@
+"""
+Bulk Load Benchmark - Generate synthetic order history and load it with app.loader
+
+Writes orders (CSV), order items (NDJSON) and payments (CSV) for N orders into a
+temporary directory, seeds a SQLite database with the sample menu, then loads
+the files with secondary indexes kept and disabled and reports rows/s.
+
+Usage:
+    python benchmarks/bulk_load.py --orders 200000
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def generate(directory, order_count, item_ids, first_order_id=100000, seed=42):
+    """
+    Write synthetic order history files
+
+    Returns:
+        dict: Table name to file path
+    """
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    paths = {
+        "orders": os.path.join(directory, "orders.csv"),
+        "order_items": os.path.join(directory, "order_items.ndjson"),
+        "payments": os.path.join(directory, "payments.csv"),
+    }
+    with open(paths["orders"], "w", newline="") as orders_file, \
+            open(paths["order_items"], "w") as items_file, \
+            open(paths["payments"], "w", newline="") as payments_file:
+        orders = csv.writer(orders_file)
+        orders.writerow(["order_id", "order_date", "order_status"])
+        payments = csv.writer(payments_file)
+        payments.writerow(["payment_id", "order_id", "payment_date", "amount_due", "tips",
+                           "discount", "total_paid", "payment_type", "payment_status"])
+        for n in range(order_count):
+            order_id = first_order_id + n
+            order_date = start + timedelta(days=n * 1500 // max(order_count, 1))
+            orders.writerow([order_id, order_date.isoformat(), "Completed"])
+            subtotal = 0
+            for _ in range(rng.randint(1, 5)):
+                price = rng.choice((3.5, 4.25, 8.0, 12.5, 15.75))
+                quantity = rng.randint(1, 3)
+                subtotal += price * quantity
+                items_file.write(json.dumps({
+                    "order_id": order_id, "item_id": rng.choice(item_ids), "size": None,
+                    "price": f"{price:.2f}", "quantity": quantity, "total": f"{price * quantity:.2f}",
+                }) + "\n")
+            tips = rng.choice((0, 0, 1, 2))
+            payments.writerow([order_id, order_id, order_date.isoformat(), f"{subtotal:.2f}", tips, 0,
+                               f"{subtotal + tips:.2f}", rng.choice(("Cash", "Card")), "Completed"])
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bulk data loader on SQLite")
+    parser.add_argument("--orders", type=int, default=100000, help="Synthetic orders to generate")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Loader chunk size")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bulk_load.db')}"
+
+    from sqlalchemy import select
+    from tests.sample_data import seed
+    from app import loader
+    from app.database import engine
+    from app.models import Item
+
+    seed()
+    with engine.connect() as connection:
+        item_ids = list(connection.execute(select(Item.item_id)).scalars())
+        # Indexes named as in database/schema.sql
+        for statement in (
+            "CREATE INDEX idx_orders_date ON orders(order_date)",
+            "CREATE INDEX idx_orders_status ON orders(order_status)",
+            "CREATE INDEX idx_payments_date ON payments(payment_date)",
+            "CREATE INDEX idx_payments_status ON payments(payment_status)",
+        ):
+            connection.exec_driver_sql(statement)
+        connection.commit()
+
+    print("=" * 72)
+    print(f"BULK LOAD BENCHMARK ({args.orders} orders, chunk size {args.chunk_size})")
+    print("=" * 72)
+    for run, index_mode in enumerate(("keep", "disable")):
+        run_directory = os.path.join(directory, index_mode)
+        os.makedirs(run_directory)
+        paths = generate(run_directory, args.orders, item_ids, first_order_id=100000 + run * args.orders)
+        results, rebuild_seconds = loader.run_load(
+            paths, chunk_size=args.chunk_size, index_mode=index_mode,
+            rejects_path=os.path.join(directory, "rejects.ndjson")
+        )
+        total_rows = sum(stats.loaded for stats in results)
+        total_seconds = sum(stats.seconds for stats in results) + (rebuild_seconds or 0)
+        print(f"indexes={index_mode}")
+        for stats in results:
+            print(f"  {stats.table:<12} {stats.loaded:>9} rows  {stats.seconds:>7.2f}s  "
+                  f"{stats.rows_per_second:>9.0f} rows/s  {stats.rejected} rejected")
+        if rebuild_seconds is not None:
+            print(f"  index rebuild {rebuild_seconds:>24.2f}s")
+        print(f"  total        {total_rows:>9} rows  {total_seconds:>7.2f}s  "
+              f"{total_rows / total_seconds:>9.0f} rows/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Cold Start Benchmark - Time from launching a uvicorn worker to its first response
+
+Starts ``uvicorn app.main:app`` in a fresh process several times against a
+temporary SQLite database and polls until the first request succeeds, then
+reports the import time of app.main and the median and worst time-to-first-response.
+
+Usage:
+    python benchmarks/cold_start.py --runs 5
+    python benchmarks/cold_start.py --runs 5 --env API_DOCS_ENABLED=False
+    python benchmarks/cold_start.py --runs 5 --factory   # uvicorn --factory app.main:create_app
+    python benchmarks/cold_start.py --app-dir /path/to/other/checkout   # compare two trees
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds(app_dir, env):
+    """Seconds to import app.main in a fresh interpreter"""
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=app_dir, env=env, capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def first_response_seconds(app_dir, env, path, timeout, factory=False):
+    """
+    Launch one uvicorn worker and poll path until it answers
+
+    Args:
+        factory: Start ``uvicorn --factory app.main:create_app`` instead of ``app.main:app``
+
+    Returns:
+        float: Seconds from process start to the first 200 response
+    """
+    port = free_port()
+    started = time.perf_counter()
+    target = ["--factory", "app.main:create_app"] if factory else ["app.main:app"]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", *target, "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.005)
+        raise RuntimeError(f"no response from {path} within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure uvicorn worker time-to-first-response")
+    parser.add_argument("--runs", type=int, default=5, help="Worker launches to measure")
+    parser.add_argument("--path", default="/health", help="First request path")
+    parser.add_argument("--app-dir", default=ROOT, help="Checkout to start the app from")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra environment for the worker (repeatable)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for one worker")
+    parser.add_argument("--factory", action="store_true", help="Start the app through create_app()")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'cold_start.db')}",
+        "WRITE_LOG_DIR": os.path.join(directory, "write_log"),
+    }
+    for entry in args.env:
+        name, _, value = entry.partition("=")
+        env[name] = value
+
+    import_seconds(args.app_dir, env)  # Compile bytecode once so every run starts from the same cache
+    imports = [import_seconds(args.app_dir, env) for _ in range(args.runs)]
+    firsts = [
+        first_response_seconds(args.app_dir, env, args.path, args.timeout, factory=args.factory)
+        for _ in range(args.runs)
+    ]
+
+    print("=" * 72)
+    print(f"COLD START BENCHMARK ({args.runs} runs, first request GET {args.path})")
+    print(f"app dir: {args.app_dir}" + (f"  env: {' '.join(args.env)}" if args.env else ""))
+    print("=" * 72)
+    print(f"{'measure':<28}{'median':>10}{'min':>10}{'max':>10}")
+    for name, values in (("import app.main", imports), ("time to first response", firsts)):
+        print(f"{name:<28}{statistics.median(values) * 1000:>8.0f}ms"
+              f"{min(values) * 1000:>8.0f}ms{max(values) * 1000:>8.0f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Job Offload Benchmark - Interactive latency while heavy reports run inline or as jobs
+
+Loads synthetic order history into a temporary SQLite database and measures
+order lookup latency (GET /api/orders/{id}) in three phases:
+
+- idle:   no reports running
+- inline: report clients call GET /api/orders/complete/all in a loop
+- jobs:   report clients submit the same report to /api/jobs and wait for it
+
+Usage:
+    python benchmarks/job_offload.py --orders 20000 --seconds 10
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_phase(client, order_ids, seconds, report=None, report_clients=0):
+    """
+    Measure lookup latency while report clients run
+
+    Returns:
+        tuple: (lookup latencies in ms, reports completed)
+    """
+    stop = threading.Event()
+    reports_done = []
+
+    def report_loop():
+        while not stop.is_set():
+            report()
+            reports_done.append(1)
+
+    threads = [threading.Thread(target=report_loop, daemon=True) for _ in range(report_clients)]
+    for thread in threads:
+        thread.start()
+
+    rng = random.Random(7)
+    latencies = []
+    stop_at = time.perf_counter() + seconds
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        response = client.get(f"/api/orders/{rng.choice(order_ids)}")
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+        time.sleep(0.01)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, len(reports_done)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare lookup latency with reports inline vs in the job pool")
+    parser.add_argument("--orders", type=int, default=20000, help="Synthetic orders to load")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measurement time per phase")
+    parser.add_argument("--report-clients", type=int, default=2, help="Concurrent report clients")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'job_offload.db')}",
+        "JOB_RESULT_DIR": os.path.join(directory, "job_results"),
+        "READ_MODEL_ENABLED": "False",
+        "ANALYTICS_MIRROR_ENABLED": "False",
+    })
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+    from bulk_load import generate
+    from tests.sample_data import seed
+    from app import jobs, loader
+    from app.database import engine
+    from app.main import app
+    from app.models import Item
+
+    seed()
+    with engine.connect() as connection:
+        item_ids = list(connection.execute(select(Item.item_id)).scalars())
+    paths = generate(directory, args.orders, item_ids)
+    loader.run_load(paths, index_mode="keep", rejects_path=os.path.join(directory, "rejects.ndjson"))
+    order_ids = [100000 + n for n in range(args.orders)]
+
+    client = TestClient(app)
+
+    def inline_report():
+        assert client.get("/api/orders/complete/all").status_code == 200
+
+    def job_report():
+        response = client.post("/api/jobs", json={"report": "orders_complete", "refresh": True})
+        job_id = response.json()["data"]["job_id"]
+        with client.stream("GET", f"/api/jobs/{job_id}/events") as events:
+            for _ in events.iter_lines():
+                pass
+        assert client.get(f"/api/jobs/{job_id}").json()["data"]["status"] == "done"
+
+    # Start the worker processes before measuring
+    job_report()
+
+    print("=" * 72)
+    print(f"JOB OFFLOAD BENCHMARK ({args.orders} orders, {args.report_clients} report clients)")
+    print("=" * 72)
+    print(f"{'phase':<8}{'lookups':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}{'reports':>10}")
+    for phase, report in (("idle", None), ("inline", inline_report), ("jobs", job_report)):
+        latencies, reports = run_phase(
+            client, order_ids, args.seconds, report, args.report_clients if report else 0
+        )
+        print(f"{phase:<8}{len(latencies):>9}"
+              f"{percentile(latencies, 0.5):>8.1f}ms{percentile(latencies, 0.95):>8.1f}ms"
+              f"{percentile(latencies, 0.99):>8.1f}ms{max(latencies):>8.1f}ms{reports:>10}")
+    jobs.runner.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
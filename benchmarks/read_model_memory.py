@@ -0,0 +1,146 @@
+"""
+Memory Benchmark - In-Memory Read Model vs ORM
+Loads a synthetic order history into a temporary SQLite database and compares
+the memory held by the read model with ORM objects plus response models
+
+Usage:
+    python benchmarks/read_model_memory.py --orders 50000 --lines-per-order 5
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker, joinedload  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models import Order, OrderItem, Payment, Item, Category, Menu  # noqa: E402
+from app.read_model import ReadModel  # noqa: E402
+from app.schemas import OrderDetailResponse, OrderItemResponse, PaymentResponse  # noqa: E402
+
+
+def populate(engine, orders, lines_per_order):
+    """Fill the database with a deterministic synthetic order history"""
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Menu), [{"menu_id": 1, "menu_name": "Food"}, {"menu_id": 2, "menu_name": "Drinks"}])
+        conn.execute(insert(Category), [
+            {"cat_id": c, "category_name": f"Category{c}", "menu_id": 1 + c % 2} for c in range(1, 6)
+        ])
+        conn.execute(insert(Item), [
+            {"item_id": i, "item_name": f"Item{i}", "cat_id": 1 + i % 5, "menu_id": 1 + i % 2,
+             "has_size_variants": i % 3 == 0}
+            for i in range(1, 11)
+        ])
+        batch = 10000
+        for first in range(1, orders + 1, batch):
+            ids = range(first, min(first + batch, orders + 1))
+            conn.execute(insert(Order), [
+                {"order_id": o, "order_date": start + timedelta(days=o % 365), "order_status": "Completed"}
+                for o in ids
+            ])
+            lines = []
+            for o in ids:
+                for _ in range(lines_per_order):
+                    price = Decimal(rng.randint(100, 900)) / 100
+                    quantity = rng.randint(1, 3)
+                    lines.append({"order_id": o, "item_id": rng.randint(1, 10),
+                                  "size": rng.choice([None, "Small", "Large"]),
+                                  "price": price, "quantity": quantity, "total": price * quantity})
+            conn.execute(insert(OrderItem), lines)
+            conn.execute(insert(Payment), [
+                {"payment_id": o, "order_id": o, "payment_date": start + timedelta(days=o % 365),
+                 "amount_due": Decimal("10.00"), "tips": Decimal("0"), "discount": Decimal("0"),
+                 "total_paid": Decimal("10.00"), "payment_type": "Card", "payment_status": "Completed"}
+                for o in ids
+            ])
+
+
+def measure(label, build):
+    """Run build() under tracemalloc and report retained bytes"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return label, result, current, peak, elapsed
+
+
+def orm_path(session_factory):
+    """Load everything the way /api/orders/complete/all does"""
+    db = session_factory()
+    orders = db.query(Order).options(
+        joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.category),
+        joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.menu),
+        joinedload(Order.payments)
+    ).all()
+    responses = []
+    for order in orders:
+        items = [OrderItemResponse(
+            id=line.id, item_id=line.item_id, item_name=line.item.item_name,
+            category_name=line.item.category.category_name, menu_name=line.item.menu.menu_name,
+            size=line.size, price=line.price, quantity=line.quantity, total=line.total
+        ) for line in order.order_items]
+        payments = [PaymentResponse(
+            payment_id=p.payment_id, payment_date=p.payment_date, amount_due=p.amount_due,
+            tips=p.tips, discount=p.discount, total_paid=p.total_paid,
+            payment_type=p.payment_type, payment_status=p.payment_status
+        ) for p in order.payments]
+        subtotal = sum((line.total for line in order.order_items), Decimal("0.00"))
+        responses.append(OrderDetailResponse(
+            order_id=order.order_id, order_date=order.order_date, order_status=order.order_status,
+            created_at=order.created_at, items=items, payments=payments,
+            total_items_count=len(items), order_subtotal=subtotal, total_paid=Decimal("10.00"),
+            payment_balance=subtotal - Decimal("10.00")
+        ))
+    return db, orders, responses
+
+
+def read_model_path(session_factory):
+    model = ReadModel(session_factory=session_factory)
+    model.refresh()
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare read model and ORM memory use")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--lines-per-order", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        populate(engine, args.orders, args.lines_per_order)
+        session_factory = sessionmaker(bind=engine)
+        line_items = args.orders * args.lines_per_order
+
+        print("=" * 60)
+        print(f"Orders: {args.orders}  Line items: {line_items}")
+        print("=" * 60)
+        for label, build in (("ORM + Pydantic", lambda: orm_path(session_factory)),
+                             ("Read model", lambda: read_model_path(session_factory))):
+            label, result, current, peak, elapsed = measure(label, build)
+            per_million = current / line_items * 1_000_000
+            print(f"{label:<16} retained {current / 2**20:8.1f} MiB  peak {peak / 2**20:8.1f} MiB  "
+                  f"({per_million / 2**20:7.1f} MiB per 1M lines)  load {elapsed:.2f}s")
+            del result
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Response Cache Benchmark - Hit rate and latency of the shared cache as workers are added
+
+Starts ``uvicorn app.main:app --workers N`` against a temporary SQLite database
+(with synthetic order history), sends a mix of read requests from several
+client threads, and reports requests/s, latency and the hit rate taken from
+the X-Response-Cache header - with the cache off, and on for each worker count.
+A cache private to each worker would need N misses per distinct request; the
+shared cache needs one however many workers there are. With --write-rate, a
+POS thread records payments for random orders during the run, which invalidates
+only the routes (and order details) the payments touch.
+
+Usage:
+    python benchmarks/response_cache.py --orders 2000 --workers 1 4 --requests 2000
+    python benchmarks/response_cache.py --workers 4 --write-rate 20
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def request_mix(order_ids, count, seed=5):
+    """Read requests weighted towards lookups, with a few lists and reports"""
+    rng = random.Random(seed)
+    hot_orders = rng.sample(order_ids, min(200, len(order_ids)))
+    paths = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.6:
+            paths.append(f"/api/orders/{rng.choice(hot_orders)}")
+        elif roll < 0.8:
+            paths.append(f"/api/orders?date={2020 + rng.randint(0, 3)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+        elif roll < 0.95:
+            paths.append(f"/api/statistics/revenue?group_by={rng.choice(['date', 'item', 'category', 'menu'])}")
+        else:
+            paths.append("/api/statistics/overview")
+    return paths
+
+
+_payment_ids = itertools.count(10 ** 8)
+
+
+def record_payments(base, order_ids, rate, stop, timeout):
+    """Post a payment for a random order `rate` times a second until stopped"""
+    rng = random.Random(17)
+    while not stop.wait(1.0 / rate):
+        payment_id = next(_payment_ids)
+        body = json.dumps({
+            "payment_id": payment_id, "order_id": rng.choice(order_ids), "payment_date": "2024-06-01",
+            "amount_due": "1.00", "tips": "0.00", "discount": "0.00", "total_paid": "1.00",
+            "payment_type": "Card", "payment_status": "Completed",
+        }).encode("utf-8")
+        request = urllib.request.Request(
+            f"{base}/api/payments", data=body, method="POST",
+            headers={"Content-Type": "application/json", "Idempotency-Key": f"bench-{payment_id}"}
+        )
+        urllib.request.urlopen(request, timeout=timeout).read()
+
+
+def run(env, workers, paths, clients, timeout, order_ids=(), write_rate=0):
+    """
+    Start a uvicorn server with `workers` processes and replay paths from `clients` threads,
+    recording `write_rate` payments a second meanwhile
+
+    Returns:
+        tuple: (latencies in ms, wall seconds, hits, misses)
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        started = time.perf_counter()
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited: {process.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                urllib.request.urlopen(f"{base}/health", timeout=1).read()
+                break
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.05)
+        time.sleep(1.0)  # Let every worker finish starting
+
+        latencies, outcomes = [], []
+        lock = threading.Lock()
+
+        def client(share):
+            local_latencies, local_outcomes = [], []
+            for path in share:
+                request_started = time.perf_counter()
+                with urllib.request.urlopen(f"{base}{path}", timeout=timeout) as response:
+                    response.read()
+                    local_outcomes.append(response.headers.get("x-response-cache"))
+                local_latencies.append((time.perf_counter() - request_started) * 1000)
+            with lock:
+                latencies.extend(local_latencies)
+                outcomes.extend(local_outcomes)
+
+        stop = threading.Event()
+        writer = None
+        if write_rate:
+            writer = threading.Thread(target=record_payments, args=(base, list(order_ids), write_rate, stop, timeout))
+            writer.start()
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(paths[n::clients],)) for n in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        stop.set()
+        if writer is not None:
+            writer.join()
+        return latencies, wall, outcomes.count("hit"), outcomes.count("miss")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the shared response cache across worker counts")
+    parser.add_argument("--orders", type=int, default=2000, help="Synthetic orders to load")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="Worker counts to compare")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per run")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--write-rate", type=float, default=0, help="Payments recorded per second during each run")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the server")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    database_url = f"sqlite:///{os.path.join(directory, 'response_cache.db')}"
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "READ_MODEL_ENABLED": "False",
+        "ANALYTICS_MIRROR_ENABLED": "False",
+    })
+
+    from sqlalchemy import select
+    from bulk_load import generate
+    from tests.sample_data import seed
+    from app import loader
+    from app.database import get_engine
+    from app.models import Item, Order
+
+    seed()
+    with get_engine().connect() as connection:
+        item_ids = list(connection.execute(select(Item.item_id)).scalars())
+    paths = generate(directory, args.orders, item_ids)
+    loader.run_load(paths, index_mode="keep", rejects_path=os.path.join(directory, "rejects.ndjson"))
+    with get_engine().connect() as connection:
+        order_ids = list(connection.execute(select(Order.order_id)).scalars())
+    mix = request_mix(order_ids, args.requests)
+
+    env = {
+        **os.environ,
+        "WRITE_LOG_DIR": os.path.join(directory, "write_log"),
+        "SEARCH_INDEX_ENABLED": "False",
+        "ADMISSION_CONTROL_ENABLED": "False",
+    }
+
+    print("=" * 72)
+    print(f"RESPONSE CACHE BENCHMARK ({args.orders} orders, {args.requests} requests, "
+          f"{len(set(mix))} distinct, {args.clients} clients, {args.write_rate:g} payments/s)")
+    print("=" * 72)
+    print(f"{'cache':<7}{'workers':>8}{'req/s':>9}{'p50':>10}{'p95':>10}{'hit rate':>10}{'misses':>8}")
+    runs = [("off", workers) for workers in args.workers] + [("on", workers) for workers in args.workers]
+    for cache, workers in runs:
+        run_env = {**env, "RESPONSE_CACHE_ENABLED": "True" if cache == "on" else "False",
+                   "RESPONSE_CACHE_PATH": os.path.join(directory, f"cache-{workers}.db")}
+        latencies, wall, hits, misses = run(run_env, workers, mix, args.clients, args.timeout,
+                                            order_ids, args.write_rate)
+        looked_up = hits + misses
+        hit_rate = f"{hits / looked_up:.1%}" if looked_up else "-"
+        print(f"{cache:<7}{workers:>8}{len(latencies) / wall:>9.0f}{percentile(latencies, 0.5):>8.2f}ms"
+              f"{percentile(latencies, 0.95):>8.2f}ms{hit_rate:>10}{misses if looked_up else '-':>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
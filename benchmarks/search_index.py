@@ -0,0 +1,122 @@
+"""
+Search Index Benchmark - "Orders containing an item between dates" from the index versus SQL
+
+Loads synthetic order history into a temporary SQLite database, builds the
+search index and times the same queries answered by SearchIndex.search_orders
+and by the equivalent indexed SQL (order_items joined to orders on the items
+the query text matches and the date range). Also reports the index build time and size.
+
+Usage:
+    python benchmarks/search_index.py --orders 100000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare item-to-order search from the index and from SQL")
+    parser.add_argument("--orders", type=int, default=100000, help="Synthetic orders to load")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per method")
+    parser.add_argument("--window-days", type=int, default=90, help="Date range of each query")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'search_index.db')}",
+        "READ_MODEL_ENABLED": "False",
+        "ANALYTICS_MIRROR_ENABLED": "False",
+    })
+
+    from sqlalchemy import func, select
+    from bulk_load import generate
+    from tests.sample_data import seed
+    from app import loader
+    from app.database import get_engine, get_session_factory
+    from app.models import Item, Order, OrderItem
+    from app.search import SearchIndex
+
+    seed()
+    engine = get_engine()
+    with engine.connect() as connection:
+        catalog = dict(connection.execute(select(Item.item_id, Item.item_name)).all())
+    paths = generate(directory, args.orders, list(catalog))
+    loader.run_load(paths, index_mode="keep", rejects_path=os.path.join(directory, "rejects.ndjson"))
+
+    started = time.perf_counter()
+    index = SearchIndex(session_factory=get_session_factory())
+    index.refresh()
+    build_seconds = time.perf_counter() - started
+    status = index.status()
+
+    rng = random.Random(3)
+    first_day = date(2020, 1, 1)
+    queries = []
+    for _ in range(args.queries):
+        start = first_day + timedelta(days=rng.randint(0, 1500 - args.window_days))
+        queries.append((rng.choice(list(catalog)), start, start + timedelta(days=args.window_days)))
+
+    def from_index(item_id, start, end):
+        result = index.search_orders(catalog[item_id], start=start, end=end, limit=100)
+        return result["total_orders"], [order["order_id"] for order in result["orders"]]
+
+    db = get_session_factory()()
+
+    # The query text also prefix-matches other items ("Item1" finds Item10...), so SQL gets the same item set
+    resolved = {item_id: [item["item_id"] for item in index.search_items(catalog[item_id], limit=len(catalog))]
+                for item_id in catalog}
+
+    def from_sql(item_id, start, end):
+        matching = (
+            select(Order.order_id, Order.order_date)
+            .join(OrderItem, OrderItem.order_id == Order.order_id)
+            .where(OrderItem.item_id.in_(resolved[item_id]), Order.order_date.between(start, end))
+            .distinct()
+            .subquery()
+        )
+        total = db.scalar(select(func.count()).select_from(matching))
+        page = db.execute(
+            select(matching.c.order_id)
+            .order_by(matching.c.order_date.desc(), matching.c.order_id.desc()).limit(100)
+        ).scalars().all()
+        return total, list(page)
+
+    print("=" * 72)
+    print(f"SEARCH INDEX BENCHMARK ({args.orders} orders, {args.queries} queries, {args.window_days}-day ranges)")
+    print("=" * 72)
+    print(f"index build: {build_seconds:.2f}s  ({status['orders']} orders, "
+          f"{status['posting_entries']} posting entries)")
+    print(f"{'method':<8}{'p50':>10}{'p95':>10}{'max':>10}")
+    results = {}
+    for name, method in (("index", from_index), ("sql", from_sql)):
+        method(*queries[0])  # Warm up
+        latencies, answers = [], []
+        for query in queries:
+            query_started = time.perf_counter()
+            answers.append(method(*query))
+            latencies.append((time.perf_counter() - query_started) * 1000)
+        results[name] = answers
+        print(f"{name:<8}{percentile(latencies, 0.5):>8.2f}ms{percentile(latencies, 0.95):>8.2f}ms"
+              f"{max(latencies):>8.2f}ms")
+    db.close()
+
+    assert results["index"] == results["sql"], "index and SQL returned different orders"
+    print("\nindex and SQL answers identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
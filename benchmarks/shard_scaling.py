@@ -0,0 +1,164 @@
+"""
+Shard Scaling Benchmark - Group-wide statistics throughput versus number of location shards
+
+Splits the same synthetic order history across 1, 2, 4 ... SQLite files acting
+as location shards, then runs the group-wide statistics reads (totals and the
+revenue-by-item breakdown) with app.sharding fan-out from several client
+threads and reports requests/s and latency per shard count.
+
+Usage:
+    python benchmarks/shard_scaling.py --orders 200000 --shards 1,2,4 --clients 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def build_shards(directory, shard_count, order_count, seed=42):
+    """
+    Create shard databases holding order_count orders in total
+
+    Returns:
+        dict: Location to SQLite URL
+    """
+    from sqlalchemy import insert, select, text
+    from tests.sample_data import sample_statements
+    from app.database import Base, create_db_engine
+    from app.models import Item, Order, OrderItem, Payment
+
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    urls = {}
+    for shard in range(shard_count):
+        location = f"site{shard + 1}"
+        urls[location] = f"sqlite:///{os.path.join(directory, f'{location}.db')}"
+        shard_engine = create_db_engine(urls[location])
+        Base.metadata.create_all(shard_engine)
+        with shard_engine.begin() as connection:
+            for statement in sample_statements():
+                connection.execute(text(statement))
+            item_ids = list(connection.execute(select(Item.item_id)).scalars())
+
+            # Orders are dealt round-robin so every shard holds an equal share
+            orders, items, payments = [], [], []
+            for n in range(shard, order_count, shard_count):
+                order_id = 100000 + n
+                order_date = start + timedelta(days=n * 1500 // max(order_count, 1))
+                orders.append({"order_id": order_id, "order_date": order_date,
+                               "order_status": "Completed", "location": location})
+                subtotal = Decimal("0")
+                for _ in range(rng.randint(1, 5)):
+                    price = Decimal(rng.choice(("3.50", "4.25", "8.00", "12.50", "15.75")))
+                    quantity = rng.randint(1, 3)
+                    subtotal += price * quantity
+                    items.append({"order_id": order_id, "item_id": rng.choice(item_ids), "size": None,
+                                  "price": price, "quantity": quantity, "total": price * quantity})
+                payments.append({"payment_id": order_id, "order_id": order_id, "payment_date": order_date,
+                                 "amount_due": subtotal, "tips": 0, "discount": 0, "total_paid": subtotal,
+                                 "payment_type": "Card", "payment_status": "Completed", "location": location})
+            connection.execute(insert(Order.__table__), orders)
+            connection.execute(insert(OrderItem.__table__), items)
+            connection.execute(insert(Payment.__table__), payments)
+        shard_engine.dispose()
+    return urls
+
+
+def group_statistics(db, location):
+    """Per-shard part of the group-wide statistics endpoints"""
+    from app import queries
+
+    return (
+        db.scalar(queries.TOTAL_ORDERS),
+        db.scalar(queries.TOTAL_REVENUE),
+        db.scalar(queries.TOTAL_PAYMENTS),
+        db.execute(queries.REVENUE_BREAKDOWN["item"]).all(),
+    )
+
+
+def measure(shard_router, clients, seconds):
+    """
+    Run fan-out statistics reads from several threads for a fixed time
+
+    Returns:
+        tuple: (requests, requests/s, mean latency ms, total orders seen)
+    """
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client():
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            shard_router.fan_out(group_statistics)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    shard_router.fan_out(group_statistics)  # Warm up connections and the compiled cache
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    total_orders = sum(result[0] for result in shard_router.fan_out(group_statistics).values())
+    return len(latencies), len(latencies) / wall, sum(latencies) / len(latencies) * 1000, total_orders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure group-wide read throughput as location shards are added")
+    parser.add_argument("--orders", type=int, default=100000, help="Synthetic orders across all shards")
+    parser.add_argument("--shards", default="1,2,4", help="Comma-separated shard counts to compare")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent client threads")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Measurement time per shard count")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'main.db')}"
+
+    from sqlalchemy.orm import sessionmaker
+    from app.database import create_db_engine
+    from app.sharding import ShardRouter
+
+    print("=" * 72)
+    print(f"SHARD SCALING BENCHMARK ({args.orders} orders, {args.clients} clients, {args.seconds:g}s each)")
+    print("=" * 72)
+    print(f"{'shards':>6}{'requests':>10}{'req/s':>10}{'mean latency':>15}{'speedup':>10}")
+    baseline = None
+    for shard_count in [int(value) for value in args.shards.split(",")]:
+        run_directory = os.path.join(directory, f"{shard_count}_shards")
+        os.makedirs(run_directory)
+        urls = build_shards(run_directory, shard_count, args.orders)
+
+        # First shard plays the main database, the rest come from SHARD_URLS
+        locations = list(urls)
+        main_engine = create_db_engine(urls[locations[0]])
+        shard_router = ShardRouter(
+            {location: urls[location] for location in locations[1:]},
+            default_engine=main_engine,
+            default_session_factory=sessionmaker(autocommit=False, autoflush=False, bind=main_engine)
+        )
+        requests, throughput, latency_ms, total_orders = measure(shard_router, args.clients, args.seconds)
+        shard_router.close()
+        main_engine.dispose()
+
+        baseline = baseline or throughput
+        print(f"{shard_count:>6}{requests:>10}{throughput:>10.1f}{latency_ms:>13.1f}ms{throughput / baseline:>9.2f}x")
+        # Every configuration must see the whole dataset (plus each shard's sample orders)
+        assert total_orders >= args.orders, f"{total_orders} orders visible, expected {args.orders}"
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Query Deadline Stand-In - Simulate slow queries locally and check cancellation
+Runs the API against a temporary SQLite database whose connections sleep every
+few hundred VM steps, then verifies that:
+
+1. A request past its deadline returns 504 quickly and frees its connection
+2. A client disconnect cancels the running statement
+3. The pool is healthy afterwards (normal requests still succeed)
+
+Usage:
+    python benchmarks/slow_query_standin.py --deadline 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check query deadlines against simulated slow queries")
+    parser.add_argument("--deadline", type=float, default=0.5, help="Deadline for /api/orders/complete/all")
+    parser.add_argument("--step-delay", type=float, default=0.01, help="Sleep per 100 SQLite VM steps")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'standin.db')}"
+    os.environ["QUERY_DEADLINE_ORDERS_COMPLETE"] = str(args.deadline)
+    os.environ["READ_MODEL_ENABLED"] = "False"
+    os.environ["ANALYTICS_MIRROR_ENABLED"] = "False"
+
+    from sqlalchemy import event
+    from tests.sample_data import seed
+    from app.database import engine
+    from app.main import app
+
+    seed()
+    slow = {"enabled": False}
+
+    @event.listens_for(engine, "connect")
+    def install_slow_handler(dbapi_connection, connection_record):
+        def handler():
+            if slow["enabled"]:
+                time.sleep(args.step_delay)
+            return 0
+        dbapi_connection.set_progress_handler(handler, 100)
+
+    engine.dispose()  # Reconnect so every pooled connection gets the handler
+
+    async def call(path, disconnect_after=None):
+        """Drive the ASGI app directly so a client disconnect can be simulated"""
+        sent = []
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            if disconnect_after is not None:
+                await asyncio.sleep(disconnect_after)
+            else:
+                await asyncio.sleep(3600)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "headers": [(b"host", b"standin")],
+            "client": ("127.0.0.1", 50000), "server": ("standin", 80),
+        }
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        elapsed = time.perf_counter() - started
+        status = next((m["status"] for m in sent if m["type"] == "http.response.start"), None)
+        return status, elapsed
+
+    async def scenario():
+        results = []
+        slow["enabled"] = True
+
+        status, elapsed = await call("/api/orders/complete/all")
+        results.append(("Deadline expiry returns 504", status == 504, f"{status} in {elapsed:.2f}s"))
+        results.append(("Connection returned to pool", engine.pool.checkedout() == 0,
+                        f"checked out: {engine.pool.checkedout()}"))
+
+        # Disconnect well before the deadline - the statement must stop then, not at the deadline
+        disconnect_after = args.deadline / 3
+        status, elapsed = await call("/api/orders/complete/all", disconnect_after=disconnect_after)
+        results.append(("Disconnect cancels statement", elapsed < args.deadline * 0.9,
+                        f"stopped {elapsed:.2f}s after start, client left at {disconnect_after:.2f}s"))
+        results.append(("Connection returned to pool", engine.pool.checkedout() == 0,
+                        f"checked out: {engine.pool.checkedout()}"))
+
+        slow["enabled"] = False
+        status, elapsed = await call("/api/orders/complete/all")
+        results.append(("Normal request still succeeds", status == 200, f"{status} in {elapsed:.2f}s"))
+        return results
+
+    results = asyncio.run(scenario())
+
+    print("=" * 60)
+    print("QUERY DEADLINE STAND-IN")
+    print("=" * 60)
+    for name, passed, detail in results:
+        print(f"{'✓ PASS' if passed else '✗ FAIL'}: {name} ({detail})")
+    return 0 if all(passed for _, passed, _ in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
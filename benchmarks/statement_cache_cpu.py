@@ -0,0 +1,126 @@
+"""
+Statement Cache CPU Benchmark - Per-request query overhead with and without
+the prebuilt statements in app/queries.py
+
+Seeds a temporary SQLite database with the sample data and measures CPU time
+(time.process_time) per simulated request for three variants:
+
+- inline:    db.query(...).options(...) rebuilt on every request (previous code)
+- prebuilt:  reusable select() constructs with bound parameters
+- no cache:  prebuilt statements with the compiled cache disabled (compile cost)
+
+Usage:
+    python benchmarks/statement_cache_cpu.py --requests 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure per-request CPU for inline vs prebuilt statements")
+    parser.add_argument("--requests", type=int, default=2000, help="Simulated requests per variant and shape")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'statement_cache.db')}"
+
+    from sqlalchemy import desc, func
+    from sqlalchemy.orm import Session, joinedload
+    from tests.sample_data import seed
+    from app import queries
+    from app.database import engine
+    from app.models import Order, OrderItem, Payment, Item
+
+    seed()
+    with Session(engine) as db:
+        order_ids = db.scalars(queries.ORDER_LIST[(False, False, False)]).all()
+        order_ids = [order.order_id for order in order_ids]
+
+    # ---------------- inline (previous) query construction ----------------
+
+    def inline_detail(db, order_id):
+        return db.query(Order).options(
+            joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.category),
+            joinedload(Order.order_items).joinedload(OrderItem.item).joinedload(Item.menu),
+            joinedload(Order.payments)
+        ).filter(Order.order_id == order_id).first()
+
+    def inline_summary(db, order_id):
+        return (
+            db.query(func.sum(OrderItem.total)).filter(OrderItem.order_id == order_id).scalar(),
+            db.query(func.sum(Payment.total_paid)).filter(
+                Payment.order_id == order_id,
+                Payment.payment_status == 'Completed'
+            ).scalar(),
+            db.query(func.count(OrderItem.id)).filter(OrderItem.order_id == order_id).scalar(),
+        )
+
+    def inline_list(db, order_id):
+        return db.query(Order).filter(Order.order_status == "Completed").order_by(
+            desc(Order.order_date), desc(Order.order_id)
+        ).all()
+
+    # ---------------- prebuilt statements ----------------
+
+    def prebuilt_detail(db, order_id):
+        return db.execute(queries.ORDER_DETAIL, {"order_id": order_id}).unique().scalar_one_or_none()
+
+    def prebuilt_summary(db, order_id):
+        params = {"order_id": order_id}
+        return (
+            db.scalar(queries.ORDER_ITEMS_TOTAL, params),
+            db.scalar(queries.ORDER_PAYMENTS_TOTAL, params),
+            db.scalar(queries.ORDER_ITEM_COUNT, params),
+        )
+
+    def prebuilt_list(db, order_id):
+        return db.scalars(queries.ORDER_LIST[(True, False, False)], {"status": "Completed"}).all()
+
+    shapes = {
+        "order detail": (inline_detail, prebuilt_detail),
+        "order summary aggregates": (inline_summary, prebuilt_summary),
+        "order list by status": (inline_list, prebuilt_list),
+    }
+    uncached_engine = engine.execution_options(compiled_cache=None)
+
+    def measure(function, bind):
+        with Session(bind) as db:
+            for order_id in order_ids[:10]:
+                function(db, order_id)  # Warm up the compiled cache
+        started = time.process_time()
+        for i in range(args.requests):
+            with Session(bind) as db:
+                function(db, order_ids[i % len(order_ids)])
+        return (time.process_time() - started) / args.requests * 1e6
+
+    print("=" * 72)
+    print("STATEMENT CACHE CPU BENCHMARK")
+    print("=" * 72)
+    print(f"{'Query shape':<28}{'inline':>12}{'prebuilt':>12}{'no cache':>12}{'saved':>8}")
+    queries.reset_cache_stats()
+    for name, (inline, prebuilt) in shapes.items():
+        inline_us = measure(inline, engine)
+        prebuilt_us = measure(prebuilt, engine)
+        uncached_us = measure(prebuilt, uncached_engine)
+        saved = (1 - prebuilt_us / inline_us) * 100
+        print(f"{name:<28}{inline_us:>10.1f}µs{prebuilt_us:>10.1f}µs{uncached_us:>10.1f}µs{saved:>7.1f}%")
+
+    print("-" * 72)
+    print("Compiled cache hit rate per query shape:")
+    report = queries.cache_report()
+    for shape, counts in report["shapes"].items():
+        hit_rate = f"{counts['hit_rate'] * 100:.1f}%" if counts["hit_rate"] is not None else "n/a"
+        print(f"  {shape:<26} executions={counts['executions']:<7} hit rate={hit_rate}")
+    print(f"Engine compiled cache: {report['compiled_cache_entries']}/{report['compiled_cache_capacity']} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
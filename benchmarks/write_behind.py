@@ -0,0 +1,167 @@
+"""
+Write-Behind Benchmark - POS write throughput with a commit per request versus the batching queue
+
+Simulates POS terminals posting orders, order lines and payments against a
+temporary SQLite database, two ways:
+
+- direct: each write is its own transaction, committed before the next one
+          (app.write_queue.apply_write, the default write path)
+- queued: each write goes through app.write_queue (durable log append, then
+          grouped transactions from the flusher thread)
+
+and reports writes/s, acknowledgement latency and the number of database
+commits each mode needed.
+
+Usage:
+    python benchmarks/write_behind.py --orders 2000 --terminals 8
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def pos_writes(order_count, item_ids, first_order_id, seed=11):
+    """
+    Writes for order_count tickets: the order, 1-4 lines, then the payment
+
+    Returns:
+        list: Per-ticket lists of (operation, payload) in the order a terminal sends them
+    """
+    rng = random.Random(seed)
+    tickets = []
+    for n in range(order_count):
+        order_id = first_order_id + n
+        writes = [("create_order", {"order_id": order_id, "order_date": "2024-06-01", "order_status": "Pending"})]
+        subtotal = 0
+        for _ in range(rng.randint(1, 4)):
+            price = rng.choice((350, 425, 800, 1250))
+            quantity = rng.randint(1, 3)
+            subtotal += price * quantity
+            writes.append(("add_order_item", {
+                "order_id": order_id, "item_id": rng.choice(item_ids), "size": None,
+                "price": f"{price / 100:.2f}", "quantity": quantity, "total": f"{price * quantity / 100:.2f}",
+            }))
+        writes.append(("create_payment", {
+            "payment_id": order_id, "order_id": order_id, "payment_date": "2024-06-01",
+            "amount_due": f"{subtotal / 100:.2f}", "tips": "0.00", "discount": "0.00",
+            "total_paid": f"{subtotal / 100:.2f}", "payment_type": "Card", "payment_status": "Completed",
+        }))
+        tickets.append(writes)
+    return tickets
+
+
+def run_terminals(tickets, terminals, write):
+    """
+    Send tickets from several terminal threads; each terminal waits for every acknowledgement
+
+    Returns:
+        tuple: (acknowledgement latencies in ms, wall seconds)
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def terminal(share):
+        local = []
+        for writes in share:
+            for operation, payload in writes:
+                started = time.perf_counter()
+                write(operation, payload)
+                local.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=terminal, args=(tickets[n::terminals],)) for n in range(terminals)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-request commits with the write-behind queue")
+    parser.add_argument("--orders", type=int, default=2000, help="Tickets per mode")
+    parser.add_argument("--terminals", type=int, default=8, help="Concurrent POS terminals")
+    parser.add_argument("--no-fsync", action="store_true", help="Skip fsync of the write log")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp()
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'write_behind.db')}",
+        "WRITE_LOG_DIR": os.path.join(directory, "write_log"),
+        "READ_MODEL_ENABLED": "False",
+        "ANALYTICS_MIRROR_ENABLED": "False",
+    })
+
+    from sqlalchemy import event, func, select
+    from tests.sample_data import seed
+    from app import write_queue
+    from app.database import engine
+    from app.models import Item, Order
+
+    seed()
+    with engine.connect() as connection:
+        item_ids = list(connection.execute(select(Item.item_id)).scalars())
+
+    commits = [0]
+    event.listen(engine, "commit", lambda connection: commits.__setitem__(0, commits[0] + 1))
+
+    print("=" * 72)
+    print(f"WRITE-BEHIND BENCHMARK ({args.orders} tickets per mode, {args.terminals} terminals)")
+    print("=" * 72)
+    print(f"{'mode':<8}{'writes':>8}{'writes/s':>11}{'p50 ack':>11}{'p99 ack':>11}{'commits':>9}")
+
+    def report(mode, latencies, wall, commit_count):
+        print(f"{mode:<8}{len(latencies):>8}{len(latencies) / wall:>11.0f}"
+              f"{percentile(latencies, 0.5):>9.2f}ms{percentile(latencies, 0.99):>9.2f}ms{commit_count:>9}")
+
+    # Direct: one transaction per request, what the endpoints do when WRITE_QUEUE_ENABLED is off
+    keys = iter(range(10 ** 9))
+
+    def direct_write(operation, payload):
+        write_queue.apply_write(operation, payload, f"bench-{next(keys)}")
+
+    commits[0] = 0
+    latencies, wall = run_terminals(pos_writes(args.orders, item_ids, 200000), args.terminals, direct_write)
+    report("direct", latencies, wall, commits[0])
+
+    # Queued: acknowledged after the log fsync, applied in batches
+    queue = write_queue.WriteQueue(fsync=not args.no_fsync)
+    queue.open()
+    queue.start()
+
+    def queued_write(operation, payload):
+        queue.submit(operation, payload, f"bench-{next(keys)}")
+
+    commits[0] = 0
+    started = time.perf_counter()
+    latencies, wall = run_terminals(pos_writes(args.orders, item_ids, 300000), args.terminals, queued_write)
+    queue.stop()
+    applied_wall = time.perf_counter() - started
+    report("queued", latencies, wall, commits[0])
+
+    status = queue.status()
+    print(f"\nqueued: {status['applied']} applied, {status['rejected']} rejected in {status['flushes']} batches "
+          f"(avg {status['avg_batch_size']}), all applied after {applied_wall:.2f}s")
+    with engine.connect() as connection:
+        queued_orders = connection.execute(select(func.count()).where(Order.order_id >= 300000)).scalar()
+    assert queued_orders == args.orders, f"{queued_orders} queued orders in the database, expected {args.orders}"
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
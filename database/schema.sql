@@ -76,6 +76,7 @@ CREATE TABLE orders (
     order_id INT PRIMARY KEY,
     order_date DATE NOT NULL,
     order_status NVARCHAR(50) DEFAULT 'Pending',
+    location NVARCHAR(50) NOT NULL DEFAULT 'main', -- Restaurant site (DEFAULT_LOCATION)
     created_at DATETIME DEFAULT GETDATE(),
     updated_at DATETIME DEFAULT GETDATE()
 );
@@ -109,11 +110,114 @@ CREATE TABLE payments (
     total_paid DECIMAL(10, 2) NOT NULL,
     payment_type NVARCHAR(50) NOT NULL, -- 'Cash', 'Card'
     payment_status NVARCHAR(50) DEFAULT 'Pending',
+    location NVARCHAR(50) NOT NULL DEFAULT 'main',
     created_at DATETIME DEFAULT GETDATE(),
     updated_at DATETIME DEFAULT GETDATE(),
     FOREIGN KEY (order_id) REFERENCES orders(order_id)
 );
 
+-- ================================================================
+-- ARCHIVE TABLES (written by: python -m app.archive)
+-- ================================================================
+
+-- Closed orders older than the archive horizon
+CREATE TABLE orders_archive (
+    order_id INT PRIMARY KEY,
+    order_date DATE NOT NULL,
+    order_status NVARCHAR(50) NULL,
+    location NVARCHAR(50) NOT NULL DEFAULT 'main',
+    created_at DATETIME NULL,
+    updated_at DATETIME NULL,
+    archived_at DATETIME NOT NULL
+);
+
+CREATE TABLE order_items_archive (
+    id INT PRIMARY KEY,
+    order_id INT NOT NULL,
+    item_id INT NOT NULL,
+    size NVARCHAR(20) NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    quantity INT NOT NULL,
+    total DECIMAL(10, 2) NOT NULL,
+    created_at DATETIME NULL,
+    FOREIGN KEY (order_id) REFERENCES orders_archive(order_id),
+    FOREIGN KEY (item_id) REFERENCES items(item_id)
+);
+
+CREATE TABLE payments_archive (
+    payment_id INT PRIMARY KEY,
+    order_id INT NOT NULL,
+    payment_date DATE NOT NULL,
+    amount_due DECIMAL(10, 2) NOT NULL,
+    tips DECIMAL(10, 2) NULL,
+    discount DECIMAL(10, 2) NULL,
+    total_paid DECIMAL(10, 2) NOT NULL,
+    payment_type NVARCHAR(50) NOT NULL,
+    payment_status NVARCHAR(50) NULL,
+    location NVARCHAR(50) NOT NULL DEFAULT 'main',
+    created_at DATETIME NULL,
+    updated_at DATETIME NULL,
+    FOREIGN KEY (order_id) REFERENCES orders_archive(order_id)
+);
+
+-- Running totals of archived orders (single row, id = 1)
+CREATE TABLE archive_totals (
+    id INT PRIMARY KEY,
+    total_orders BIGINT NOT NULL DEFAULT 0,
+    total_revenue DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    total_payments_received DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT GETDATE()
+);
+
+-- Running revenue of archived orders per revenue breakdown dimension value
+CREATE TABLE archive_revenue_totals (
+    dimension NVARCHAR(20) NOT NULL,
+    dimension_value NVARCHAR(100) NOT NULL,
+    revenue DECIMAL(18, 2) NOT NULL DEFAULT 0,
+    quantity BIGINT NOT NULL DEFAULT 0,
+    line_items BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT GETDATE(),
+    PRIMARY KEY (dimension, dimension_value)
+);
+
+-- ================================================================
+-- DATA QUALITY TABLES
+-- ================================================================
+
+-- Reconciliation issues (written by: python -m app.reconciliation)
+CREATE TABLE reconciliation_issues (
+    id INT PRIMARY KEY IDENTITY(1,1),
+    run_id NVARCHAR(32) NOT NULL,
+    anomaly_type NVARCHAR(50) NOT NULL,
+    order_id INT NULL,
+    payment_id INT NULL,
+    order_item_id INT NULL,
+    expected_value DECIMAL(12, 4) NULL,
+    actual_value DECIMAL(12, 4) NULL,
+    created_at DATETIME DEFAULT GETDATE()
+);
+
+-- Bulk loader resume state (written by: python -m app.loader)
+CREATE TABLE load_checkpoints (
+    load_key NVARCHAR(400) PRIMARY KEY,
+    fingerprint NVARCHAR(100) NULL,
+    rows_done BIGINT NOT NULL DEFAULT 0,
+    completed BIT NOT NULL DEFAULT 0,
+    detail NVARCHAR(MAX) NULL,
+    updated_at DATETIME DEFAULT GETDATE()
+);
+
+-- Write idempotency keys (write-behind queue outcomes, see app/write_queue.py)
+CREATE TABLE write_idempotency_keys (
+    idempotency_key NVARCHAR(100) PRIMARY KEY,
+    operation NVARCHAR(30) NOT NULL,
+    fingerprint NVARCHAR(40) NOT NULL,
+    sequence BIGINT NOT NULL,
+    status NVARCHAR(20) NOT NULL, -- 'applied', 'rejected'
+    error NVARCHAR(MAX) NULL,
+    created_at DATETIME DEFAULT GETDATE()
+);
+
 -- ================================================================
 -- INDEXES FOR PERFORMANCE
 -- ================================================================
@@ -135,6 +239,17 @@ CREATE INDEX idx_payments_status ON payments(payment_status);
 CREATE INDEX idx_item_prices_item_id ON item_prices(item_id);
 CREATE INDEX idx_item_prices_active ON item_prices(is_active);
 
+-- Archive indexes
+CREATE INDEX idx_orders_archive_date ON orders_archive(order_date);
+CREATE INDEX idx_orders_archive_archived_at ON orders_archive(archived_at);
+CREATE INDEX idx_order_items_archive_order_id ON order_items_archive(order_id);
+CREATE INDEX idx_payments_archive_order_id ON payments_archive(order_id);
+
+-- Reconciliation indexes
+CREATE INDEX idx_reconciliation_run ON reconciliation_issues(run_id);
+CREATE INDEX idx_reconciliation_type ON reconciliation_issues(anomaly_type);
+CREATE INDEX idx_reconciliation_order ON reconciliation_issues(order_id);
+
 GO
 
 PRINT 'Database schema created successfully!';
@@ -19,11 +19,15 @@ def test_imports():
         ('fastapi', 'FastAPI'),
         ('uvicorn', 'Uvicorn'),
         ('sqlalchemy', 'SQLAlchemy'),
-        ('pyodbc', 'PyODBC'),
         ('pydantic', 'Pydantic'),
         ('dotenv', 'python-dotenv')
     ]
     
+    # pyodbc is only needed for SQL Server (the default when DATABASE_URL is unset)
+    database_url = os.getenv("DATABASE_URL", "")
+    if not database_url or database_url.startswith("mssql"):
+        packages.append(('pyodbc', 'PyODBC'))
+    
     failed = []
     for package, name in packages:
         try:
@@ -0,0 +1,52 @@
+"""
+Test configuration - every test runs against a temporary SQLite database
+
+The environment is set before any app module is imported, because the
+modules read their configuration at import time.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_DIRECTORY = tempfile.mkdtemp(prefix="restaurant-api-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_DIRECTORY, 'test.db')}",
+    "SHARD_URLS": "",
+    "READ_MODEL_ENABLED": "False",
+    "ANALYTICS_MIRROR_ENABLED": "False",
+    "ARCHIVE_ENABLED": "False",
+    "SEARCH_INDEX_ENABLED": "False",
+    "WRITE_QUEUE_ENABLED": "False",
+    "RESPONSE_CACHE_ENABLED": "False",
+    "WRITE_LOG_DIR": os.path.join(_DIRECTORY, "write_log"),
+    "STARTUP_DB_CHECK": "False",
+})
+
+
+@pytest.fixture
+def database():
+    """Fresh schema with database/sample_data.sql loaded; yields the engine"""
+    from tests.sample_data import seed
+    from app.database import get_engine
+
+    seed()
+    return get_engine()
+
+
+@pytest.fixture
+def airport(database, tmp_path, monkeypatch):
+    """An empty 'airport' shard next to the seeded main database; yields the router"""
+    from app import deadlines, sharding
+
+    router = sharding.ShardRouter({"airport": f"sqlite:///{tmp_path / 'airport.db'}"})
+    monkeypatch.setattr(sharding, "router", router)
+    monkeypatch.setattr(deadlines, "router", router)
+    sharding.init_shards(router)
+    yield router
+    router.close()
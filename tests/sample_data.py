@@ -0,0 +1,92 @@
+"""
+Sample Data - Load database/sample_data.sql into a scratch database
+
+Used by the test fixtures, the parity test and the benchmarks. Seeding drops
+every table first, so it refuses to run against a database that does not look
+like a scratch one (SQLite in memory or under the temp directory, or a
+database name containing test, scratch or parity) unless PARITY_ALLOW_DROP=True.
+"""
+
+import os
+import re
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_DATA = os.path.join(ROOT, "database", "sample_data.sql")
+
+SCRATCH_NAME = re.compile(r"test|scratch|parity", re.IGNORECASE)
+
+
+def sample_statements():
+    """Portable INSERT statements from database/sample_data.sql"""
+    with open(SAMPLE_DATA, encoding="utf-8") as f:
+        sql = f.read().split("-- DATA VERIFICATION")[0]
+    statements = []
+    for chunk in sql.split(";"):
+        lines = [
+            line for line in chunk.splitlines()
+            if line.strip()
+            and not line.strip().startswith("--")
+            and line.strip() != "GO"
+            and not line.strip().upper().startswith("USE ")
+        ]
+        statement = "\n".join(lines).strip()
+        if statement.upper().startswith("INSERT"):
+            statements.append(statement)
+    return statements
+
+
+def is_scratch_database(url):
+    """
+    Check whether a database may be dropped and re-seeded
+
+    Args:
+        url: SQLAlchemy URL (string or URL object)
+
+    Returns:
+        bool: True for in-memory SQLite, SQLite files under the temp directory
+        and databases whose name contains test, scratch or parity
+    """
+    from sqlalchemy.engine import make_url
+
+    url = make_url(url)
+    database = url.database or ""
+    if url.get_backend_name() == "sqlite":
+        if database in ("", ":memory:"):
+            return True
+        path = os.path.realpath(database)
+        if path.startswith(os.path.realpath(tempfile.gettempdir()) + os.sep):
+            return True
+        database = os.path.basename(path)
+    return bool(SCRATCH_NAME.search(database))
+
+
+def seed(allow_drop=None):
+    """
+    Create tables and load the sample data into DATABASE_URL
+
+    Args:
+        allow_drop: Drop the tables even if DATABASE_URL is not a scratch
+            database (defaults to the PARITY_ALLOW_DROP environment variable)
+
+    Raises:
+        RuntimeError: DATABASE_URL is not a scratch database and dropping was not allowed
+    """
+    from sqlalchemy import text
+    from app.database import Base, engine
+    import app.models  # noqa: F401 - register tables on Base
+
+    if allow_drop is None:
+        allow_drop = os.getenv("PARITY_ALLOW_DROP", "False").lower() == "true"
+    if not allow_drop and not is_scratch_database(engine.url):
+        raise RuntimeError(
+            f"Refusing to drop the tables of {engine.url.render_as_string(hide_password=True)}: "
+            "not a scratch database (set PARITY_ALLOW_DROP=True to seed it anyway)"
+        )
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for statement in sample_statements():
+            connection.execute(text(statement))
@@ -0,0 +1,27 @@
+"""
+Admission control - which endpoint class a request is limited by
+"""
+
+import pytest
+
+from app.admission import classify
+
+
+@pytest.mark.parametrize("method, path, name", [
+    ("GET", "/api/orders/10", "lookup"),
+    ("GET", "/api/search/orders", "lookup"),
+    ("GET", "/api/jobs/abc/result", "lookup"),
+    ("GET", "/api/writes/pay-1", "lookup"),
+    ("GET", "/api/orders", "list"),
+    ("POST", "/api/orders", "write"),
+    ("POST", "/api/orders/10/items", "write"),
+    ("PATCH", "/api/payments/101", "write"),
+    ("POST", "/api/jobs", "write"),
+    ("POST", "/api/reconciliation/run", "report"),
+])
+def test_routes_are_classified(method, path, name):
+    assert classify(method, path).name == name
+
+
+def test_job_event_stream_is_not_limited():
+    assert classify("GET", "/api/jobs/abc/events") is None
@@ -0,0 +1,126 @@
+"""
+Analytics mirror - edited, deleted and late-committed line items reach the mirror,
+and queries are answered while a sync reads the database
+"""
+
+import threading
+import time
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import delete, func, insert, select, update
+
+from app.models import Order, OrderItem
+
+pytest.importorskip("duckdb")
+
+from app.analytics import AnalyticsMirror  # noqa: E402
+
+
+def mirrored_lines(mirror, order_id):
+    return mirror.connection.execute(
+        "SELECT id, quantity, total FROM order_items WHERE order_id = ? ORDER BY id", [order_id]
+    ).fetchall()
+
+
+def test_lines_of_a_touched_order_are_replaced(database):
+    mirror = AnalyticsMirror(path=":memory:")
+    mirror.sync()
+    first, second = mirrored_lines(mirror, 10)[:2]
+
+    with database.begin() as connection:
+        connection.execute(update(OrderItem).where(OrderItem.id == first[0]).values(quantity=7, total=70))
+        connection.execute(delete(OrderItem).where(OrderItem.id == second[0]))
+        connection.execute(update(Order).where(Order.order_id == 10).values(order_status="Refunded"))
+    copied = mirror.sync()
+
+    lines = mirrored_lines(mirror, 10)
+    assert copied["order_items_replaced"] == len(lines)
+    assert (first[0], 7, 70) in lines
+    assert second[0] not in [line[0] for line in lines]
+
+
+def test_deleted_rows_are_swept(database):
+    mirror = AnalyticsMirror(path=":memory:", sweep_syncs=3)
+    mirror.sync()
+    line_id = mirrored_lines(mirror, 11)[0][0]
+
+    with database.begin() as connection:
+        connection.execute(delete(OrderItem).where(OrderItem.id == line_id))  # Order not touched
+    assert "deleted" not in mirror.sync()
+    assert mirror.sync()["deleted"] == 1
+    assert line_id not in [line[0] for line in mirrored_lines(mirror, 11)]
+
+
+def add_line(database, offset, order_id=10):
+    with database.begin() as connection:
+        line_id = connection.scalar(select(func.max(OrderItem.id))) + offset
+        connection.execute(insert(OrderItem), {
+            "id": line_id, "order_id": order_id, "item_id": 9, "price": Decimal("2.00"),
+            "quantity": 1, "total": Decimal("2.00"),
+        })
+    return line_id
+
+
+def test_line_committed_late_under_a_lower_id_is_copied(database):
+    mirror = AnalyticsMirror(path=":memory:")
+    mirror.sync()
+    newest = add_line(database, 10)
+    mirror.sync()
+
+    late = add_line(database, -5, order_id=15)  # Id taken before the newest line, committed after it
+    assert mirror.sync()["order_items"] == 1
+    assert late in [line[0] for line in mirrored_lines(mirror, 15)]
+    assert mirror.sync()["order_items"] == 0
+    assert [line[0] for line in mirrored_lines(mirror, 10)].count(newest) == 1
+
+
+def test_sweep_copies_rows_missing_from_the_mirror(database):
+    mirror = AnalyticsMirror(path=":memory:", sweep_syncs=2)
+    mirror.sync()
+    add_line(database, 10)
+    mirror._lines.window = 0  # Nothing below the highest id is read again
+    mirror.sync()
+    mirror.sync()
+
+    late = add_line(database, -5, order_id=15)
+    copied = mirror.sync()
+    assert copied["backfilled"] == 1
+    assert late in [line[0] for line in mirrored_lines(mirror, 15)]
+
+
+def test_queries_are_answered_while_a_sync_reads(database):
+    mirror = AnalyticsMirror(path=":memory:")
+    mirror.sync()
+    before = mirror.statistics()
+    reading, release = threading.Event(), threading.Event()
+    factory = mirror.session_factory
+
+    def slow_session():
+        db = factory()
+        execute = db.execute
+
+        def slow_execute(*args, **kwargs):
+            reading.set()
+            release.wait(5)
+            return execute(*args, **kwargs)
+
+        db.execute = slow_execute
+        return db
+
+    mirror.session_factory = slow_session
+    sync = threading.Thread(target=mirror.sync)
+    sync.start()
+    try:
+        assert reading.wait(5)
+        asked = time.monotonic()
+        assert mirror.statistics() == before
+        assert time.monotonic() - asked < 1
+        assert mirror.revenue_breakdown("item")
+        time.sleep(0.2)
+    finally:
+        release.set()
+        sync.join(5)
+
+    # The lag counts from when the sync started reading
+    assert mirror.freshness()["lag_seconds"] >= 0.2
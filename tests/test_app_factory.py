@@ -0,0 +1,52 @@
+"""
+Application factory - lazy imports, optional API docs and the uvicorn --factory target
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from benchmarks.cold_start import first_response_seconds
+from tests.sample_data import ROOT
+
+IMPORT_CHECK = """
+import sys
+import sqlalchemy
+
+created = []
+create_engine = sqlalchemy.create_engine
+sqlalchemy.create_engine = lambda *args, **kwargs: created.append(args) or create_engine(*args, **kwargs)
+
+import app.main
+from app import database
+
+print(len(created), database._engine is not None, *sorted({"pyodbc", "numpy", "duckdb"} & set(sys.modules)))
+"""
+
+
+def test_importing_the_app_creates_no_engine_and_skips_heavy_imports():
+    completed = subprocess.run(
+        [sys.executable, "-c", IMPORT_CHECK], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+    assert completed.stdout.split() == ["0", "False"]
+
+
+@pytest.mark.parametrize("enabled, expected", [(True, 200), (False, 404)])
+def test_api_docs_can_be_disabled(enabled, expected, monkeypatch):
+    monkeypatch.setattr(main, "API_DOCS_ENABLED", enabled)
+    client = TestClient(main.create_app())
+
+    for path in ("/docs", "/redoc", "/openapi.json"):
+        assert client.get(path).status_code == expected
+    assert client.get("/health").status_code == 200
+
+
+def test_create_app_is_a_uvicorn_factory_target(database, tmp_path):
+    env = {**os.environ, "WRITE_LOG_DIR": str(tmp_path / "write_log"), "JOB_RESULT_DIR": str(tmp_path / "jobs")}
+
+    assert first_response_seconds(ROOT, env, "/api/orders/10", timeout=30, factory=True) > 0
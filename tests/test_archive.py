@@ -0,0 +1,96 @@
+"""
+Archive - every location is archived, and reports include archived orders
+"""
+
+from datetime import date, datetime
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+
+from app import archive, sharding
+from app.database import get_session_factory
+from app.main import app
+from app.models import ArchivedOrder, Order
+
+HORIZON_DAYS = (date.today() - date(2025, 10, 3)).days  # Seeded orders dated before 2025-10-03
+
+
+def add_order(order_id, location="airport"):
+    with sharding.router.engine_for(location).begin() as connection:
+        connection.execute(insert(Order), {
+            "order_id": order_id, "order_date": date(2025, 10, 1), "order_status": "Completed", "location": location,
+        })
+
+
+def archived_ids(location):
+    with sharding.router.engine_for(location).connect() as connection:
+        return set(connection.scalars(select(ArchivedOrder.order_id)))
+
+
+def test_archiver_works_through_every_location(airport):
+    add_order(424242)
+    runner = archive.Archiver(horizon_days=HORIZON_DAYS)
+    assert runner.eligible_count() > 1
+
+    stats = runner.run()
+    assert stats["locations"]["airport"]["orders"] == 1
+    assert stats["locations"]["main"]["orders"] == stats["rows"]["orders"] - 1
+    assert archived_ids("airport") == {424242}
+    assert archived_ids("main") and runner.eligible_count() == 0
+
+
+def test_reports_include_archived_orders(database):
+    client = TestClient(app)
+    paths = [
+        "/api/orders/complete/all?start_date=2025-10-01&end_date=2025-10-05",
+        "/api/statistics/overview",
+    ] + [f"/api/statistics/revenue?group_by={group_by}" for group_by in ("date", "item", "category", "menu")]
+    before = {path: client.get(path).json() for path in paths}
+    archive.Archiver(horizon_days=HORIZON_DAYS).run()
+    assert archived_ids("main")
+
+    for path, response in before.items():
+        assert client.get(path).json() == response
+
+    # Without a date range the main report reads active orders only
+    active = {order["order_id"] for order in client.get("/api/orders/complete/all").json()}
+    assert active and not active & archived_ids("main")
+
+
+def test_failed_order_does_not_block_the_rest_of_its_batch(database):
+    # An order already in the archive cannot be archived again
+    with database.begin() as connection:
+        connection.execute(insert(ArchivedOrder), {
+            "order_id": 10, "order_date": date(2025, 10, 1), "order_status": "Completed", "archived_at": datetime.now(),
+        })
+    runner = archive.Archiver(horizon_days=HORIZON_DAYS)
+    eligible = runner.eligible_count()
+
+    stats = runner.run()
+    assert [failed["order_id"] for failed in stats["failed_orders"]] == [10]
+    assert stats["rows"]["orders"] == eligible - 1
+    assert runner.eligible_count() == 1
+    with get_session_factory()() as db:
+        assert archive.archive_totals(db)["total_orders"] == eligible - 1
+
+
+def test_malformed_dates_are_rejected(database):
+    client = TestClient(app)
+    assert client.get("/api/orders?start_date=2025-13-01").status_code == 422
+    assert client.get("/api/orders?date=yesterday").status_code == 422
+    assert client.get("/api/orders/complete/all?end_date=10/05/2025").status_code == 422
+
+
+def test_sqlite_has_no_shared_load_signal(database):
+    assert archive.database_load(database) is None
+
+
+def test_revenue_totals_can_be_rebuilt_from_the_archive(database):
+    archive.Archiver(horizon_days=HORIZON_DAYS).run()
+    with get_session_factory()() as db:
+        maintained = {group_by: archive.archived_revenue(db, group_by) for group_by in ("date", "item", "menu")}
+    with database.begin() as connection:
+        assert archive.rebuild_revenue_totals(connection)
+    with get_session_factory()() as db:
+        assert {group_by: archive.archived_revenue(db, group_by) for group_by in maintained} == maintained
+    assert maintained["date"] and all(isinstance(row["key"], date) for row in maintained["date"])
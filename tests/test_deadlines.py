@@ -0,0 +1,18 @@
+"""
+Query deadlines - which requests get one
+"""
+
+from app.deadlines import deadline_for
+
+
+def test_reads_get_their_route_deadline():
+    assert deadline_for("GET", "/api/orders/10") == 5.0
+    assert deadline_for("GET", "/api/search/orders") == 30.0
+    assert deadline_for("POST", "/api/reconciliation/run") == 300.0
+
+
+def test_writes_and_job_routes_have_no_deadline():
+    assert deadline_for("POST", "/api/orders") is None
+    assert deadline_for("PATCH", "/api/payments/101") is None
+    assert deadline_for("GET", "/api/jobs/abc/events") is None
+    assert deadline_for("GET", "/api/jobs") is None
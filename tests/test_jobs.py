@@ -0,0 +1,54 @@
+"""
+Report jobs - jobs of a worker that died fail, and expiry reads only old files
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from app import jobs
+
+
+@pytest.fixture
+def result_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_RESULT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def stored(job_id, status, age, **fields):
+    job = {
+        "job_id": job_id, "report": "statistics", "params": {}, "cache_key": "k" + job_id, "status": status,
+        "created_at": datetime.now().isoformat(), "owner_pid": 1, **fields,
+    }
+    path = jobs.job_path(job_id, ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(job, f)
+    modified_at = time.time() - age
+    os.utime(path, (modified_at, modified_at))
+    return path
+
+
+def test_job_without_a_heartbeat_fails(result_dir):
+    stored("a" * 32, "running", age=jobs.JOB_STALE_SECONDS + 1)
+    stored("b" * 32, "running", age=1)
+    assert jobs.load_job("a" * 32)["status"] == "failed"
+    assert "stopped before the job finished" in jobs.load_job("a" * 32)["error"]
+    assert jobs.load_job("b" * 32)["status"] == "running"
+
+
+def test_expiry_removes_old_finished_jobs_only(result_dir):
+    ttl = 60
+    old = datetime.fromtimestamp(time.time() - ttl - 1).isoformat()
+    expired = stored("c" * 32, "done", age=ttl + 1, finished_at=old)
+    fresh = stored("d" * 32, "done", age=1, finished_at=datetime.now().isoformat())
+    orphaned = stored("e" * 32, "queued", age=ttl + 1)
+
+    runner = jobs.JobRunner(result_ttl=ttl)
+    runner._expire()
+    assert not os.path.exists(expired)
+    assert os.path.exists(fresh)
+    assert jobs.load_job("e" * 32)["status"] == "failed"  # Failed now, expires a TTL later
+    assert os.path.exists(orphaned)
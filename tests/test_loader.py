@@ -0,0 +1,92 @@
+"""
+Bulk loader - interrupted loads resume from their checkpoint without duplicates,
+and indexes dropped by an interrupted load are rebuilt on the next run
+"""
+
+import pytest
+from sqlalchemy import func, inspect, select
+
+from app import loader
+from app.loader import INDEX_CHECKPOINT_KEY, KeyIndex, LoadError, load_file, run_load
+from app.models import LoadCheckpoint, Order
+
+ORDER_IDS = range(1000, 1007)
+
+
+def write_orders(path, order_ids=ORDER_IDS):
+    lines = ["order_id,order_date,order_status"]
+    lines += [f"{order_id},2024-06-01,Completed" for order_id in order_ids]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def loaded_ids(engine):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(Order.order_id).where(Order.order_id >= ORDER_IDS[0]).order_by(Order.order_id)
+        ).scalars().all()
+
+
+def keys(engine):
+    with engine.connect() as connection:
+        return KeyIndex.load(connection)
+
+
+def test_interrupted_load_resumes_from_the_checkpoint(database, tmp_path, monkeypatch):
+    path = write_orders(tmp_path / "orders.csv")
+    model, convert = loader.TABLES["orders"]
+    seen = []
+
+    def crash_on_fourth(record, index):
+        seen.append(record)
+        if len(seen) == 4:
+            raise RuntimeError("worker died")
+        return convert(record, index)
+
+    monkeypatch.setitem(loader.TABLES, "orders", (model, crash_on_fourth))
+    with pytest.raises(RuntimeError):
+        load_file("orders", path, keys(database), chunk_size=2)
+    # Only the committed chunk survived, together with its checkpoint
+    assert loaded_ids(database) == [1000, 1001]
+
+    monkeypatch.setitem(loader.TABLES, "orders", (model, convert))
+    stats = load_file("orders", path, keys(database), chunk_size=2)
+    assert (stats.skipped, stats.loaded, stats.rejected) == (2, 5, 0)
+    assert loaded_ids(database) == list(ORDER_IDS)
+
+    # A completed file is not read again
+    assert load_file("orders", path, keys(database), chunk_size=2).already_complete
+
+
+def test_changed_file_does_not_resume_an_old_checkpoint(database, tmp_path):
+    path = write_orders(tmp_path / "orders.csv", ORDER_IDS[:3])
+    load_file("orders", path, keys(database))
+    write_orders(tmp_path / "orders.csv")
+
+    with pytest.raises(LoadError, match="changed since its checkpoint"):
+        load_file("orders", path, keys(database))
+
+    # --restart reloads from the start; rows already present are rejected as duplicates
+    stats = load_file("orders", path, keys(database), restart=True)
+    assert (stats.loaded, stats.rejected) == (4, 3)
+    assert loaded_ids(database) == list(ORDER_IDS)
+
+
+def test_indexes_dropped_by_an_interrupted_load_are_rebuilt(database, tmp_path):
+    def order_indexes():
+        return {index["name"] for index in inspect(database).get_indexes("order_items")}
+
+    before = order_indexes()
+    assert before
+    loader.disable_indexes(["order_items"], database)
+    assert not order_indexes()
+
+    # The next run rebuilds them even though it would keep indexes for a small input
+    path = write_orders(tmp_path / "orders.csv")
+    run_load({"orders": path}, index_mode="keep", rejects_path=str(tmp_path / "rejects.ndjson"))
+    assert order_indexes() == before
+    with database.connect() as connection:
+        assert connection.execute(
+            select(func.count()).select_from(LoadCheckpoint).where(LoadCheckpoint.load_key == INDEX_CHECKPOINT_KEY)
+        ).scalar() == 0
+    assert loaded_ids(database) == list(ORDER_IDS)
@@ -0,0 +1,134 @@
+"""
+Request profiling - opt-in capture, access control and one profile at a time
+"""
+
+import asyncio
+import os
+import pstats
+
+import httpx
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app import profiling
+
+KEY = {"X-Profile-Key": "secret"}
+PROFILE = {"X-Profile": "1", **KEY}
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    """Profiling enabled with a secret key, storing profiles under tmp_path"""
+    directory = tmp_path / "profiles"
+    monkeypatch.setattr(profiling, "PROFILE_SECRET_KEY", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(directory))
+    return directory
+
+
+@pytest.fixture
+def client(database, profile_dir):
+    from app.main import create_app
+
+    return TestClient(create_app())
+
+
+def endpoint_work():
+    return sum(range(1000))
+
+
+def neighbour_work():
+    return sum(range(1000))
+
+
+def profiled_app(release=None):
+    """An app whose endpoints go through ProfiledRoute"""
+    router = APIRouter(route_class=profiling.ProfiledRoute)
+
+    @router.get("/async")
+    async def async_endpoint():
+        endpoint_work()
+        if release is not None:
+            await release.wait()
+        await asyncio.sleep(0.05)
+        endpoint_work()
+        return {"ok": True}
+
+    @router.get("/sync")
+    def sync_endpoint():
+        return {"total": endpoint_work()}
+
+    application = FastAPI()
+    application.include_router(router)
+    application.add_middleware(profiling.ProfilingMiddleware)
+    return application
+
+
+def profiled_functions(profile_id):
+    stats = pstats.Stats(profiling.profile_path(profile_id, ".prof"))
+    return {name for _, _, name in stats.stats}
+
+
+def test_profiled_request_stores_its_sql(client):
+    response = client.get("/api/orders/10", headers=PROFILE)
+
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    profile = client.get(f"/api/profiles/{profile_id}", headers=KEY).json()["data"]
+    assert profile["path"] == "/api/orders/10"
+    assert profile["status_code"] == 200
+    assert profile["sql_count"] == len(profile["sql"]) > 0
+    assert any("orders" in query["statement"].lower() for query in profile["sql"])
+    assert client.get(f"/api/profiles/{profile_id}/download", headers=KEY).status_code == 200
+
+
+def test_unauthorised_requests_are_not_profiled(client, profile_dir):
+    response = client.get("/api/orders/10", headers={"X-Profile": "1", "X-Profile-Key": "wrong"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert not profile_dir.exists()
+
+    assert "x-profile-id" not in client.get("/api/orders/10", headers=KEY).headers
+    assert client.get("/api/profiles").status_code == 403
+    assert client.get("/api/profiles", headers={"X-Profile-Key": "wrong"}).status_code == 403
+    assert client.get("/api/profiles", headers=KEY).json()["data"] == []
+
+
+def test_only_the_newest_profiles_are_kept(client, profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MAX_PROFILES", 2)
+    for _ in range(3):
+        client.get("/api/orders/10", headers=PROFILE)
+
+    assert len(client.get("/api/profiles", headers=KEY).json()["data"]) == 2
+    assert len(os.listdir(profile_dir)) == 4
+
+
+def test_sync_endpoint_is_profiled_in_its_worker_thread(profile_dir):
+    response = TestClient(profiled_app()).get("/sync", headers=PROFILE)
+
+    assert "endpoint_work" in profiled_functions(response.headers["x-profile-id"])
+
+
+def test_concurrent_profiled_request_is_rejected_and_loop_work_is_not_counted(profile_dir):
+    async def scenario():
+        release = asyncio.Event()
+        transport = httpx.ASGITransport(app=profiled_app(release))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            first = asyncio.create_task(http.get("/async", headers=PROFILE))
+            await asyncio.sleep(0.05)
+            second = await http.get("/async", headers=PROFILE)
+            unprofiled = asyncio.create_task(http.get("/sync"))
+            neighbour_work()
+            release.set()
+            return await first, second, await unprofiled
+
+    first, second, unprofiled = asyncio.run(scenario())
+
+    assert second.status_code == 429
+    assert second.headers["retry-after"] == "1"
+    assert unprofiled.status_code == 200
+    assert first.status_code == 200
+    functions = profiled_functions(first.headers["x-profile-id"])
+    assert "endpoint_work" in functions
+    assert "neighbour_work" not in functions
+    assert "sync_endpoint" not in functions
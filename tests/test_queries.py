@@ -0,0 +1,46 @@
+"""
+Prebuilt statements - results, and compiled-cache hits and misses per query shape
+"""
+
+from datetime import date
+
+from app import queries
+from app.database import create_db_engine, get_session_factory
+
+
+def test_prebuilt_statements_take_bound_parameters(database):
+    with get_session_factory()() as db:
+        orders = db.scalars(
+            queries.ORDER_LIST[(True, True, True)],
+            {"status": "Completed", "start_date": date(2025, 10, 2), "end_date": date(2025, 10, 3)}
+        ).all()
+        order = db.execute(queries.ORDER_DETAIL, {"order_id": 11}).unique().scalar_one()
+        total = db.scalar(queries.ORDER_ITEMS_TOTAL, {"order_id": 11})
+
+    assert [o.order_id for o in orders] == [16, 15]
+    assert sorted(payment.payment_id for payment in order.payments) == [101, 102]
+    assert total == sum(line.total for line in order.order_items)
+
+
+def test_shape_counts_a_miss_then_a_hit(database):
+    engine = create_db_engine(database.url)
+    queries.reset_cache_stats()
+    try:
+        with engine.connect() as connection:
+            for _ in range(2):
+                connection.execute(queries.ORDER_DETAIL, {"order_id": 10}).unique().all()
+    finally:
+        engine.dispose()
+
+    counts = queries.cache_report()["shapes"]["order_detail"]
+    assert counts == {"executions": 2, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_shard_engines_are_reported(airport):
+    with airport.engine_for("airport").connect() as connection:
+        connection.execute(queries.TOTAL_ORDERS).scalar()
+
+    report = queries.cache_report()
+    assert list(report["locations"]) == airport.locations
+    assert report["locations"]["airport"]["compiled_cache_entries"] >= 1
+    assert report["compiled_cache_entries"] == report["locations"][airport.locations[0]]["compiled_cache_entries"]
@@ -0,0 +1,107 @@
+"""
+Read model - archived orders' rows are reclaimed, orphaned lines expire and
+lines committed late under a lower id are still picked up
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+
+from app import archive, read_model
+from app.models import OrderItem
+from app.read_model import ReadModel
+
+
+def loaded(compact_ratio=0.25, pending_refreshes=3):
+    model = ReadModel(compact_ratio=compact_ratio, pending_refreshes=pending_refreshes)
+    model.refresh()
+    return model
+
+
+def test_archived_rows_are_compacted_away(database):
+    model = loaded()
+    kept = [order_id for order_id in model.order_ids() if order_id not in (10, 11, 12, 13, 14)]
+    details = {order_id: model.detail(order_id) for order_id in kept}
+    lines, payments = len(model.line_id), len(model.payment_id)
+
+    with database.begin() as connection:
+        archive.archive_batch(connection, [10, 11, 12, 13, 14])
+    model.refresh()
+
+    assert model.compactions == 1
+    assert len(model.line_id) == sum(len(detail.items) for detail in details.values()) < lines
+    assert len(model.payment_id) == sum(len(detail.payments) for detail in details.values()) < payments
+    assert {order_id: model.detail(order_id) for order_id in kept} == details
+
+    # Payments are still updated in place after their rows moved
+    payment = details[kept[0]].payments[0]
+    model.upsert_payment(
+        payment.payment_id, kept[0], payment.payment_date, payment.amount_due, payment.tips,
+        payment.discount, Decimal("0.00"), payment.payment_type, payment.payment_status
+    )
+    assert model.detail(kept[0]).payments[0].total_paid == Decimal("0.00")
+    assert len(model.payment_id) == sum(len(detail.payments) for detail in details.values())
+
+
+def test_removed_rows_below_the_ratio_are_not_compacted(database):
+    model = loaded(compact_ratio=0.5)
+    with database.begin() as connection:
+        archive.archive_batch(connection, [10])
+    model.refresh()
+    assert model.compactions == 0
+    assert model.statistics()["total_orders"] == 10
+
+
+def test_lines_of_an_order_that_never_arrives_expire(database):
+    model = loaded(pending_refreshes=2)
+    model.append_line(900001, 424242, 1, None, Decimal("4.50"), 2, Decimal("9.00"))
+    model.upsert_payment(900001, 424242, date(2024, 1, 1), Decimal("9.00"), Decimal("0.00"),
+                         Decimal("0.00"), Decimal("9.00"), "Card", "Completed")
+    model.refresh()
+    assert 424242 in model._pending
+    model.refresh()
+    assert 424242 not in model._pending
+    assert model.pending_expired == 2
+
+
+def test_pending_lines_are_replayed_when_the_order_arrives(database):
+    model = loaded()
+    model.append_line(900002, 424243, 1, None, Decimal("4.50"), 2, Decimal("9.00"))
+    model.refresh()
+    model.upsert_order(424243, date(2024, 1, 1), "Pending")
+    assert len(model.detail(424243).items) == 1
+    assert model._pending_since == {}
+
+
+def test_failed_initial_load_falls_back_to_the_database(database, monkeypatch):
+    def unreachable(model):
+        raise ConnectionError("database unreachable")
+
+    monkeypatch.setattr(read_model, "READ_MODEL_ENABLED", True)
+    monkeypatch.setattr(ReadModel, "refresh", unreachable)
+    try:
+        assert read_model.start_read_model() is not None
+        assert read_model.get_read_model() is None
+    finally:
+        read_model.stop_read_model()
+        monkeypatch.setattr(read_model, "read_model", None)
+
+
+def test_line_committed_late_under_a_lower_id_is_picked_up(database):
+    model = loaded()
+    lines = len(model.detail(10).items)
+    with database.begin() as connection:
+        last_id = connection.scalar(select(func.max(OrderItem.id)))
+        line = {"order_id": 10, "item_id": 1, "price": Decimal("4.50"), "quantity": 1, "total": Decimal("4.50")}
+        connection.execute(insert(OrderItem), {"id": last_id + 10, **line})
+    model.refresh()
+    assert len(model.detail(10).items) == lines + 1
+
+    # A transaction that took its id earlier commits after the refresh
+    with database.begin() as connection:
+        connection.execute(insert(OrderItem), {"id": last_id + 5, **line})
+    model.refresh()
+    model.refresh()
+    assert sorted(item.id for item in model.detail(10).items)[-2:] == [last_id + 5, last_id + 10]
+    assert len(model.detail(10).items) == lines + 2
@@ -0,0 +1,52 @@
+"""
+Reconciliation - amounts load as integer cents and open orders are not due yet
+"""
+
+import numpy as np
+from sqlalchemy import text
+
+from app.database import get_session_factory
+from app.reconciliation import load_frames, scan
+
+
+def issues_for(order_id):
+    db = get_session_factory()()
+    try:
+        issues = scan(load_frames(db))
+    finally:
+        db.close()
+    return {kind for kind, found in issues.items() if order_id in found["order_id"]}
+
+
+def test_amounts_load_as_integer_cents(database):
+    db = get_session_factory()()
+    try:
+        frames = load_frames(db)
+    finally:
+        db.close()
+    with database.connect() as connection:
+        paid = connection.execute(text("SELECT SUM(total_paid) FROM payments")).scalar()
+
+    for name in ("amount_due_cents", "tips_cents", "discount_cents", "total_paid_cents"):
+        assert frames["payments"][name].dtype == np.int64
+    assert frames["order_items"]["total_cents"].dtype == np.int64
+    assert int(frames["payments"]["total_paid_cents"].sum()) == round(float(paid) * 100)
+
+
+def test_unpaid_pending_order_is_not_underpaid(database):
+    with database.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO orders (order_id, order_date, order_status) "
+            "VALUES (900, '2025-10-06', 'Pending')"
+        ))
+        connection.execute(text(
+            "INSERT INTO order_items (order_id, item_id, quantity, price, total) "
+            "SELECT 900, item_id, 1, 5.00, 5.00 FROM items WHERE has_size_variants = 0 LIMIT 1"
+        ))
+    assert "underpaid" not in issues_for(900)
+    assert "open_underpaid" in issues_for(900)
+
+    with database.begin() as connection:
+        connection.execute(text("UPDATE orders SET order_status = 'Completed' WHERE order_id = 900"))
+    assert "underpaid" in issues_for(900)
+    assert "open_underpaid" not in issues_for(900)
@@ -0,0 +1,110 @@
+"""
+Response cache - which committed writes invalidate which cached routes
+"""
+
+import pytest
+
+from app import archive, response_cache, write_queue
+from app.response_cache import ResponseCache, cached_route
+
+PATHS = [
+    "/api/orders/10", "/api/orders/11", "/api/orders", "/api/orders/complete/all",
+    "/api/statistics/overview", "/api/statistics/revenue", "/api/reconciliation",
+]
+
+
+@pytest.fixture
+def cache(database, tmp_path, monkeypatch):
+    """A cache the write listeners invalidate, with every path in PATHS stored"""
+    shared = ResponseCache(path=str(tmp_path / "cache.db"))
+    monkeypatch.setattr(response_cache, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(response_cache, "response_cache", shared)
+    response_cache.register_listeners()
+    for path in PATHS:
+        store(shared, path)
+    yield shared
+    response_cache.remove_listeners()
+
+
+def dependencies(path):
+    route, match = cached_route("GET", path)
+    return route.dependencies(match)
+
+
+def store(cache, path, snapshot=None):
+    tokens = dependencies(path)
+    _, version, _ = cache.lookup(None, tokens)
+    return cache.store(path, 200, [], b"{}", tokens, version, snapshot)
+
+
+def invalidated(cache):
+    return [path for path in PATHS if cache.lookup(path, dependencies(path))[0] is None]
+
+
+def payment(payment_id, order_id):
+    return {
+        "payment_id": payment_id, "order_id": order_id, "payment_date": "2024-01-01",
+        "amount_due": "1.00", "tips": "0.00", "discount": "0.00", "total_paid": "1.00",
+        "payment_type": "Card", "payment_status": "Completed",
+    }
+
+
+def test_payment_invalidates_only_its_order_and_payment_reports(cache):
+    write_queue.apply_write("create_payment", payment(99001, 10), "pay-1")
+    assert invalidated(cache) == [
+        "/api/orders/10", "/api/orders", "/api/orders/complete/all",
+        "/api/statistics/overview", "/api/reconciliation",
+    ]
+
+
+def test_update_by_payment_id_is_scoped_to_the_payments_order(cache):
+    # Payment 101 belongs to order 11; the statement only names the payment
+    write_queue.apply_write("update_payment", {"payment_id": 101, "tips": "2.00"}, "pay-2")
+    assert "/api/orders/11" in invalidated(cache)
+    assert "/api/orders/10" not in invalidated(cache)
+
+
+def test_archiving_is_scoped_to_the_archived_orders(cache, database):
+    with database.begin() as connection:
+        archive.archive_batch(connection, [11])
+    assert "/api/orders/11" in invalidated(cache)
+    assert "/api/orders/10" not in invalidated(cache)
+
+
+def test_plain_sql_invalidates_every_order(cache, database):
+    with database.begin() as connection:
+        connection.exec_driver_sql("UPDATE items SET item_name = item_name")
+    assert invalidated(cache) == [
+        "/api/orders/10", "/api/orders/11", "/api/orders/complete/all",
+        "/api/statistics/revenue", "/api/reconciliation",
+    ]
+
+
+def test_rolled_back_write_invalidates_nothing(cache):
+    with pytest.raises(write_queue.WriteFailed):
+        write_queue.apply_write("create_payment", payment(99002, 424242), "pay-3")  # No such order
+    assert invalidated(cache) == []
+
+
+def test_response_from_a_snapshot_older_than_the_write_is_not_stored(cache):
+    write_queue.apply_write("create_payment", payment(99003, 10), "pay-4")
+    _, _, changed_at = cache.lookup(None, dependencies("/api/statistics/overview"))
+    assert not store(cache, "/api/statistics/overview", snapshot=changed_at - 1)
+    assert store(cache, "/api/statistics/overview", snapshot=changed_at + 1)
+
+
+def test_api_write_invalidates_the_cached_response(cache):
+    from fastapi.testclient import TestClient
+    from app.main import create_app
+
+    client = TestClient(create_app())
+    first = client.get("/api/orders/10")
+    assert first.headers["x-response-cache"] == "miss"
+    assert client.get("/api/orders/10").headers["x-response-cache"] == "hit"
+
+    created = client.post("/api/payments", json=payment(99004, 10), headers={"Idempotency-Key": "pay-5"})
+    assert created.status_code == 201
+    after = client.get("/api/orders/10")
+    assert after.headers["x-response-cache"] == "miss"
+    assert len(after.json()["payments"]) == len(first.json()["payments"]) + 1
+    assert client.get("/api/orders/10").headers["x-response-cache"] == "hit"
@@ -0,0 +1,86 @@
+"""
+Search index - prefix and fuzzy term matching, date-bounded posting lists,
+order search by size and date, and lines committed late under a lower id
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import func, insert, select
+
+from app.models import OrderItem
+from app.search import CatalogIndex, SearchIndex, _Postings
+
+CATALOG = {
+    1: ("Iced Tea", "Soft Drinks", "Drinks"),
+    2: ("Cheesecake", "Desserts", "Drinks"),
+    3: ("Cheeseburger", "Mains", "Food"),
+}
+
+
+def loaded():
+    index = SearchIndex()
+    index.refresh()
+    return index
+
+
+def order_ids(result):
+    return [order["order_id"] for order in result["orders"]]
+
+
+def test_terms_match_exactly_or_as_prefix():
+    catalog = CatalogIndex(CATALOG)
+    assert catalog.match_term("drinks") == {"drinks": "exact"}
+    assert catalog.match_term("dri") == {"drinks": "prefix"}
+    assert catalog.match_term("cheese") == {"cheesecake": "prefix", "cheeseburger": "prefix"}
+    assert [item_id for item_id, _, _ in catalog.search(["dri"])] == [1, 2]
+
+
+def test_fuzzy_matches_only_when_nothing_matches_as_typed():
+    catalog = CatalogIndex(CATALOG)
+    assert catalog.match_term("drnks") == {"drinks": "fuzzy"}
+    assert catalog.match_term("chesecake") == {"cheesecake": "fuzzy"}
+    assert catalog.match_term("cheesecaek") == {"cheesecake": "fuzzy"}  # Adjacent letters swapped
+    assert catalog.match_term("dx") == {}  # Too short to match fuzzily
+    assert catalog.match_term("pizza") == {}
+
+
+def test_postings_are_bounded_by_date_inclusively():
+    postings = _Postings()
+    for day, order_id in [(5, 50), (1, 10), (3, 30), (3, 31), (9, 90)]:
+        postings.add(day, order_id)
+    assert list(postings.dates) == [1, 3, 3, 5, 9]
+    assert list(postings.between(3, 5)) == [(3, 30), (3, 31), (5, 50)]
+    assert list(postings.between(None, 2)) == [(1, 10)]
+    assert list(postings.between(6)) == [(9, 90)]
+    assert list(postings.between(6, 8)) == []
+
+    postings.remove(3, 30)
+    assert list(postings.between(3, 3)) == [(3, 31)]
+
+
+def test_orders_are_filtered_by_size_and_date(database):
+    index = loaded()
+    large = index.search_orders("Item6", size="Large")
+    assert sorted(order_ids(large)) == [12, 14, 16, 19, 20]
+    assert order_ids(index.search_orders("Item6 Large")) == order_ids(large)
+    assert all(line["size"] == "Large" for order in large["orders"] for line in order["matched_lines"])
+
+    between = index.search_orders("Item6 Large", start=date(2025, 10, 2), end=date(2025, 10, 5))
+    assert order_ids(between) == [16]
+    assert between["total_orders"] == 1
+    assert order_ids(index.search_orders("Item6 Small", end=date(2025, 10, 1))) == [20, 13]
+
+
+def test_line_committed_late_under_a_lower_id_is_indexed(database):
+    index = loaded()
+    line = {"item_id": 9, "size": None, "price": Decimal("2.00"), "quantity": 1, "total": Decimal("2.00")}
+    with database.begin() as connection:
+        last_id = connection.scalar(select(func.max(OrderItem.id)))
+        connection.execute(insert(OrderItem), {"id": last_id + 10, "order_id": 10, **line})
+    index.refresh()
+
+    with database.begin() as connection:
+        connection.execute(insert(OrderItem), {"id": last_id + 5, "order_id": 15, **line})
+    index.refresh()
+    assert 15 in order_ids(index.search_orders("Item9"))
@@ -0,0 +1,43 @@
+"""
+Sharding - order ids that exist in more than one location
+"""
+
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from app import sharding
+from app.database import DEFAULT_LOCATION
+from app.main import app
+from app.models import Order
+
+
+@pytest.fixture
+def client(airport):
+    return TestClient(app)
+
+
+def add_order(order_id, location="airport"):
+    with sharding.router.engine_for(location).begin() as connection:
+        connection.execute(insert(Order), {
+            "order_id": order_id, "order_date": date(2025, 10, 6), "order_status": "Pending", "location": location,
+        })
+
+
+def test_order_found_in_one_location_names_it(client):
+    add_order(424242)
+    response = client.get("/api/orders/424242")
+    assert response.status_code == 200
+    assert response.json()["location"] == "airport"
+    assert client.get("/api/orders/10").json()["location"] == DEFAULT_LOCATION
+
+
+def test_order_id_in_several_locations_needs_a_location(client):
+    add_order(10)  # Also a seeded order in the main database
+    response = client.get("/api/orders/10")
+    assert response.status_code == 409
+    assert "pass location" in response.json()["error"]
+    assert client.get("/api/orders/10?location=airport").json()["location"] == "airport"
+    assert client.get(f"/api/orders/10?location={DEFAULT_LOCATION}").json()["order_status"] == "Completed"
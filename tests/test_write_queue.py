@@ -0,0 +1,149 @@
+"""
+Write-behind queue - replay after a crash, including logs of workers that are gone,
+and the direct write path used when the queue is disabled
+"""
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from app import write_queue
+from app.models import Order, OrderItem, WriteIdempotencyKey
+from app.write_queue import IdempotencyConflict, SchemaMissing, WriteFailed, WriteQueue, apply_write, stored_outcome
+
+
+def order(order_id):
+    return {"order_id": order_id, "order_date": "2024-06-01", "order_status": "Pending"}
+
+
+def line(order_id):
+    return {"order_id": order_id, "item_id": 1, "size": None, "price": "4.50", "quantity": 2, "total": "9.00"}
+
+
+def crash(queue):
+    """Drop a queue without flushing, as if its worker process had died"""
+    queue._file.close()
+    queue._dir_lock.close()
+
+
+def count(engine, model, order_ids):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(func.count()).select_from(model).where(model.order_id.in_(order_ids))
+        ).scalar()
+
+
+def test_restart_with_fewer_workers_replays_every_log(database, tmp_path):
+    root = str(tmp_path / "write_log")
+    first, second = WriteQueue(root=root, fsync=False), WriteQueue(root=root, fsync=False)
+    first.open()
+    second.open()
+    assert first.directory != second.directory
+
+    first.submit("create_order", order(900001), "w0-1")
+    second.submit("create_order", order(900002), "w1-1")
+    second.submit("add_order_item", line(900002), "w1-2")
+    crash(first)
+    crash(second)
+
+    # One worker comes back and finds both logs
+    survivor = WriteQueue(root=root, fsync=False)
+    assert survivor.open() == 3
+    survivor.flush()
+    survivor.stop()
+    assert count(database, Order, [900001, 900002]) == 2
+    assert count(database, OrderItem, [900002]) == 1
+    assert survivor.lookup("w1-2")["status"] == "applied"
+
+    # Nothing is replayed twice
+    again = WriteQueue(root=root, fsync=False)
+    assert again.open() == 0
+    again.stop()
+
+
+def test_reclaimed_orphan_directory_continues_its_sequence(database, tmp_path):
+    root = str(tmp_path / "write_log")
+    first, second = WriteQueue(root=root, fsync=False), WriteQueue(root=root, fsync=False)
+    first.open()
+    second.open()
+    for n in range(3):
+        second.submit("create_order", order(900010 + n), f"w1-{n}")
+    second.flush()
+    crash(first)
+    crash(second)
+
+    survivor = WriteQueue(root=root, fsync=False)
+    survivor.open()
+    survivor.stop()
+
+    # Two workers again: the second reuses the old directory, whose checkpoint is at 3
+    first, second = WriteQueue(root=root, fsync=False), WriteQueue(root=root, fsync=False)
+    first.open()
+    second.open()
+    outcome = second.submit("create_order", order(900020), "w1-new")
+    assert outcome["sequence"] == 4
+    second.flush()
+    first.stop()
+    second.stop()
+    assert count(database, Order, [900020]) == 1
+
+
+def test_open_fails_clearly_without_its_tables(database, tmp_path):
+    WriteIdempotencyKey.__table__.drop(database)
+    queue = WriteQueue(root=str(tmp_path / "write_log"), fsync=False)
+    with pytest.raises(SchemaMissing, match="write_idempotency_keys"):
+        queue.open()
+    # The directory lock is released, so a later start can claim the same directory
+    retry = WriteQueue(root=str(tmp_path / "write_log"), fsync=False)
+    WriteIdempotencyKey.__table__.create(database)
+    retry.open()
+    assert retry.directory == queue.directory
+    retry.stop()
+
+
+def test_direct_write_is_idempotent(database):
+    outcome = apply_write("create_order", order(900030), "till-1")
+    assert outcome["status"] == "applied" and not outcome["duplicate"]
+
+    # A retry returns the first outcome and inserts nothing
+    assert apply_write("create_order", order(900030), "till-1")["duplicate"]
+    assert count(database, Order, [900030]) == 1
+    assert stored_outcome("till-1")["status"] == "applied"
+
+    with pytest.raises(IdempotencyConflict):
+        apply_write("create_order", order(900031), "till-1")
+    # A new key for an existing order is refused by the database
+    with pytest.raises(WriteFailed):
+        apply_write("create_order", order(900030), "till-2")
+    assert stored_outcome("till-2") is None
+
+
+def test_transient_error_leaves_writes_in_the_log(database, tmp_path, monkeypatch):
+    queue = WriteQueue(root=str(tmp_path / "write_log"), fsync=False)
+    queue.open()
+    queue.submit("create_order", order(900040), "t-1")
+    queue.submit("create_order", order(900040), "t-2")  # Duplicate id: refused for good
+    queue.submit("create_order", order(900041), "t-3")
+
+    apply_records = write_queue._apply_records
+
+    def lost_connection(connection, records):
+        if any(record["key"] == "t-3" for record in records) and len(records) == 1:
+            raise OperationalError("INSERT INTO orders", {}, Exception("database is locked"))
+        apply_records(connection, records)
+
+    monkeypatch.setattr(write_queue, "_apply_records", lost_connection)
+    with pytest.raises(OperationalError):
+        queue.flush()
+    assert queue.lookup("t-1")["status"] == "applied"
+    assert queue.lookup("t-2")["status"] == "rejected"
+    assert queue.lookup("t-3")["status"] == "accepted"
+    assert queue.status()["pending"] == 3
+
+    # The next flush applies the write that hit the transient error, and only that one
+    monkeypatch.setattr(write_queue, "_apply_records", apply_records)
+    queue.flush()
+    assert queue.lookup("t-3")["status"] == "applied"
+    assert queue.applied == 2 and queue.rejected == 1
+    queue.stop()
+    assert count(database, Order, [900040, 900041]) == 2